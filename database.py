@@ -620,6 +620,47 @@ def increment_audio_seconds(token_prefix: str, date_key: str, seconds: float) ->
         return row["audio_seconds"] if row else seconds
 
 
+def _reserve_quota(
+    column: str, token_prefix: str, date_key: str, amount: float, limit: float,
+) -> tuple[bool, float]:
+    """Add *amount* to *column* only if the new total stays within *limit*.
+
+    Check and increment happen in one conditional UPSERT, so concurrent
+    requests cannot both pass the check. Returns ``(reserved, total)`` where
+    *total* is the new total when reserved, else the current usage.
+    """
+    key = (token_prefix[:16], date_key)
+    with _connect() as conn:
+        reserved = False
+        if amount <= limit:
+            cursor = conn.execute(
+                f"INSERT INTO usage_quotas (token_prefix, date_key, {column}) VALUES (?, ?, ?) "
+                f"ON CONFLICT(token_prefix, date_key) DO UPDATE "
+                f"SET {column} = {column} + excluded.{column} "
+                f"WHERE {column} + excluded.{column} <= ?",
+                (*key, amount, limit),
+            )
+            conn.commit()
+            reserved = cursor.rowcount > 0
+        row = conn.execute(
+            f"SELECT {column} FROM usage_quotas WHERE token_prefix = ? AND date_key = ?",
+            key,
+        ).fetchone()
+        return reserved, (row[column] if row else 0)
+
+
+def reserve_tts_chars(token_prefix: str, date_key: str, chars: int, limit: int) -> tuple[bool, int]:
+    """Reserve TTS chars against the daily limit. Returns (reserved, total)."""
+    return _reserve_quota("tts_chars", token_prefix, date_key, chars, limit)
+
+
+def reserve_audio_seconds(
+    token_prefix: str, date_key: str, seconds: float, limit: float,
+) -> tuple[bool, float]:
+    """Reserve audio seconds against the daily limit. Returns (reserved, total)."""
+    return _reserve_quota("audio_seconds", token_prefix, date_key, seconds, limit)
+
+
 # ---------------------------------------------------------------------------
 # Session management
 # ---------------------------------------------------------------------------
@@ -679,14 +720,27 @@ def revoke_all_sessions() -> int:
 # Device management
 # ---------------------------------------------------------------------------
 
-def get_active_devices() -> list[dict]:
-    """Return all active sessions with device info."""
+def get_active_devices(max_age_seconds: float = 0) -> list[dict]:
+    """Return all active sessions with device info.
+
+    If *max_age_seconds* > 0, sessions whose ``last_activity`` is older
+    than that window are left out even if they have not been purged yet.
+    """
     with _connect() as conn:
-        rows = conn.execute(
-            "SELECT token_hash, device_id, device_name, client_ip, user_agent, "
-            "created_at, last_activity FROM active_sessions "
-            "ORDER BY last_activity DESC"
-        ).fetchall()
+        if max_age_seconds > 0:
+            cutoff = time.time() - max_age_seconds
+            rows = conn.execute(
+                "SELECT token_hash, device_id, device_name, client_ip, user_agent, "
+                "created_at, last_activity FROM active_sessions "
+                "WHERE last_activity >= ? ORDER BY last_activity DESC",
+                (cutoff,),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT token_hash, device_id, device_name, client_ip, user_agent, "
+                "created_at, last_activity FROM active_sessions "
+                "ORDER BY last_activity DESC"
+            ).fetchall()
         return [dict(r) for r in rows]
 
 
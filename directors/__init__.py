@@ -10,6 +10,7 @@ from .storage import (
     disable_director,
     get_pending_directors,
     mark_director_run,
+    queue_director_run,
     update_context,
     migrate_directors,
     # Projects
@@ -20,6 +21,8 @@ from .storage import (
     delete_project,
     count_projects,
     MAX_PROJECTS_PER_USER,
+    get_activity_timeline,
+    directors_etag,
 )
 from .meta_tool import (
     MANAGE_DIRECTORS_DEFINITION,
@@ -32,6 +35,7 @@ from .projects_tool import (
 from .task_queue import (
     create_task,
     list_tasks,
+    list_tasks_with_stats,
     get_task,
     claim_task,
     complete_task,
@@ -43,6 +47,7 @@ from .task_queue import (
 from .inbox import (
     add_inbox_item,
     list_inbox,
+    list_inbox_with_unread,
     get_inbox_item,
     update_inbox_status,
     get_unread_count,
@@ -60,6 +65,7 @@ __all__ = [
     "disable_director",
     "get_pending_directors",
     "mark_director_run",
+    "queue_director_run",
     "update_context",
     "migrate_directors",
     # Projects
@@ -70,6 +76,8 @@ __all__ = [
     "delete_project",
     "count_projects",
     "MAX_PROJECTS_PER_USER",
+    "get_activity_timeline",
+    "directors_etag",
     # Meta-tools
     "MANAGE_DIRECTORS_DEFINITION",
     "handle_manage_directors",
@@ -78,6 +86,7 @@ __all__ = [
     # Task queue
     "create_task",
     "list_tasks",
+    "list_tasks_with_stats",
     "get_task",
     "claim_task",
     "complete_task",
@@ -88,6 +97,7 @@ __all__ = [
     # Inbox
     "add_inbox_item",
     "list_inbox",
+    "list_inbox_with_unread",
     "get_inbox_item",
     "update_inbox_status",
     "get_unread_count",
@@ -116,6 +116,58 @@ def add_inbox_item(
         conn.close()
 
 
+def _select_inbox(
+    conn: sqlite3.Connection,
+    user_id: str,
+    status: str | None,
+    director_id: str | None,
+    content_type: str | None,
+    limit: int,
+    offset: int,
+    project_id: str | None,
+) -> list[dict]:
+    conditions = ["user_id = ?"]
+    params: list = [user_id]
+
+    if project_id is not None:
+        conditions.append("project_id = ?")
+        params.append(project_id)
+    if status:
+        conditions.append("status = ?")
+        params.append(status)
+    if director_id:
+        conditions.append("director_id = ?")
+        params.append(director_id)
+    if content_type:
+        conditions.append("content_type = ?")
+        params.append(content_type)
+
+    where = " AND ".join(conditions)
+    params.extend([limit, offset])
+
+    rows = conn.execute(
+        f"SELECT * FROM director_inbox WHERE {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+        params,
+    ).fetchall()
+    return [_row_to_dict(r) for r in rows]
+
+
+def _count_unread(conn: sqlite3.Connection, user_id: str, project_id: str | None) -> int:
+    conditions = ["user_id = ?", "status = 'unread'"]
+    params: list = [user_id]
+
+    if project_id is not None:
+        conditions.append("project_id = ?")
+        params.append(project_id)
+
+    where = " AND ".join(conditions)
+    row = conn.execute(
+        f"SELECT COUNT(*) FROM director_inbox WHERE {where}",
+        params,
+    ).fetchone()
+    return row[0] if row else 0
+
+
 def list_inbox(
     user_id: str = "default",
     status: str | None = None,
@@ -128,30 +180,29 @@ def list_inbox(
     """List inbox items with optional filters."""
     conn = _get_inbox_db()
     try:
-        conditions = ["user_id = ?"]
-        params: list = [user_id]
-
-        if project_id is not None:
-            conditions.append("project_id = ?")
-            params.append(project_id)
-        if status:
-            conditions.append("status = ?")
-            params.append(status)
-        if director_id:
-            conditions.append("director_id = ?")
-            params.append(director_id)
-        if content_type:
-            conditions.append("content_type = ?")
-            params.append(content_type)
+        return _select_inbox(
+            conn, user_id, status, director_id, content_type, limit, offset, project_id,
+        )
+    finally:
+        conn.close()
 
-        where = " AND ".join(conditions)
-        params.extend([limit, offset])
 
-        rows = conn.execute(
-            f"SELECT * FROM director_inbox WHERE {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
-            params,
-        ).fetchall()
-        return [_row_to_dict(r) for r in rows]
+def list_inbox_with_unread(
+    user_id: str = "default",
+    status: str | None = None,
+    director_id: str | None = None,
+    content_type: str | None = None,
+    limit: int = 50,
+    offset: int = 0,
+    project_id: str | None = None,
+) -> tuple[list[dict], int]:
+    """``list_inbox`` plus the unread count, sharing one connection."""
+    conn = _get_inbox_db()
+    try:
+        items = _select_inbox(
+            conn, user_id, status, director_id, content_type, limit, offset, project_id,
+        )
+        return items, _count_unread(conn, user_id, project_id)
     finally:
         conn.close()
 
@@ -212,19 +263,7 @@ def get_unread_count(user_id: str = "default", project_id: str | None = None) ->
     """Get the number of unread inbox items."""
     conn = _get_inbox_db()
     try:
-        conditions = ["user_id = ?", "status = 'unread'"]
-        params: list = [user_id]
-
-        if project_id is not None:
-            conditions.append("project_id = ?")
-            params.append(project_id)
-
-        where = " AND ".join(conditions)
-        row = conn.execute(
-            f"SELECT COUNT(*) FROM director_inbox WHERE {where}",
-            params,
-        ).fetchone()
-        return row[0] if row else 0
+        return _count_unread(conn, user_id, project_id)
     finally:
         conn.close()
 
@@ -1,7 +1,6 @@
 """manage_directors meta-tool — allows Rain to create and manage autonomous directors."""
 
 import re
-import time
 from datetime import datetime, timezone
 
 from .storage import (
@@ -12,6 +11,7 @@ from .storage import (
     delete_director,
     enable_director,
     disable_director,
+    queue_director_run,
     update_context,
 )
 
@@ -379,17 +379,7 @@ def _action_run_now(args: dict, user_id: str) -> dict:
         return {"content": f"Director '{director_id}' is disabled. Enable it first.", "is_error": True}
 
     # Set next_run to now so the scheduler picks it up on next cycle (within 30s)
-    from .storage import _get_db
-    now = time.time()
-    conn = _get_db()
-    try:
-        conn.execute(
-            "UPDATE directors SET next_run = ?, updated_at = ? WHERE id = ? AND user_id = ?",
-            (now, now, director_id, user_id),
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    queue_director_run(director_id, user_id=user_id)
 
     return {
         "content": f"Director '{director['name']}' queued for immediate execution. It will run within the next 30 seconds.",
@@ -21,6 +21,21 @@ DIRECTORS_DB = CONFIG_DIR / "directors.db"
 
 MAX_PROJECTS_PER_USER = 5
 
+# Per-user change counter for the directors table, bumped after every write.
+# Lets list endpoints answer If-None-Match without querying. The epoch keeps
+# tags handed out by an earlier process from ever matching.
+_VERSION_EPOCH = uuid.uuid4().hex[:8]
+_directors_version: dict[str, int] = {}
+
+
+def _bump_directors_version(user_id: str) -> None:
+    _directors_version[user_id] = _directors_version.get(user_id, 0) + 1
+
+
+def directors_etag(user_id: str = "default") -> str:
+    """Weak ETag that changes whenever any of *user_id*'s directors changes."""
+    return f'W/"dir-{_VERSION_EPOCH}-{_directors_version.get(user_id, 0)}"'
+
 
 def _ensure_dir() -> None:
     CONFIG_DIR.mkdir(parents=True, exist_ok=True)
@@ -193,6 +208,7 @@ def add_director(
              next_run, now, now, user_id, project_id, template_id),
         )
         conn.commit()
+        _bump_directors_version(user_id)
 
         row = conn.execute(
             "SELECT * FROM directors WHERE id = ? AND user_id = ?",
@@ -311,6 +327,7 @@ def update_director(director_id: str, user_id: str = "default", **kwargs) -> dic
             params,
         )
         conn.commit()
+        _bump_directors_version(user_id)
         row = conn.execute(
             "SELECT * FROM directors WHERE id = ? AND user_id = ?",
             (director_id, user_id),
@@ -329,6 +346,7 @@ def delete_director(director_id: str, user_id: str = "default") -> bool:
             (director_id, user_id),
         )
         conn.commit()
+        _bump_directors_version(user_id)
         return cur.rowcount > 0
     finally:
         conn.close()
@@ -351,6 +369,7 @@ def enable_director(director_id: str, user_id: str = "default") -> dict | None:
             (next_run, time.time(), director_id, user_id),
         )
         conn.commit()
+        _bump_directors_version(user_id)
         row = conn.execute(
             "SELECT * FROM directors WHERE id = ? AND user_id = ?",
             (director_id, user_id),
@@ -413,12 +432,29 @@ def mark_director_run(
             (now, next_run, now, result, error, cost, director_id),
         )
         conn.commit()
+        _bump_directors_version(director["user_id"])
         row = conn.execute("SELECT * FROM directors WHERE id = ?", (director_id,)).fetchone()
         return _row_to_dict(row) if row else None
     finally:
         conn.close()
 
 
+def queue_director_run(director_id: str, user_id: str = "default") -> bool:
+    """Set next_run to now so the scheduler picks the director up on its next tick."""
+    now = time.time()
+    conn = _get_db()
+    try:
+        cursor = conn.execute(
+            "UPDATE directors SET next_run = ?, updated_at = ? WHERE id = ? AND user_id = ?",
+            (now, now, director_id, user_id),
+        )
+        conn.commit()
+        _bump_directors_version(user_id)
+        return cursor.rowcount > 0
+    finally:
+        conn.close()
+
+
 def update_context(director_id: str, user_id: str = "default", key: str = "", value: str = "") -> dict | None:
     """Update a key in a director's persistent context window."""
     director = get_director(director_id, user_id=user_id)
@@ -596,6 +632,7 @@ def delete_project(project_id: str, user_id: str = "default") -> bool:
             (project_id, user_id),
         )
         conn.commit()
+        _bump_directors_version(user_id)
         return True
     finally:
         conn.close()
@@ -614,6 +651,75 @@ def count_projects(user_id: str = "default") -> int:
         conn.close()
 
 
+# ---------------------------------------------------------------------------
+# Activity timeline
+# ---------------------------------------------------------------------------
+
+# Response keys per activity type, in the column order get_activity_timeline selects
+_ACTIVITY_KEYS = {
+    "director_run": ("type", "director_id", "director_name", "emoji", "timestamp", "success", "preview"),
+    "inbox_item": ("type", "director_id", "director_name", "title", "content_type", "status", "timestamp"),
+    "task": ("type", "task_id", "title", "creator_id", "assignee_id", "status", "timestamp"),
+}
+
+
+def get_activity_timeline(
+    user_id: str = "default",
+    limit: int = 20,
+    project_id: str | None = None,
+) -> list[dict]:
+    """Return recent director runs, inbox items and tasks, newest first.
+
+    The three sources are merged, sorted and limited in a single
+    ``UNION ALL`` query instead of being fetched and sorted in Python.
+    """
+    # Imported here: inbox and task_queue import from this module
+    from .inbox import _ensure_inbox_table
+    from .task_queue import _ensure_tasks_table
+
+    project_filter = " AND project_id = ?" if project_id is not None else ""
+    scope: list = [user_id] if project_id is None else [user_id, project_id]
+
+    conn = _get_db()
+    try:
+        _ensure_inbox_table(conn)
+        _ensure_tasks_table(conn)
+        # Plain tuples: each branch emits its fields in response-key order so
+        # rows zip straight into dicts without per-column name lookups.
+        conn.row_factory = None
+        rows = conn.execute(
+            f"""SELECT 'director_run', id, name, emoji, last_run,
+                       (last_error IS NULL OR last_error = ''),
+                       substr(COALESCE(NULLIF(last_result, ''), last_error, ''), 1, 200),
+                       0 AS src, last_run AS ts
+                  FROM directors
+                 WHERE user_id = ?{project_filter} AND last_run IS NOT NULL
+                UNION ALL
+                SELECT 'inbox_item', director_id, director_name, title,
+                       content_type, status, created_at, 1, created_at
+                  FROM director_inbox
+                 WHERE user_id = ?{project_filter}
+                UNION ALL
+                SELECT 'task', id, title, creator_id, assignee_id, status,
+                       created_at, 2, created_at
+                  FROM director_tasks
+                 WHERE user_id = ?{project_filter}
+                ORDER BY ts DESC, src ASC
+                LIMIT ?""",
+            scope * 3 + [limit],
+        ).fetchall()
+    finally:
+        conn.close()
+
+    activity = []
+    for row in rows:
+        item = dict(zip(_ACTIVITY_KEYS[row[0]], row))
+        if "success" in item:
+            item["success"] = bool(item["success"])
+        activity.append(item)
+    return activity
+
+
 def migrate_directors() -> dict:
     """Ensure directors DB is initialized. Idempotent — safe to call on every startup."""
     try:
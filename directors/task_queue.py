@@ -132,6 +132,41 @@ def create_task(
         conn.close()
 
 
+def _select_tasks(
+    conn: sqlite3.Connection,
+    user_id: str,
+    status: str | None,
+    assignee_id: str | None,
+    creator_id: str | None,
+    limit: int,
+    project_id: str | None,
+) -> list[dict]:
+    conditions = ["user_id = ?"]
+    params: list = [user_id]
+
+    if project_id is not None:
+        conditions.append("project_id = ?")
+        params.append(project_id)
+    if status:
+        conditions.append("status = ?")
+        params.append(status)
+    if assignee_id:
+        conditions.append("assignee_id = ?")
+        params.append(assignee_id)
+    if creator_id:
+        conditions.append("creator_id = ?")
+        params.append(creator_id)
+
+    where = " AND ".join(conditions)
+    params.append(limit)
+
+    rows = conn.execute(
+        f"SELECT * FROM director_tasks WHERE {where} ORDER BY priority ASC, created_at DESC LIMIT ?",
+        params,
+    ).fetchall()
+    return [_row_to_dict(r) for r in rows]
+
+
 def list_tasks(
     user_id: str = "default",
     status: str | None = None,
@@ -143,30 +178,24 @@ def list_tasks(
     """List tasks with optional filters."""
     conn = _get_tasks_db()
     try:
-        conditions = ["user_id = ?"]
-        params: list = [user_id]
-
-        if project_id is not None:
-            conditions.append("project_id = ?")
-            params.append(project_id)
-        if status:
-            conditions.append("status = ?")
-            params.append(status)
-        if assignee_id:
-            conditions.append("assignee_id = ?")
-            params.append(assignee_id)
-        if creator_id:
-            conditions.append("creator_id = ?")
-            params.append(creator_id)
+        return _select_tasks(conn, user_id, status, assignee_id, creator_id, limit, project_id)
+    finally:
+        conn.close()
 
-        where = " AND ".join(conditions)
-        params.append(limit)
 
-        rows = conn.execute(
-            f"SELECT * FROM director_tasks WHERE {where} ORDER BY priority ASC, created_at DESC LIMIT ?",
-            params,
-        ).fetchall()
-        return [_row_to_dict(r) for r in rows]
+def list_tasks_with_stats(
+    user_id: str = "default",
+    status: str | None = None,
+    assignee_id: str | None = None,
+    creator_id: str | None = None,
+    limit: int = 50,
+    project_id: str | None = None,
+) -> tuple[list[dict], dict]:
+    """``list_tasks`` plus ``get_task_stats``, sharing one connection."""
+    conn = _get_tasks_db()
+    try:
+        tasks = _select_tasks(conn, user_id, status, assignee_id, creator_id, limit, project_id)
+        return tasks, _count_by_status(conn, user_id, project_id)
     finally:
         conn.close()
 
@@ -322,24 +351,28 @@ def get_ready_tasks(assignee_id: str | None = None, user_id: str | None = None)
         conn.close()
 
 
+def _count_by_status(conn: sqlite3.Connection, user_id: str, project_id: str | None) -> dict:
+    conditions = ["user_id = ?"]
+    params: list = [user_id]
+
+    if project_id is not None:
+        conditions.append("project_id = ?")
+        params.append(project_id)
+
+    where = " AND ".join(conditions)
+    rows = conn.execute(
+        f"SELECT status, COUNT(*) as count FROM director_tasks WHERE {where} GROUP BY status",
+        params,
+    ).fetchall()
+    stats = {r["status"]: r["count"] for r in rows}
+    stats["total"] = sum(stats.values())
+    return stats
+
+
 def get_task_stats(user_id: str = "default", project_id: str | None = None) -> dict:
     """Get task counts by status for the dashboard."""
     conn = _get_tasks_db()
     try:
-        conditions = ["user_id = ?"]
-        params: list = [user_id]
-
-        if project_id is not None:
-            conditions.append("project_id = ?")
-            params.append(project_id)
-
-        where = " AND ".join(conditions)
-        rows = conn.execute(
-            f"SELECT status, COUNT(*) as count FROM director_tasks WHERE {where} GROUP BY status",
-            params,
-        ).fetchall()
-        stats = {r["status"]: r["count"] for r in rows}
-        stats["total"] = sum(stats.values())
-        return stats
+        return _count_by_status(conn, user_id, project_id)
     finally:
         conn.close()
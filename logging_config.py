@@ -16,10 +16,12 @@ Environment variables:
                       accepts: DEBUG, INFO, WARNING, ERROR, CRITICAL
 """
 
+import atexit
 import copy
 import logging
 import logging.handlers
 import os
+import queue
 import sys
 from datetime import datetime, timezone
 from pathlib import Path
@@ -164,3 +166,34 @@ def get_logger(name: str) -> logging.Logger:
     ``get_logger("rain.<subsystem>")`` for explicit namespacing.
     """
     return logging.getLogger(name)
+
+
+_console_queue_listener: logging.handlers.QueueListener | None = None
+_console_queue_handler: logging.handlers.QueueHandler | None = None
+
+
+def get_queued_console_logger(name: str) -> logging.Logger:
+    """Return a logger that prints its messages to stdout off the caller's thread.
+
+    Records go into an in-memory queue and a background ``QueueListener``
+    writes them verbatim (``%(message)s``), so hot async handlers can log
+    the way they used to ``print(..., flush=True)`` without blocking the
+    event loop on a stdout write. Does not propagate to the root logger.
+    """
+    global _console_queue_listener, _console_queue_handler
+
+    if _console_queue_handler is None:
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(logging.Formatter("%(message)s"))
+        _console_queue_listener = logging.handlers.QueueListener(log_queue, stream_handler)
+        _console_queue_listener.start()
+        atexit.register(_console_queue_listener.stop)
+        _console_queue_handler = logging.handlers.QueueHandler(log_queue)
+
+    logger = logging.getLogger(name)
+    if _console_queue_handler not in logger.handlers:
+        logger.addHandler(_console_queue_handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
@@ -5,7 +5,7 @@ import json
 import logging
 import sqlite3
 import time
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
 from typing import Any
 
@@ -23,7 +23,7 @@ DEFAULT_REGISTRY_URL = (
 )
 
 
-@dataclass
+@dataclass(slots=True)
 class CategoryInfo:
     id: str
     name: str
@@ -31,7 +31,7 @@ class CategoryInfo:
     emoji: str
 
 
-@dataclass
+@dataclass(slots=True)
 class SkillInfo:
     name: str
     display_name: str
@@ -53,7 +53,7 @@ class SkillInfo:
     checksum_sha256: str
 
 
-@dataclass
+@dataclass(slots=True)
 class InstalledSkill:
     name: str
     version: str
@@ -220,7 +220,7 @@ class MarketplaceRegistry:
         page_results = results[start : start + per_page]
 
         return {
-            "skills": [_skill_from_dict(s).__dict__ for s in page_results],
+            "skills": [asdict(_skill_from_dict(s)) for s in page_results],
             "total": total,
             "page": page,
             "per_page": per_page,
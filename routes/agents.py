@@ -1,10 +1,18 @@
 """Agent data routes: messages, conversation history, memories, alter egos, marketplace."""
 
+import asyncio
+import hashlib
+import itertools
 import json
+import os
+import re
 import time
+from dataclasses import asdict
+from fnmatch import fnmatch
+from operator import itemgetter
 from pathlib import Path
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, BackgroundTasks, Request
 from fastapi.responses import JSONResponse
 
 import database
@@ -13,6 +21,7 @@ from shared_state import (
     MAX_CWD_LENGTH,
     WS_MAX_AGENT_ID_LENGTH,
     _secure_chmod,
+    etag_json_response,
     verify_token,
     get_token,
     _get_user_id_from_request,
@@ -28,6 +37,16 @@ from alter_egos.storage import (
 
 agents_router = APIRouter(tags=["agents"])
 
+# Memory IDs: alphanumeric, hyphens, underscores (max 128 chars)
+_MEMORY_ID_RE = re.compile(r"^[a-zA-Z0-9_-]{1,128}$")
+
+# Characters replaced when a conversation id is embedded in a filename
+_UNSAFE_FILENAME_CHARS_RE = re.compile(r"[^a-zA-Z0-9_-]")
+
+# Older history filenames: {timestamp}_{agent}.json (one underscore after the
+# timestamp; current files use {timestamp}__{safe_id}.json)
+_LEGACY_HISTORY_NAME_RE = re.compile(r"^\d+_[^_].*\.json$")
+
 
 # ---------------------------------------------------------------------------
 # REST: Message persistence
@@ -73,37 +92,159 @@ async def get_metrics(request: Request):
 # ---------------------------------------------------------------------------
 
 
+# Parsed metadata of each history file, keyed by path and revalidated by
+# mtime so a file is only parsed again after it changes on disk.
+# { path: { "path": Path, "mtime": float, "id": str, "summary": dict | None } }
+# Only modified on the event loop; scans work on a copy in a worker thread.
+_history_index: dict[Path, dict] = {}
+
+# Serializes saves so two requests for the same new id cannot both miss the
+# index across the awaited scan and create two files.
+_history_save_lock = asyncio.Lock()
+
+
+# HISTORY_DIR already created and restricted to 0o700 by this process
+_history_dir_ready: Path | None = None
+
+
+def _ensure_history_dir(force: bool = False) -> None:
+    """Create HISTORY_DIR and restrict its permissions once, not per request."""
+    global _history_dir_ready
+    history_dir = shared_state.HISTORY_DIR
+    if _history_dir_ready == history_dir and not force:
+        return
+    history_dir.mkdir(parents=True, exist_ok=True)
+    _secure_chmod(history_dir, 0o700)
+    _history_dir_ready = history_dir
+
+
+def _history_summary(data: dict) -> dict:
+    """Build the list-view summary of a conversation (raises KeyError if incomplete)."""
+    return {
+        "id": data["id"],
+        "createdAt": data["createdAt"],
+        "updatedAt": data["updatedAt"],
+        "label": data.get("label", ""),
+        "cwd": data.get("cwd", ""),
+        "messageCount": data.get("messageCount", 0),
+        "preview": data.get("preview", ""),
+        "totalCost": data.get("totalCost", 0),
+    }
+
+
+def _read_history_entry(path: Path, mtime: float) -> dict:
+    """Parse a history file into an index entry."""
+    entry = {"path": path, "mtime": mtime, "id": path.stem, "summary": None}
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        entry["id"] = str(data.get("id", path.stem))
+        entry["summary"] = _history_summary(data)
+    except (json.JSONDecodeError, KeyError, OSError, AttributeError):
+        pass
+    return entry
+
+
+def _scan_history(known: dict[Path, dict]) -> dict[Path, dict]:
+    """Return index entries for every history file, reusing unchanged *known* ones.
+
+    Uses ``os.scandir`` so the mtime comes from the directory entry instead
+    of a separate ``Path.stat`` per file. Runs in a worker thread and does
+    not touch ``_history_index``.
+    """
+    seen: dict[Path, dict] = {}
+    try:
+        with os.scandir(shared_state.HISTORY_DIR) as it:
+            for dir_entry in it:
+                if not fnmatch(dir_entry.name, shared_state.HISTORY_GLOB):
+                    continue
+                try:
+                    mtime = dir_entry.stat().st_mtime
+                except OSError:
+                    continue
+                path = Path(dir_entry.path)
+                entry = known.get(path)
+                if not entry or entry["mtime"] != mtime:
+                    entry = _read_history_entry(path, mtime)
+                seen[path] = entry
+    except OSError:
+        pass
+    return seen
+
+
+async def _refresh_history() -> list[dict]:
+    """Rescan HISTORY_DIR off the loop and return index entries, newest first."""
+    seen = await asyncio.to_thread(_scan_history, dict(_history_index))
+    _history_index.clear()
+    _history_index.update(seen)
+    return sorted(seen.values(), key=itemgetter("mtime"), reverse=True)
+
+
+def _unlink_all(paths: list[Path]) -> list[Path]:
+    """Delete *paths*, returning the ones actually removed."""
+    removed = []
+    for path in paths:
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        removed.append(path)
+    return removed
+
+
+async def _prune_history(paths: list[Path]) -> None:
+    """Delete history files that fell past MAX_CONVERSATIONS."""
+    for path in await asyncio.to_thread(_unlink_all, paths):
+        _history_index.pop(path, None)
+
+
+def _history_safe_id(conv_id: str) -> str:
+    """Filesystem-safe form of a conversation id, used in history filenames."""
+    return _UNSAFE_FILENAME_CHARS_RE.sub("_", conv_id)[:64]
+
+
+def _find_history_file(conv_id: str) -> tuple[Path, dict] | None:
+    """Locate and parse the history file for *conv_id*.
+
+    Files are named ``{timestamp}__{safe_id}.json`` so only the matching name
+    is opened. Files from the older ``{timestamp}_{agent}.json`` scheme carry
+    no id in the name and are only parsed when no named match is found.
+    Blocking (directory scan and JSON parsing): call via ``asyncio.to_thread``.
+    """
+    history_dir = shared_state.HISTORY_DIR
+    named = history_dir.glob(f"*__{_history_safe_id(conv_id)}.json")
+    legacy = (
+        f for f in history_dir.glob(shared_state.HISTORY_GLOB)
+        if _LEGACY_HISTORY_NAME_RE.match(f.name)
+    )
+    for f in itertools.chain(named, legacy):
+        try:
+            data = json.loads(f.read_text(encoding="utf-8"))
+            if data.get("id") == conv_id:
+                return f, data
+        except (json.JSONDecodeError, OSError, AttributeError):
+            continue
+    return None
+
+
 @agents_router.get("/api/history")
 async def list_conversations(request: Request):
     if not verify_token(get_token(request)):
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
-    shared_state.HISTORY_DIR.mkdir(parents=True, exist_ok=True)
-    _secure_chmod(shared_state.HISTORY_DIR, 0o700)
-    conversations = []
-    for f in sorted(shared_state.HISTORY_DIR.glob(shared_state.HISTORY_GLOB), key=lambda p: p.stat().st_mtime, reverse=True):
-        try:
-            data = json.loads(f.read_text(encoding="utf-8"))
-            conversations.append({
-                "id": data["id"],
-                "createdAt": data["createdAt"],
-                "updatedAt": data["updatedAt"],
-                "label": data.get("label", ""),
-                "cwd": data.get("cwd", ""),
-                "messageCount": data.get("messageCount", 0),
-                "preview": data.get("preview", ""),
-                "totalCost": data.get("totalCost", 0),
-            })
-        except (json.JSONDecodeError, KeyError, OSError):
-            continue
-    return {"conversations": conversations}
+    _ensure_history_dir()
+    entries = await _refresh_history()
+    # The listing only changes when a file is added, removed or rewritten
+    fingerprint = "|".join(f'{e["path"].name}:{e["mtime"]}' for e in entries)
+    etag = 'W/"' + hashlib.blake2b(fingerprint.encode(), digest_size=16).hexdigest() + '"'
+    return etag_json_response(
+        request, {"conversations": [e["summary"] for e in entries if e["summary"]]}, etag,
+    )
 
 
 @agents_router.post("/api/history")
-async def save_conversation(request: Request):
+async def save_conversation(request: Request, background_tasks: BackgroundTasks):
     if not verify_token(get_token(request)):
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
-    shared_state.HISTORY_DIR.mkdir(parents=True, exist_ok=True)
-    _secure_chmod(shared_state.HISTORY_DIR, 0o700)
+    _ensure_history_dir()
     # Enforce max request body size (512 KB)
     raw_body = await request.body()
     if len(raw_body) > 512 * 1024:
@@ -113,38 +254,53 @@ async def save_conversation(request: Request):
         body = json.loads(raw_body)
     except Exception:
         return JSONResponse({"error": "Invalid JSON"}, status_code=400)
+    if not isinstance(body, dict):
+        return JSONResponse({"error": "Conversation must be a JSON object"}, status_code=400)
 
     conv_id = str(body.get("id", f"conv_{int(time.time() * 1000)}"))[:64]
     body["id"] = conv_id
 
-    # Find existing file for this id, or create new filename
-    target = None
-    for f in shared_state.HISTORY_DIR.glob(shared_state.HISTORY_GLOB):
-        try:
-            data = json.loads(f.read_text(encoding="utf-8"))
-            if data.get("id") == conv_id:
-                target = f
-                break
-        except (json.JSONDecodeError, OSError):
-            continue
-
-    if not target:
-        safe_agent = str(body.get("agentId", "default")).replace("/", "_").replace("\\", "_")[:64]
-        target = shared_state.HISTORY_DIR / f"{int(time.time() * 1000)}_{safe_agent}.json"
-
-    target.write_text(json.dumps(body, ensure_ascii=False, indent=2), encoding="utf-8")
-    _secure_chmod(target, 0o600)
+    content = json.dumps(body, ensure_ascii=False, separators=(",", ":"))
+    try:
+        summary = _history_summary(body)
+    except KeyError:
+        summary = None
+
+    async with _history_save_lock:
+        # Find existing file for this id, or create new filename
+        entries = await _refresh_history()
+        target = next((e["path"] for e in entries if e["id"] == conv_id), None)
+
+        is_new = target is None
+        if is_new:
+            target = (
+                shared_state.HISTORY_DIR
+                / f"{int(time.time() * 1000)}__{_history_safe_id(conv_id)}.json"
+            )
 
-    # Enforce max conversations -- delete oldest beyond limit
-    deleted = []
-    files = sorted(shared_state.HISTORY_DIR.glob(shared_state.HISTORY_GLOB), key=lambda p: p.stat().st_mtime, reverse=True)
-    for f in files[shared_state.MAX_CONVERSATIONS:]:
         try:
-            data = json.loads(f.read_text(encoding="utf-8"))
-            deleted.append(data.get("id", f.stem))
-        except Exception:
-            deleted.append(f.stem)
-        f.unlink()
+            target.write_text(content, encoding="utf-8")
+        except FileNotFoundError:
+            # Directory was removed after startup -- recreate it once and retry
+            _ensure_history_dir(force=True)
+            target.write_text(content, encoding="utf-8")
+        if is_new:
+            _secure_chmod(target, 0o600)
+        try:
+            _history_index[target] = {
+                "path": target, "mtime": target.stat().st_mtime, "id": conv_id, "summary": summary,
+            }
+        except OSError:
+            pass
+
+    # Enforce max conversations -- the saved file is now the newest, so the
+    # listing gathered above is enough to find the oldest beyond the limit.
+    # The ids are known up front; the unlinks run after the response is sent.
+    older = [e for e in entries if e["path"] != target]
+    expired = older[shared_state.MAX_CONVERSATIONS - 1:]
+    deleted = [e["id"] for e in expired]
+    if expired:
+        background_tasks.add_task(_prune_history, [e["path"] for e in expired])
 
     return {"saved": True, "id": conv_id, "deleted": deleted}
 
@@ -153,15 +309,10 @@ async def save_conversation(request: Request):
 async def load_conversation(request: Request, conversation_id: str):
     if not verify_token(get_token(request)):
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
-    shared_state.HISTORY_DIR.mkdir(parents=True, exist_ok=True)
-    _secure_chmod(shared_state.HISTORY_DIR, 0o700)
-    for f in shared_state.HISTORY_DIR.glob(shared_state.HISTORY_GLOB):
-        try:
-            data = json.loads(f.read_text(encoding="utf-8"))
-            if data.get("id") == conversation_id:
-                return data
-        except (json.JSONDecodeError, OSError):
-            continue
+    _ensure_history_dir()
+    found = await asyncio.to_thread(_find_history_file, conversation_id)
+    if found:
+        return found[1]
     return JSONResponse({"error": "Not found"}, status_code=404)
 
 
@@ -169,16 +320,15 @@ async def load_conversation(request: Request, conversation_id: str):
 async def delete_conversation(request: Request, conversation_id: str):
     if not verify_token(get_token(request)):
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
-    shared_state.HISTORY_DIR.mkdir(parents=True, exist_ok=True)
-    _secure_chmod(shared_state.HISTORY_DIR, 0o700)
-    for f in shared_state.HISTORY_DIR.glob(shared_state.HISTORY_GLOB):
+    _ensure_history_dir()
+    found = await asyncio.to_thread(_find_history_file, conversation_id)
+    if found:
         try:
-            data = json.loads(f.read_text(encoding="utf-8"))
-            if data.get("id") == conversation_id:
-                f.unlink()
-                return {"deleted": True}
-        except (json.JSONDecodeError, OSError):
-            continue
+            found[0].unlink()
+        except OSError:
+            return JSONResponse({"error": "Not found"}, status_code=404)
+        _history_index.pop(found[0], None)
+        return {"deleted": True}
     return JSONResponse({"error": "Not found"}, status_code=404)
 
 
@@ -186,13 +336,36 @@ async def delete_conversation(request: Request, conversation_id: str):
 # REST API: Memories
 # ---------------------------------------------------------------------------
 
+# Short-lived per-user read caches for the memories and alter-ego GET
+# endpoints: { user_id: (cached_at, value) }. The mutating endpoints below
+# invalidate their user's entry; the TTL bounds staleness from writes made
+# elsewhere (agent tools, Telegram).
+_READ_CACHE_TTL = 2.0
+_READ_CACHE_MAX_USERS = 1024
+_memories_cache: dict[str, tuple[float, list[dict]]] = {}
+_egos_cache: dict[str, tuple[float, dict]] = {}
+
+
+def _cached_read(cache: dict, uid: str, loader):
+    """Return ``loader()`` for *uid*, reusing a result younger than the TTL."""
+    now = time.monotonic()
+    hit = cache.get(uid)
+    if hit and now - hit[0] < _READ_CACHE_TTL:
+        return hit[1]
+    value = loader()
+    if len(cache) >= _READ_CACHE_MAX_USERS:
+        cache.clear()
+    cache[uid] = (now, value)
+    return value
+
 
 @agents_router.get("/api/memories")
 async def api_get_memories(request: Request):
     if not verify_token(get_token(request)):
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
     uid = _get_user_id_from_request(request)
-    return {"memories": load_memories(user_id=uid)}
+    memories = _cached_read(_memories_cache, uid, lambda: load_memories(user_id=uid))
+    return etag_json_response(request, {"memories": memories})
 
 
 @agents_router.post("/api/memories")
@@ -206,6 +379,7 @@ async def api_add_memory(request: Request):
         return JSONResponse({"error": "content is required"}, status_code=400)
     uid = _get_user_id_from_request(request)
     memory = add_memory(content, category, user_id=uid)
+    _memories_cache.pop(uid, None)
     return {"memory": memory}
 
 
@@ -213,9 +387,10 @@ async def api_add_memory(request: Request):
 async def api_delete_memory(request: Request, memory_id: str):
     if not verify_token(get_token(request)):
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
-    if not memory_id or len(memory_id) > 128 or not all(c.isalnum() or c in "-_" for c in memory_id):
+    if not _MEMORY_ID_RE.fullmatch(memory_id):
         return JSONResponse({"error": "Invalid memory ID"}, status_code=400)
     uid = _get_user_id_from_request(request)
+    _memories_cache.pop(uid, None)
     if remove_memory(memory_id, user_id=uid):
         return {"deleted": True}
     return JSONResponse({"error": "Not found"}, status_code=404)
@@ -227,6 +402,7 @@ async def api_clear_memories(request: Request):
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
     uid = _get_user_id_from_request(request)
     count = clear_memories(user_id=uid)
+    _memories_cache.pop(uid, None)
     return {"cleared": count}
 
 
@@ -240,7 +416,10 @@ async def api_get_alter_egos(request: Request):
     if not verify_token(get_token(request)):
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
     uid = _get_user_id_from_request(request)
-    return {"egos": load_all_egos(user_id=uid), "active_ego_id": get_active_ego_id(user_id=uid)}
+    return etag_json_response(request, _cached_read(_egos_cache, uid, lambda: {
+        "egos": load_all_egos(user_id=uid),
+        "active_ego_id": get_active_ego_id(user_id=uid),
+    }))
 
 
 @agents_router.post("/api/alter-egos")
@@ -251,6 +430,7 @@ async def api_save_alter_ego(request: Request):
     body = await request.json()
     try:
         path = save_ego(body, user_id=uid)
+        _egos_cache.pop(uid, None)
         return {"saved": True, "path": str(path)}
     except ValueError as e:
         return JSONResponse({"error": str(e)}, status_code=400)
@@ -261,6 +441,7 @@ async def api_delete_alter_ego(request: Request, ego_id: str):
     if not verify_token(get_token(request)):
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
     uid = _get_user_id_from_request(request)
+    _egos_cache.pop(uid, None)
     try:
         if delete_ego(ego_id, user_id=uid):
             return {"deleted": True}
@@ -292,7 +473,7 @@ async def api_marketplace_search(request: Request, q: str = "", category: str =
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
     mp = _get_marketplace()
     await mp.refresh_index()
-    return mp.search_skills(query=q, category=category, tag=tag, page=page)
+    return etag_json_response(request, mp.search_skills(query=q, category=category, tag=tag, page=page))
 
 
 @agents_router.get("/api/marketplace/skills/{skill_name}")
@@ -305,7 +486,7 @@ async def api_marketplace_skill_info(request: Request, skill_name: str):
     if not info:
         return JSONResponse({"error": "Skill not found"}, status_code=404)
     installed_version = mp.get_installed_version(skill_name)
-    return {"skill": info.__dict__, "installed_version": installed_version}
+    return {"skill": asdict(info), "installed_version": installed_version}
 
 
 @agents_router.get("/api/marketplace/categories")
@@ -314,7 +495,7 @@ async def api_marketplace_categories(request: Request):
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
     mp = _get_marketplace()
     await mp.refresh_index()
-    return {"categories": [c.__dict__ for c in mp.get_categories()]}
+    return etag_json_response(request, {"categories": [asdict(c) for c in mp.get_categories()]})
 
 
 @agents_router.post("/api/marketplace/install/{skill_name}")
@@ -345,7 +526,7 @@ async def api_marketplace_installed(request: Request):
     if not verify_token(get_token(request)):
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
     mp = _get_marketplace()
-    return {"skills": [s.__dict__ for s in mp.list_installed()]}
+    return {"skills": [asdict(s) for s in mp.list_installed()]}
 
 
 @agents_router.get("/api/marketplace/updates")
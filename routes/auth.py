@@ -1,17 +1,21 @@
 """Authentication, session management, device management, and OAuth routes."""
 
+import asyncio
 import hashlib
 import json
+import random
+import re
 import secrets
 import time
+from collections import deque
 from pathlib import Path
 
-import bcrypt
 from fastapi import APIRouter, Request
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 
 import database
+from logging_config import get_queued_console_logger
 from shared_state import (
     active_tokens,
     _active_ws_by_device,
@@ -19,15 +23,21 @@ from shared_state import (
     _auth_attempts,
     _oauth_login_process,
     _hash_token,
+    _add_active_token,
+    _get_token_hash,
+    _verify_token_hash,
     config,
     CONFIG_FILE,
     TOKEN_TTL_SECONDS,
     MAX_PIN_ATTEMPTS,
     LOCKOUT_SECONDS,
+    MAX_TRACKED_AUTH_IPS,
     MAX_DEVICES,
     _get_real_ip,
     _secure_chmod,
     _find_claude_cli,
+    verify_pin,
+    pin_busy_response,
     verify_token,
     get_token,
 )
@@ -35,6 +45,11 @@ import shared_state
 
 auth_router = APIRouter(tags=["auth"])
 
+logger = get_queued_console_logger("rain.auth")
+
+# Device IDs are client-generated: alphanumeric, hyphens, underscores
+_DEVICE_ID_RE = re.compile(r"^[a-zA-Z0-9_-]{1,64}$")
+
 
 # ---------------------------------------------------------------------------
 # Input validation models
@@ -47,6 +62,131 @@ class AuthRequest(BaseModel):
     replace_device_id: str = Field(default="", max_length=64)
 
 
+# Fraction of requests that purge expired sessions inline. The hourly
+# _cleanup_expired_tokens task in server.py covers quiet servers.
+SESSION_CLEANUP_PROBABILITY = 0.01
+
+
+def _maybe_cleanup_sessions() -> None:
+    """Occasionally delete expired sessions from the DB."""
+    if random.random() < SESSION_CLEANUP_PROBABILITY:
+        database.cleanup_expired_sessions(TOKEN_TTL_SECONDS)
+
+
+# ---------------------------------------------------------------------------
+# PIN lockout helpers (shared by every PIN-checking endpoint)
+# ---------------------------------------------------------------------------
+
+
+def _check_lockout(client_ip: str, now: float) -> JSONResponse | None:
+    """Return a 429 response if *client_ip* is locked out at *now*, else None."""
+    record = _auth_attempts.get(client_ip)
+    if not record or not record["locked_until"]:
+        return None
+    remaining = record["locked_until"] - now
+    if remaining <= 0:
+        # Lockout expired -- reset
+        del _auth_attempts[client_ip]
+        return None
+    mins = int(remaining // 60)
+    secs = int(remaining % 60)
+    logger.info(f"  [AUTH] IP {client_ip} is locked out ({mins}m {secs}s remaining)")
+    return JSONResponse({
+        "error": "Too many failed attempts. Try again later.",
+        "locked": True,
+        "remaining_seconds": int(remaining),
+    }, status_code=429)
+
+
+def _is_stale_attempt_record(record: dict, now: float) -> bool:
+    """True once a record's lockout has expired or its failures aged out."""
+    if record["locked_until"]:
+        return record["locked_until"] <= now
+    failures = record.get("failures")
+    return not failures or now - failures[-1] >= LOCKOUT_SECONDS
+
+
+def _evict_auth_attempts(now: float) -> None:
+    """Make room in _auth_attempts: drop stale records, then the oldest."""
+    for ip in [ip for ip, r in _auth_attempts.items() if _is_stale_attempt_record(r, now)]:
+        del _auth_attempts[ip]
+    while len(_auth_attempts) >= MAX_TRACKED_AUTH_IPS:
+        del _auth_attempts[next(iter(_auth_attempts))]
+
+
+def _record_failed_pin(client_ip: str, endpoint: str, now: float) -> JSONResponse:
+    """Count a failed PIN for *client_ip* and build the 401/429 response.
+
+    Only failures within the last LOCKOUT_SECONDS count toward the
+    MAX_PIN_ATTEMPTS lockout, so occasional typos spread over time never
+    lock a client out.
+    """
+    database.log_security_event(
+        "auth_failed", "warning", client_ip=client_ip, endpoint=endpoint,
+    )
+    # Re-insert so the dict stays in least-recently-failed order
+    record = _auth_attempts.pop(client_ip, None)
+    if record is None:
+        record = {"failures": deque(maxlen=MAX_PIN_ATTEMPTS), "locked_until": 0}
+        if len(_auth_attempts) >= MAX_TRACKED_AUTH_IPS:
+            _evict_auth_attempts(now)
+    _auth_attempts[client_ip] = record
+    failures = record["failures"]
+    failures.append(now)
+    while now - failures[0] >= LOCKOUT_SECONDS:
+        failures.popleft()
+    attempts = len(failures)
+    remaining_attempts = MAX_PIN_ATTEMPTS - attempts
+
+    if attempts >= MAX_PIN_ATTEMPTS:
+        record["locked_until"] = now + LOCKOUT_SECONDS
+        logger.info(f"  [AUTH] IP {client_ip} LOCKED OUT after {attempts} failed attempts")
+        database.log_security_event(
+            "auth_locked", "critical", client_ip=client_ip, endpoint=endpoint,
+        )
+        return JSONResponse({
+            "error": "Too many failed attempts. Try again later.",
+            "locked": True,
+            "remaining_seconds": LOCKOUT_SECONDS,
+        }, status_code=429)
+
+    return JSONResponse({
+        "error": "Invalid PIN",
+        "remaining_attempts": remaining_attempts,
+    }, status_code=401)
+
+
+async def _pin_auth(request: Request) -> tuple[str, dict] | JSONResponse:
+    """Authenticate a pre-login request by the PIN in its JSON body.
+
+    Handles lockout, body parsing, bcrypt verification and failed-attempt
+    tracking. Returns ``(client_ip, body)`` on success, or the error
+    response the endpoint should return as-is.
+    """
+    client_ip = _get_real_ip(request)
+    now = time.time()
+
+    locked = _check_lockout(client_ip, now)
+    if locked:
+        return locked
+
+    try:
+        body = await request.json()
+        pin = str(body.get("pin", "")).strip()
+    except Exception:
+        return JSONResponse({"error": "Invalid request body"}, status_code=400)
+
+    if not pin or len(pin) > 20:
+        return JSONResponse({"error": "Invalid PIN"}, status_code=400)
+
+    pin_valid = await verify_pin(pin, config.get("pin_hash", ""))
+    if pin_valid is None:
+        return pin_busy_response()
+    if not pin_valid:
+        return _record_failed_pin(client_ip, request.url.path, now)
+    return client_ip, body
+
+
 # ---------------------------------------------------------------------------
 # REST: Authentication
 # ---------------------------------------------------------------------------
@@ -55,23 +195,12 @@ class AuthRequest(BaseModel):
 @auth_router.post("/api/auth")
 async def authenticate(request: Request):
     client_ip = _get_real_ip(request)
+    now = time.time()
 
     # Check if this IP is currently locked out
-    record = _auth_attempts.get(client_ip)
-    if record:
-        remaining = record["locked_until"] - time.time()
-        if remaining > 0:
-            mins = int(remaining // 60)
-            secs = int(remaining % 60)
-            print(f"  [AUTH] IP {client_ip} is locked out ({mins}m {secs}s remaining)", flush=True)
-            return JSONResponse({
-                "error": "Too many failed attempts. Try again later.",
-                "locked": True,
-                "remaining_seconds": int(remaining),
-            }, status_code=429)
-        else:
-            # Lockout expired -- reset
-            del _auth_attempts[client_ip]
+    locked = _check_lockout(client_ip, now)
+    if locked:
+        return locked
 
     try:
         body = await request.json()
@@ -86,42 +215,14 @@ async def authenticate(request: Request):
     pin_hash = config.get("pin_hash", "")
 
     # Verify PIN against bcrypt hash (never log PIN values)
-    try:
-        pin_valid = bool(pin) and bcrypt.checkpw(
-            pin.encode("utf-8"), pin_hash.encode("utf-8")
-        )
-    except Exception:
-        pin_valid = False
+    pin_valid = await verify_pin(pin, pin_hash)
+    if pin_valid is None:
+        return pin_busy_response()
 
-    print(f"  [AUTH] attempt from ip={client_ip} valid={pin_valid}", flush=True)
+    logger.info(f"  [AUTH] attempt from ip={client_ip} valid={pin_valid}")
 
     if not pin_valid:
-        database.log_security_event(
-            "auth_failed", "warning", client_ip=client_ip, endpoint="/api/auth",
-        )
-        # Track failed attempt
-        if client_ip not in _auth_attempts:
-            _auth_attempts[client_ip] = {"attempts": 0, "locked_until": 0}
-        _auth_attempts[client_ip]["attempts"] += 1
-        attempts = _auth_attempts[client_ip]["attempts"]
-        remaining_attempts = MAX_PIN_ATTEMPTS - attempts
-
-        if attempts >= MAX_PIN_ATTEMPTS:
-            _auth_attempts[client_ip]["locked_until"] = time.time() + LOCKOUT_SECONDS
-            print(f"  [AUTH] IP {client_ip} LOCKED OUT after {attempts} failed attempts", flush=True)
-            database.log_security_event(
-                "auth_locked", "critical", client_ip=client_ip, endpoint="/api/auth",
-            )
-            return JSONResponse({
-                "error": "Too many failed attempts. Try again later.",
-                "locked": True,
-                "remaining_seconds": LOCKOUT_SECONDS,
-            }, status_code=429)
-
-        return JSONResponse({
-            "error": "Invalid PIN",
-            "remaining_attempts": remaining_attempts,
-        }, status_code=401)
+        return _record_failed_pin(client_ip, "/api/auth", now)
 
     # Successful auth -- clear any attempt tracking for this IP
     _auth_attempts.pop(client_ip, None)
@@ -130,8 +231,9 @@ async def authenticate(request: Request):
     device_name = auth_req.device_name.strip()
     user_agent = request.headers.get("user-agent", "")[:200]
 
-    # Clean expired sessions before checking device limit
-    database.cleanup_expired_sessions(TOKEN_TTL_SECONDS)
+    # Expired sessions are ignored by the device count, so purging them
+    # here is only housekeeping
+    _maybe_cleanup_sessions()
 
     # If this device already has a session, revoke old token and reuse slot
     if device_id:
@@ -142,7 +244,7 @@ async def authenticate(request: Request):
             active_tokens.pop(old_hash, None)
             database.revoke_session(old_hash)
             _token_device_map.pop(old_hash, None)
-            print(f"  [AUTH] Device {device_id[:8]}... re-authenticated, old token revoked", flush=True)
+            logger.info(f"  [AUTH] Device {device_id[:8]}... re-authenticated, old token revoked")
         else:
             # New device -- check limit
             device_count = database.count_active_devices(TOKEN_TTL_SECONDS)
@@ -168,7 +270,7 @@ async def authenticate(request: Request):
                             client_ip=client_ip, endpoint="/api/auth",
                             details=f"replaced={replace_id[:8]}... by={device_id[:8]}...",
                         )
-                        print(f"  [AUTH] Device {replace_id[:8]}... replaced by {device_id[:8]}...", flush=True)
+                        logger.info(f"  [AUTH] Device {replace_id[:8]}... replaced by {device_id[:8]}...")
                     else:
                         return JSONResponse({
                             "error": "device_limit_reached",
@@ -187,7 +289,7 @@ async def authenticate(request: Request):
 
     token = secrets.token_urlsafe(32)
     token_hash = _hash_token(token)
-    active_tokens[token_hash] = time.time() + TOKEN_TTL_SECONDS
+    _add_active_token(token_hash, now + TOKEN_TTL_SECONDS)
 
     # Track session in database (with encrypted token for persistence across restarts)
     encrypted_token = database.encrypt_field(token)
@@ -198,7 +300,7 @@ async def authenticate(request: Request):
     if device_id:
         _token_device_map[token_hash] = device_id
 
-    return {"token": token}
+    return JSONResponse({"token": token})
 
 
 # ---------------------------------------------------------------------------
@@ -213,62 +315,13 @@ async def list_devices_with_pin(request: Request):
     Used when a new device hits the device limit and needs to choose
     which existing device to replace.
     """
-    client_ip = _get_real_ip(request)
-
-    # Check lockout (same as /api/auth)
-    record = _auth_attempts.get(client_ip)
-    if record:
-        remaining = record["locked_until"] - time.time()
-        if remaining > 0:
-            return JSONResponse({
-                "error": "Too many failed attempts. Try again later.",
-                "locked": True,
-                "remaining_seconds": int(remaining),
-            }, status_code=429)
-        else:
-            del _auth_attempts[client_ip]
-
-    try:
-        body = await request.json()
-        pin = str(body.get("pin", "")).strip()
-    except Exception:
-        return JSONResponse({"error": "Invalid request body"}, status_code=400)
-
-    if not pin or len(pin) > 20:
-        return JSONResponse({"error": "Invalid PIN"}, status_code=400)
-
-    pin_hash = config.get("pin_hash", "")
-    try:
-        pin_valid = bool(pin) and bcrypt.checkpw(
-            pin.encode("utf-8"), pin_hash.encode("utf-8")
-        )
-    except Exception:
-        pin_valid = False
-
-    if not pin_valid:
-        # Track failed attempt (same counter as /api/auth)
-        if client_ip not in _auth_attempts:
-            _auth_attempts[client_ip] = {"attempts": 0, "locked_until": 0}
-        _auth_attempts[client_ip]["attempts"] += 1
-        attempts = _auth_attempts[client_ip]["attempts"]
-        remaining_attempts = MAX_PIN_ATTEMPTS - attempts
-
-        if attempts >= MAX_PIN_ATTEMPTS:
-            _auth_attempts[client_ip]["locked_until"] = time.time() + LOCKOUT_SECONDS
-            return JSONResponse({
-                "error": "Too many failed attempts. Try again later.",
-                "locked": True,
-                "remaining_seconds": LOCKOUT_SECONDS,
-            }, status_code=429)
-
-        return JSONResponse({
-            "error": "Invalid PIN",
-            "remaining_attempts": remaining_attempts,
-        }, status_code=401)
+    auth = await _pin_auth(request)
+    if isinstance(auth, JSONResponse):
+        return auth
 
     # PIN valid -- return device list (no token created)
-    database.cleanup_expired_sessions(TOKEN_TTL_SECONDS)
-    devices = database.get_active_devices()
+    _maybe_cleanup_sessions()
+    devices = database.get_active_devices(TOKEN_TTL_SECONDS)
     result = []
     for d in devices:
         result.append({
@@ -278,7 +331,7 @@ async def list_devices_with_pin(request: Request):
             "created_at": d["created_at"],
             "last_activity": d["last_activity"],
         })
-    return {"devices": result, "max_devices": shared_state.MAX_DEVICES}
+    return JSONResponse({"devices": result, "max_devices": shared_state.MAX_DEVICES})
 
 
 @auth_router.post("/api/auth/revoke-device")
@@ -287,61 +340,15 @@ async def revoke_device_with_pin(request: Request):
 
     Used from the device replacement flow to free a slot without logging in.
     """
-    client_ip = _get_real_ip(request)
-
-    # Check lockout
-    record = _auth_attempts.get(client_ip)
-    if record:
-        remaining = record["locked_until"] - time.time()
-        if remaining > 0:
-            return JSONResponse({
-                "error": "Too many failed attempts. Try again later.",
-                "locked": True,
-                "remaining_seconds": int(remaining),
-            }, status_code=429)
-        else:
-            del _auth_attempts[client_ip]
+    auth = await _pin_auth(request)
+    if isinstance(auth, JSONResponse):
+        return auth
+    client_ip, body = auth
 
-    try:
-        body = await request.json()
-        pin = str(body.get("pin", "")).strip()
-        device_id = str(body.get("device_id", "")).strip()
-    except Exception:
-        return JSONResponse({"error": "Invalid request body"}, status_code=400)
-
-    if not pin or len(pin) > 20:
-        return JSONResponse({"error": "Invalid PIN"}, status_code=400)
+    device_id = str(body.get("device_id", "")).strip()
     if not device_id:
         return JSONResponse({"error": "device_id required"}, status_code=400)
 
-    pin_hash = config.get("pin_hash", "")
-    try:
-        pin_valid = bool(pin) and bcrypt.checkpw(
-            pin.encode("utf-8"), pin_hash.encode("utf-8")
-        )
-    except Exception:
-        pin_valid = False
-
-    if not pin_valid:
-        if client_ip not in _auth_attempts:
-            _auth_attempts[client_ip] = {"attempts": 0, "locked_until": 0}
-        _auth_attempts[client_ip]["attempts"] += 1
-        attempts = _auth_attempts[client_ip]["attempts"]
-        remaining_attempts = MAX_PIN_ATTEMPTS - attempts
-
-        if attempts >= MAX_PIN_ATTEMPTS:
-            _auth_attempts[client_ip]["locked_until"] = time.time() + LOCKOUT_SECONDS
-            return JSONResponse({
-                "error": "Too many failed attempts. Try again later.",
-                "locked": True,
-                "remaining_seconds": LOCKOUT_SECONDS,
-            }, status_code=429)
-
-        return JSONResponse({
-            "error": "Invalid PIN",
-            "remaining_attempts": remaining_attempts,
-        }, status_code=401)
-
     # PIN valid -- revoke the target device
     session = database.get_session_by_device_id(device_id)
     if not session:
@@ -365,8 +372,8 @@ async def revoke_device_with_pin(request: Request):
         client_ip=client_ip, endpoint="/api/auth/revoke-device",
         details=f"revoked device_id={device_id[:8]}...",
     )
-    print(f"  [AUTH] Device {device_id[:8]}... revoked via PIN from {client_ip}", flush=True)
-    return {"revoked": True, "device_id": device_id}
+    logger.info(f"  [AUTH] Device {device_id[:8]}... revoked via PIN from {client_ip}")
+    return JSONResponse({"revoked": True, "device_id": device_id})
 
 
 @auth_router.post("/api/auth/revoke-all")
@@ -376,65 +383,18 @@ async def revoke_all_devices_with_pin(request: Request):
     Used when a new device hits the device limit and wants to clear all
     existing sessions before logging in.
     """
-    client_ip = _get_real_ip(request)
-
-    # Check lockout
-    record = _auth_attempts.get(client_ip)
-    if record:
-        remaining = record["locked_until"] - time.time()
-        if remaining > 0:
-            return JSONResponse({
-                "error": "Too many failed attempts. Try again later.",
-                "locked": True,
-                "remaining_seconds": int(remaining),
-            }, status_code=429)
-        else:
-            del _auth_attempts[client_ip]
-
-    try:
-        body = await request.json()
-        pin = str(body.get("pin", "")).strip()
-    except Exception:
-        return JSONResponse({"error": "Invalid request body"}, status_code=400)
-
-    if not pin or len(pin) > 20:
-        return JSONResponse({"error": "Invalid PIN"}, status_code=400)
-
-    pin_hash = config.get("pin_hash", "")
-    try:
-        pin_valid = bool(pin) and bcrypt.checkpw(
-            pin.encode("utf-8"), pin_hash.encode("utf-8")
-        )
-    except Exception:
-        pin_valid = False
+    auth = await _pin_auth(request)
+    if isinstance(auth, JSONResponse):
+        return auth
+    client_ip, _body = auth
 
-    if not pin_valid:
-        if client_ip not in _auth_attempts:
-            _auth_attempts[client_ip] = {"attempts": 0, "locked_until": 0}
-        _auth_attempts[client_ip]["attempts"] += 1
-        attempts = _auth_attempts[client_ip]["attempts"]
-        remaining_attempts = MAX_PIN_ATTEMPTS - attempts
-
-        if attempts >= MAX_PIN_ATTEMPTS:
-            _auth_attempts[client_ip]["locked_until"] = time.time() + LOCKOUT_SECONDS
-            return JSONResponse({
-                "error": "Too many failed attempts. Try again later.",
-                "locked": True,
-                "remaining_seconds": LOCKOUT_SECONDS,
-            }, status_code=429)
-
-        return JSONResponse({
-            "error": "Invalid PIN",
-            "remaining_attempts": remaining_attempts,
-        }, status_code=401)
-
-    # PIN valid -- close all WebSockets and revoke all sessions
-    for dev_id, ws in list(_active_ws_by_device.items()):
-        try:
-            await ws.close(code=4003, reason="All devices revoked")
-        except Exception:
-            pass
+    # PIN valid -- close all WebSockets (concurrently) and revoke all sessions
+    sockets = list(_active_ws_by_device.values())
     _active_ws_by_device.clear()
+    await asyncio.gather(
+        *(ws.close(code=4003, reason="All devices revoked") for ws in sockets),
+        return_exceptions=True,
+    )
 
     active_tokens.clear()
     _token_device_map.clear()
@@ -445,8 +405,8 @@ async def revoke_all_devices_with_pin(request: Request):
         client_ip=client_ip, endpoint="/api/auth/revoke-all",
         details=f"sessions_cleared={sessions_cleared}",
     )
-    print(f"  [AUTH] All {sessions_cleared} sessions revoked via PIN from {client_ip}", flush=True)
-    return {"revoked_all": True, "count": sessions_cleared}
+    logger.info(f"  [AUTH] All {sessions_cleared} sessions revoked via PIN from {client_ip}")
+    return JSONResponse({"revoked_all": True, "count": sessions_cleared})
 
 
 # ---------------------------------------------------------------------------
@@ -458,18 +418,19 @@ async def revoke_all_devices_with_pin(request: Request):
 async def logout(request: Request):
     """Revoke the current token."""
     token = get_token(request)
-    if not token or not verify_token(token):
+    token_hash = _get_token_hash(request)
+    if not token_hash or not _verify_token_hash(token_hash):
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
 
     client_ip = _get_real_ip(request)
-    token_hash = _hash_token(token)
     active_tokens.pop(token_hash, None)
+    _token_device_map.pop(token_hash, None)
     database.revoke_session(token_hash)
     database.log_security_event(
         "token_revoked", "info", client_ip=client_ip,
         token_prefix=token[:8], endpoint="/api/logout",
     )
-    return {"logged_out": True}
+    return JSONResponse({"logged_out": True})
 
 
 @auth_router.post("/api/logout-all")
@@ -489,12 +450,9 @@ async def logout_all(request: Request):
     pin = str(body.get("pin", "")).strip()
     pin_hash = config.get("pin_hash", "")
 
-    try:
-        pin_valid = bool(pin) and bcrypt.checkpw(
-            pin.encode("utf-8"), pin_hash.encode("utf-8")
-        )
-    except Exception:
-        pin_valid = False
+    pin_valid = await verify_pin(pin, pin_hash)
+    if pin_valid is None:
+        return pin_busy_response()
 
     if not pin_valid:
         database.log_security_event(
@@ -505,6 +463,7 @@ async def logout_all(request: Request):
 
     count = len(active_tokens)
     active_tokens.clear()
+    _token_device_map.clear()
     sessions_cleared = database.revoke_all_sessions()
     database.log_security_event(
         "token_revoked", "critical", client_ip=client_ip,
@@ -512,7 +471,7 @@ async def logout_all(request: Request):
         details=f"logout_all: {count} tokens, {sessions_cleared} sessions cleared",
         endpoint="/api/logout-all",
     )
-    return {"logged_out_all": True, "tokens_revoked": count}
+    return JSONResponse({"logged_out_all": True, "tokens_revoked": count})
 
 
 # ---------------------------------------------------------------------------
@@ -523,15 +482,12 @@ async def logout_all(request: Request):
 @auth_router.get("/api/devices")
 async def list_devices(request: Request):
     """List all active devices."""
-    token = get_token(request)
-    if not token or not verify_token(token):
+    current_hash = _get_token_hash(request)
+    if not current_hash or not _verify_token_hash(current_hash):
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
 
-    # Clean expired before listing
-    database.cleanup_expired_sessions(TOKEN_TTL_SECONDS)
-
-    current_hash = _hash_token(token)
-    devices = database.get_active_devices()
+    _maybe_cleanup_sessions()
+    devices = database.get_active_devices(TOKEN_TTL_SECONDS)
     result = []
     for d in devices:
         result.append({
@@ -542,23 +498,22 @@ async def list_devices(request: Request):
             "last_activity": d["last_activity"],
             "is_current": d["token_hash"] == current_hash,
         })
-    return {"devices": result, "max_devices": shared_state.MAX_DEVICES}
+    return JSONResponse({"devices": result, "max_devices": shared_state.MAX_DEVICES})
 
 
 @auth_router.delete("/api/devices/{device_id}")
 async def revoke_device(request: Request, device_id: str):
     """Revoke a specific device by its device_id."""
-    token = get_token(request)
-    if not token or not verify_token(token):
+    current_hash = _get_token_hash(request)
+    if not current_hash or not _verify_token_hash(current_hash):
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
 
-    if not device_id or len(device_id) > 64 or not device_id.isalnum() and not all(c.isalnum() or c in "-_" for c in device_id):
+    if not _DEVICE_ID_RE.fullmatch(device_id):
         return JSONResponse({"error": "Invalid device ID"}, status_code=400)
 
     client_ip = _get_real_ip(request)
 
     # Prevent revoking self
-    current_hash = _hash_token(token)
     session = database.get_session_by_device_id(device_id)
     if not session:
         return JSONResponse({"error": "Device not found"}, status_code=404)
@@ -583,7 +538,7 @@ async def revoke_device(request: Request, device_id: str):
         "device_revoked", "warning", client_ip=client_ip,
         endpoint="/api/devices", details=f"revoked device_id={device_id[:8]}...",
     )
-    return {"revoked": True, "device_id": device_id}
+    return JSONResponse({"revoked": True, "device_id": device_id})
 
 
 @auth_router.patch("/api/devices/{device_id}")
@@ -593,7 +548,7 @@ async def rename_device_endpoint(request: Request, device_id: str):
     if not token or not verify_token(token):
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
 
-    if not device_id or len(device_id) > 64 or not all(c.isalnum() or c in "-_" for c in device_id):
+    if not _DEVICE_ID_RE.fullmatch(device_id):
         return JSONResponse({"error": "Invalid device ID"}, status_code=400)
 
     try:
@@ -606,7 +561,7 @@ async def rename_device_endpoint(request: Request, device_id: str):
         return JSONResponse({"error": "Invalid device name"}, status_code=400)
 
     if database.rename_device(device_id, new_name):
-        return {"renamed": True, "device_id": device_id, "name": new_name}
+        return JSONResponse({"renamed": True, "device_id": device_id, "name": new_name})
     return JSONResponse({"error": "Device not found"}, status_code=404)
 
 
@@ -614,6 +569,32 @@ async def rename_device_endpoint(request: Request, device_id: str):
 # REST: Check Claude OAuth credentials
 # ---------------------------------------------------------------------------
 
+# Parsed ~/.claude/.credentials.json keyed by (mtime_ns, size):
+# (mtime_ns, size, creds). The login-status UI polls these endpoints, and
+# the file rarely changes, so an unchanged file costs one stat().
+_creds_cache: tuple[int, int, dict] | None = None
+
+
+def _load_claude_credentials() -> dict | None:
+    """Return the parsed Claude CLI credentials file, or None if unreadable."""
+    global _creds_cache
+    creds_path = Path.home() / ".claude" / ".credentials.json"
+    try:
+        st = creds_path.stat()
+    except OSError:
+        return None
+    cached = _creds_cache
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
+    try:
+        creds = json.loads(creds_path.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    if not isinstance(creds, dict):
+        return None
+    _creds_cache = (st.st_mtime_ns, st.st_size, creds)
+    return creds
+
 
 @auth_router.get("/api/check-oauth")
 async def check_oauth(request: Request):
@@ -621,10 +602,9 @@ async def check_oauth(request: Request):
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
 
     # Method 1: Check credentials file (Windows, some Linux)
-    creds_path = Path.home() / ".claude" / ".credentials.json"
-    if creds_path.exists():
+    creds = _load_claude_credentials()
+    if creds:
         try:
-            creds = json.loads(creds_path.read_text(encoding="utf-8"))
             oauth = creds.get("claudeAiOauth", {})
             if oauth.get("accessToken"):
                 expires_at = oauth.get("expiresAt", 0)
@@ -642,17 +622,22 @@ async def check_oauth(request: Request):
     cli = _find_claude_cli()
     if cli:
         try:
-            import subprocess
             import os
             env = {**os.environ}
             env.pop("CLAUDE_CODE_ENTRYPOINT", None)
             env.pop("CLAUDECODE", None)
-            result = subprocess.run(
-                [cli, "auth", "status"],
-                env=env, capture_output=True, text=True, timeout=10,
+            proc = await asyncio.create_subprocess_exec(
+                cli, "auth", "status", env=env,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
             )
-            status_out = (result.stdout + result.stderr).lower()
-            if result.returncode == 0 and "logged in" in status_out:
+            try:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=10)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                raise
+            status_out = (stdout + stderr).decode("utf-8", errors="replace").lower()
+            if proc.returncode == 0 and "logged in" in status_out:
                 return JSONResponse({
                     "available": True,
                     "subscriptionType": "unknown",
@@ -680,15 +665,16 @@ async def trigger_oauth_login(request: Request):
     if not verify_token(get_token(request)):
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
 
+    now = time.time()
+
     # Check if already logged in
-    creds_path = Path.home() / ".claude" / ".credentials.json"
-    if creds_path.exists():
+    creds = _load_claude_credentials()
+    if creds:
         try:
-            creds = json.loads(creds_path.read_text(encoding="utf-8"))
             oauth = creds.get("claudeAiOauth", {})
             if oauth.get("accessToken"):
                 expires_at = oauth.get("expiresAt", 0)
-                if expires_at > (time.time() * 1000):
+                if expires_at > now * 1000:
                     return JSONResponse({
                         "status": "already_logged_in",
                         "subscriptionType": oauth.get("subscriptionType", "unknown"),
@@ -722,12 +708,16 @@ async def trigger_oauth_login(request: Request):
             [cli, "auth", "login"],
             env=env,
         )
-        shared_state._oauth_login_process = {"process": proc, "started": time.time()}
+        shared_state._oauth_login_process = {"process": proc, "started": now}
         return JSONResponse({"status": "login_started"})
     except Exception:
         return JSONResponse({"error": "Failed to start OAuth login"}, status_code=500)
 
 
+# Config values written once the OAuth login completes
+_OAUTH_CONFIG = {"default_provider": "claude", "auth_mode": "oauth", "_setup_complete": True}
+
+
 @auth_router.get("/api/oauth-login-status")
 async def oauth_login_status(request: Request):
     """Check if the OAuth login process completed and credentials exist."""
@@ -735,13 +725,12 @@ async def oauth_login_status(request: Request):
         return JSONResponse({"error": "Unauthorized"}, status_code=401)
 
     # Check if credentials now exist
-    creds_path = Path.home() / ".claude" / ".credentials.json"
+    creds = _load_claude_credentials()
     logged_in = False
     sub_type = "unknown"
 
-    if creds_path.exists():
+    if creds:
         try:
-            creds = json.loads(creds_path.read_text(encoding="utf-8"))
             oauth = creds.get("claudeAiOauth", {})
             if oauth.get("accessToken"):
                 logged_in = True
@@ -763,20 +752,19 @@ async def oauth_login_status(request: Request):
                 proc_running = False
 
     if logged_in:
-        # Auto-save oauth mode to config
-        try:
-            cfg = {}
-            if CONFIG_FILE.exists():
-                cfg = json.loads(CONFIG_FILE.read_text(encoding="utf-8"))
-            cfg["default_provider"] = "claude"
-            cfg["auth_mode"] = "oauth"
-            cfg.pop("default_api_key", None)
-            cfg["_setup_complete"] = True
-            CONFIG_FILE.write_text(json.dumps(cfg, indent=2), encoding="utf-8")
-            _secure_chmod(CONFIG_FILE, 0o600)
-            config.update(cfg)
-        except Exception:
-            pass
+        # Auto-save oauth mode to config (once; later polls skip the rewrite)
+        if any(config.get(k) != v for k, v in _OAUTH_CONFIG.items()):
+            try:
+                cfg = {}
+                if CONFIG_FILE.exists():
+                    cfg = json.loads(CONFIG_FILE.read_text(encoding="utf-8"))
+                cfg.update(_OAUTH_CONFIG)
+                cfg.pop("default_api_key", None)
+                CONFIG_FILE.write_text(json.dumps(cfg, indent=2), encoding="utf-8")
+                _secure_chmod(CONFIG_FILE, 0o600)
+                config.update(cfg)
+            except Exception:
+                pass
 
         shared_state._oauth_login_process = None
         return JSONResponse({
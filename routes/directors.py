@@ -6,25 +6,36 @@ match e.g. "tasks" as a director_id and return 404.
 """
 
 import asyncio
-import time
+import hashlib
+import json
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Depends, Request
 from fastapi.responses import JSONResponse
 
-from shared_state import verify_token, get_token, _get_user_id_from_request
+from shared_state import (
+    UnauthorizedError,
+    etag_json_response,
+    etag_raw_json_response,
+    not_modified,
+    _get_token_hash,
+    _verify_token_hash,
+    _get_user_id_from_request,
+)
 
 from directors.storage import (
     add_director, list_directors, get_director, update_director,
     delete_director, enable_director, disable_director, mark_director_run,
+    queue_director_run,
     create_project, list_projects, get_project, update_project,
     delete_project, count_projects, MAX_PROJECTS_PER_USER,
+    get_activity_timeline, directors_etag,
 )
 from directors.task_queue import (
-    list_tasks as list_dir_tasks, get_task as get_dir_task,
+    list_tasks_with_stats as list_dir_tasks_with_stats, get_task as get_dir_task,
     cancel_task, get_task_stats,
 )
 from directors.inbox import (
-    list_inbox, get_inbox_item, update_inbox_status, get_unread_count,
+    list_inbox_with_unread, get_inbox_item, update_inbox_status, get_unread_count,
 )
 from directors.builtin import (
     DIRECTOR_TEMPLATES, TEAM_TEMPLATES,
@@ -34,11 +45,42 @@ from directors.builtin import (
 directors_router = APIRouter(tags=["directors"])
 
 
-def _auth(request: Request):
-    """Verify token and return user_id or error response."""
-    if not verify_token(get_token(request)):
-        return None, JSONResponse({"error": "Unauthorized"}, status_code=401)
-    return _get_user_id_from_request(request), None
+def _render_json(payload: dict) -> bytes:
+    """Serialize *payload* exactly as JSONResponse would."""
+    return json.dumps(
+        payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"),
+    ).encode("utf-8")
+
+
+# Templates are static for the life of the process: serialize them once
+_TEMPLATES_BODY = _render_json({
+    "templates": [t for t in DIRECTOR_TEMPLATES if not t.get("team_only")],
+})
+_TEAM_TEMPLATES_BODY = _render_json({
+    "team_templates": [
+        {
+            **team,
+            "director_details": [
+                get_director_template(d_id)
+                for d_id in team.get("directors", [])
+                if get_director_template(d_id)
+            ],
+        }
+        for team in TEAM_TEMPLATES
+    ],
+})
+_TEMPLATES_ETAG = 'W/"' + hashlib.blake2b(_TEMPLATES_BODY, digest_size=16).hexdigest() + '"'
+_TEAM_TEMPLATES_ETAG = (
+    'W/"' + hashlib.blake2b(_TEAM_TEMPLATES_BODY, digest_size=16).hexdigest() + '"'
+)
+
+
+async def require_user(request: Request) -> str:
+    """Dependency: verify the session token and return its user_id."""
+    token_hash = _get_token_hash(request)
+    if not token_hash or not _verify_token_hash(token_hash):
+        raise UnauthorizedError()
+    return _get_user_id_from_request(request)
 
 
 def _compute_setup_status(director: dict) -> dict:
@@ -87,23 +129,25 @@ def _compute_setup_status(director: dict) -> dict:
 # ---------------------------------------------------------------------------
 
 @directors_router.get("/api/directors")
-async def api_list_directors(request: Request, project_id: str = ""):
-    uid, err = _auth(request)
-    if err:
-        return err
-    directors = list_directors(
+async def api_list_directors(
+    request: Request, project_id: str = "", uid: str = Depends(require_user),
+):
+    # The version tag is known before querying, so unchanged polls skip the DB
+    etag = directors_etag(uid)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    directors = await asyncio.to_thread(
+        list_directors,
         user_id=uid,
         project_id=project_id or None,
     )
     directors = [_compute_setup_status(d) for d in directors]
-    return {"directors": directors}
+    return etag_json_response(request, {"directors": directors}, etag)
 
 
 @directors_router.post("/api/directors")
-async def api_create_director(request: Request):
-    uid, err = _auth(request)
-    if err:
-        return err
+async def api_create_director(request: Request, uid: str = Depends(require_user)):
     body = await request.json()
 
     required = ("id", "name", "role_prompt")
@@ -128,7 +172,7 @@ async def api_create_director(request: Request):
     )
     if director is None:
         return JSONResponse({"error": "Could not create director (duplicate ID or invalid cron)"}, status_code=400)
-    return {"director": director}
+    return JSONResponse({"director": director})
 
 
 # ---------------------------------------------------------------------------
@@ -136,21 +180,15 @@ async def api_create_director(request: Request):
 # ---------------------------------------------------------------------------
 
 @directors_router.get("/api/directors/projects")
-async def api_list_projects(request: Request):
+async def api_list_projects(uid: str = Depends(require_user)):
     """List all projects for the authenticated user."""
-    uid, err = _auth(request)
-    if err:
-        return err
     projects = list_projects(user_id=uid)
-    return {"projects": projects}
+    return JSONResponse({"projects": projects})
 
 
 @directors_router.post("/api/directors/projects")
-async def api_create_project(request: Request):
+async def api_create_project(request: Request, uid: str = Depends(require_user)):
     """Create a new project, optionally from a team template."""
-    uid, err = _auth(request)
-    if err:
-        return err
     body = await request.json()
 
     name = body.get("name", "").strip()
@@ -203,46 +241,41 @@ async def api_create_project(request: Request):
                     if director:
                         installed_directors.append(director)
 
-    return {"project": project, "installed_directors": installed_directors}
+    return JSONResponse({"project": project, "installed_directors": installed_directors})
 
 
 @directors_router.get("/api/directors/projects/{project_id}")
-async def api_get_project(request: Request, project_id: str):
-    uid, err = _auth(request)
-    if err:
-        return err
+async def api_get_project(project_id: str, uid: str = Depends(require_user)):
     project = get_project(project_id, user_id=uid)
     if not project:
         return JSONResponse({"error": "Not found"}, status_code=404)
-    return {"project": project}
+    return JSONResponse({"project": project})
 
 
 @directors_router.patch("/api/directors/projects/{project_id}")
-async def api_update_project(request: Request, project_id: str):
-    uid, err = _auth(request)
-    if err:
-        return err
+async def api_update_project(
+    request: Request, project_id: str, uid: str = Depends(require_user),
+):
     body = await request.json()
     project = update_project(project_id, user_id=uid, **body)
     if project is None:
         return JSONResponse({"error": "Not found or invalid update"}, status_code=404)
-    return {"project": project}
+    return JSONResponse({"project": project})
 
 
 @directors_router.delete("/api/directors/projects/{project_id}")
-async def api_delete_project(request: Request, project_id: str):
-    uid, err = _auth(request)
-    if err:
-        return err
+async def api_delete_project(project_id: str, uid: str = Depends(require_user)):
     if project_id == "default":
         return JSONResponse({"error": "Cannot delete the default project"}, status_code=400)
     if delete_project(project_id, user_id=uid):
-        return {"deleted": True}
+        return JSONResponse({"deleted": True})
     return JSONResponse({"error": "Not found"}, status_code=404)
 
 
 @directors_router.post("/api/directors/projects/{project_id}/setup")
-async def api_project_setup(request: Request, project_id: str):
+async def api_project_setup(
+    request: Request, project_id: str, uid: str = Depends(require_user),
+):
     """Bulk update context_window for multiple directors in a project.
 
     Body: { "context_updates": { "<director_id>": { "key": "value", ... }, ... } }
@@ -250,10 +283,6 @@ async def api_project_setup(request: Request, project_id: str):
     auto-managed fields) and returns updated directors with recalculated
     setup_status.
     """
-    uid, err = _auth(request)
-    if err:
-        return err
-
     project = get_project(project_id, user_id=uid)
     if not project:
         return JSONResponse({"error": "Project not found"}, status_code=404)
@@ -286,7 +315,7 @@ async def api_project_setup(request: Request, project_id: str):
             updated = _compute_setup_status(updated)
             updated_directors.append(updated)
 
-    return {"updated_directors": updated_directors}
+    return JSONResponse({"updated_directors": updated_directors})
 
 
 # ---------------------------------------------------------------------------
@@ -294,39 +323,21 @@ async def api_project_setup(request: Request, project_id: str):
 # ---------------------------------------------------------------------------
 
 @directors_router.get("/api/directors/templates")
-async def api_list_templates(request: Request):
-    uid, err = _auth(request)
-    if err:
-        return err
-    standalone = [t for t in DIRECTOR_TEMPLATES if not t.get("team_only")]
-    return {"templates": standalone}
+async def api_list_templates(request: Request, uid: str = Depends(require_user)):
+    return etag_raw_json_response(request, _TEMPLATES_BODY, _TEMPLATES_ETAG)
 
 
 @directors_router.get("/api/directors/team-templates")
-async def api_list_team_templates(request: Request):
-    uid, err = _auth(request)
-    if err:
-        return err
-    enriched = []
-    for team in TEAM_TEMPLATES:
-        t = dict(team)
-        t["director_details"] = [
-            get_director_template(d_id)
-            for d_id in team.get("directors", [])
-            if get_director_template(d_id)
-        ]
-        enriched.append(t)
-    return {"team_templates": enriched}
+async def api_list_team_templates(request: Request, uid: str = Depends(require_user)):
+    return etag_raw_json_response(request, _TEAM_TEMPLATES_BODY, _TEAM_TEMPLATES_ETAG)
 
 
 @directors_router.get("/api/directors/stats")
-async def api_director_stats(request: Request, project_id: str = ""):
-    uid, err = _auth(request)
-    if err:
-        return err
-    stats = get_task_stats(user_id=uid, project_id=project_id or None)
-    unread = get_unread_count(user_id=uid, project_id=project_id or None)
-    return {"task_stats": stats, "inbox_unread": unread}
+async def api_director_stats(project_id: str = "", uid: str = Depends(require_user)):
+    project = project_id or None
+    stats = await asyncio.to_thread(get_task_stats, user_id=uid, project_id=project)
+    unread = await asyncio.to_thread(get_unread_count, user_id=uid, project_id=project)
+    return JSONResponse({"task_stats": stats, "inbox_unread": unread})
 
 
 # ---------------------------------------------------------------------------
@@ -335,17 +346,15 @@ async def api_director_stats(request: Request, project_id: str = ""):
 
 @directors_router.get("/api/directors/tasks")
 async def api_list_tasks(
-    request: Request,
     status: str = "",
     assignee_id: str = "",
     creator_id: str = "",
     limit: int = 50,
     project_id: str = "",
+    uid: str = Depends(require_user),
 ):
-    uid, err = _auth(request)
-    if err:
-        return err
-    tasks = list_dir_tasks(
+    tasks, stats = await asyncio.to_thread(
+        list_dir_tasks_with_stats,
         user_id=uid,
         status=status or None,
         assignee_id=assignee_id or None,
@@ -353,28 +362,21 @@ async def api_list_tasks(
         limit=min(limit, 100),
         project_id=project_id or None,
     )
-    stats = get_task_stats(user_id=uid, project_id=project_id or None)
-    return {"tasks": tasks, "stats": stats}
+    return JSONResponse({"tasks": tasks, "stats": stats})
 
 
 @directors_router.get("/api/directors/tasks/{task_id}")
-async def api_get_task(request: Request, task_id: str):
-    uid, err = _auth(request)
-    if err:
-        return err
+async def api_get_task(task_id: str, uid: str = Depends(require_user)):
     task = get_dir_task(task_id, user_id=uid)
     if not task:
         return JSONResponse({"error": "Not found"}, status_code=404)
-    return {"task": task}
+    return JSONResponse({"task": task})
 
 
 @directors_router.post("/api/directors/tasks/{task_id}/cancel")
-async def api_cancel_task(request: Request, task_id: str):
-    uid, err = _auth(request)
-    if err:
-        return err
+async def api_cancel_task(task_id: str, uid: str = Depends(require_user)):
     if cancel_task(task_id, user_id=uid):
-        return {"cancelled": True}
+        return JSONResponse({"cancelled": True})
     return JSONResponse({"error": "Not found or not cancellable"}, status_code=404)
 
 
@@ -384,18 +386,16 @@ async def api_cancel_task(request: Request, task_id: str):
 
 @directors_router.get("/api/directors/inbox")
 async def api_list_inbox(
-    request: Request,
     status: str = "",
     director_id: str = "",
     content_type: str = "",
     limit: int = 50,
     offset: int = 0,
     project_id: str = "",
+    uid: str = Depends(require_user),
 ):
-    uid, err = _auth(request)
-    if err:
-        return err
-    items = list_inbox(
+    items, unread = await asyncio.to_thread(
+        list_inbox_with_unread,
         user_id=uid,
         status=status or None,
         director_id=director_id or None,
@@ -404,35 +404,29 @@ async def api_list_inbox(
         offset=offset,
         project_id=project_id or None,
     )
-    unread = get_unread_count(user_id=uid, project_id=project_id or None)
-    return {"items": items, "unread_count": unread}
+    return JSONResponse({"items": items, "unread_count": unread})
 
 
 @directors_router.get("/api/directors/inbox/unread")
-async def api_inbox_unread(request: Request, project_id: str = ""):
-    uid, err = _auth(request)
-    if err:
-        return err
-    count = get_unread_count(user_id=uid, project_id=project_id or None)
-    return {"count": count}
+async def api_inbox_unread(project_id: str = "", uid: str = Depends(require_user)):
+    count = await asyncio.to_thread(
+        get_unread_count, user_id=uid, project_id=project_id or None,
+    )
+    return JSONResponse({"count": count})
 
 
 @directors_router.get("/api/directors/inbox/{item_id}")
-async def api_get_inbox_item(request: Request, item_id: str):
-    uid, err = _auth(request)
-    if err:
-        return err
+async def api_get_inbox_item(item_id: str, uid: str = Depends(require_user)):
     item = get_inbox_item(item_id, user_id=uid)
     if not item:
         return JSONResponse({"error": "Not found"}, status_code=404)
-    return {"item": item}
+    return JSONResponse({"item": item})
 
 
 @directors_router.patch("/api/directors/inbox/{item_id}")
-async def api_update_inbox_item(request: Request, item_id: str):
-    uid, err = _auth(request)
-    if err:
-        return err
+async def api_update_inbox_item(
+    request: Request, item_id: str, uid: str = Depends(require_user),
+):
     body = await request.json()
     status = body.get("status")
     comment = body.get("user_comment")
@@ -443,7 +437,7 @@ async def api_update_inbox_item(request: Request, item_id: str):
     item = update_inbox_status(item_id, status=status, user_comment=comment, user_id=uid)
     if item is None:
         return JSONResponse({"error": "Not found or invalid status"}, status_code=404)
-    return {"item": item}
+    return JSONResponse({"item": item})
 
 
 # ---------------------------------------------------------------------------
@@ -451,61 +445,13 @@ async def api_update_inbox_item(request: Request, item_id: str):
 # ---------------------------------------------------------------------------
 
 @directors_router.get("/api/directors/activity")
-async def api_activity(request: Request, limit: int = 20, project_id: str = ""):
-    uid, err = _auth(request)
-    if err:
-        return err
-
-    _project_id = project_id or None
-
-    # Combine recent director runs and inbox items into a timeline
-    directors = list_directors(user_id=uid, project_id=_project_id)
-    recent_runs = []
-    for d in directors:
-        if d.get("last_run"):
-            recent_runs.append({
-                "type": "director_run",
-                "director_id": d["id"],
-                "director_name": d["name"],
-                "emoji": d.get("emoji", "🤖"),
-                "timestamp": d["last_run"],
-                "success": not bool(d.get("last_error")),
-                "preview": (d.get("last_result") or d.get("last_error") or "")[:200],
-            })
-
-    inbox_items = list_inbox(user_id=uid, limit=limit, project_id=_project_id)
-    recent_inbox = [
-        {
-            "type": "inbox_item",
-            "director_id": item["director_id"],
-            "director_name": item["director_name"],
-            "title": item["title"],
-            "content_type": item["content_type"],
-            "status": item["status"],
-            "timestamp": item["created_at"],
-        }
-        for item in inbox_items
-    ]
-
-    tasks = list_dir_tasks(user_id=uid, limit=limit, project_id=_project_id)
-    recent_tasks = [
-        {
-            "type": "task",
-            "task_id": t["id"],
-            "title": t["title"],
-            "creator_id": t["creator_id"],
-            "assignee_id": t.get("assignee_id"),
-            "status": t["status"],
-            "timestamp": t["created_at"],
-        }
-        for t in tasks
-    ]
-
-    # Merge and sort by timestamp
-    activity = recent_runs + recent_inbox + recent_tasks
-    activity.sort(key=lambda x: x.get("timestamp", 0), reverse=True)
-
-    return {"activity": activity[:limit]}
+async def api_activity(
+    limit: int = 20, project_id: str = "", uid: str = Depends(require_user),
+):
+    activity = await asyncio.to_thread(
+        get_activity_timeline, uid, limit, project_id or None,
+    )
+    return JSONResponse({"activity": activity})
 
 
 # ---------------------------------------------------------------------------
@@ -513,100 +459,72 @@ async def api_activity(request: Request, limit: int = 20, project_id: str = ""):
 # ---------------------------------------------------------------------------
 
 @directors_router.get("/api/directors/{director_id}")
-async def api_get_director(request: Request, director_id: str):
-    uid, err = _auth(request)
-    if err:
-        return err
+async def api_get_director(director_id: str, uid: str = Depends(require_user)):
     director = get_director(director_id, user_id=uid)
     if not director:
         return JSONResponse({"error": "Not found"}, status_code=404)
     director = _compute_setup_status(director)
-    return {"director": director}
+    return JSONResponse({"director": director})
 
 
 @directors_router.patch("/api/directors/{director_id}")
-async def api_update_director(request: Request, director_id: str):
-    uid, err = _auth(request)
-    if err:
-        return err
+async def api_update_director(
+    request: Request, director_id: str, uid: str = Depends(require_user),
+):
     body = await request.json()
 
     director = update_director(director_id, user_id=uid, **body)
     if director is None:
         return JSONResponse({"error": "Not found or invalid update"}, status_code=404)
-    return {"director": director}
+    return JSONResponse({"director": director})
 
 
 @directors_router.delete("/api/directors/{director_id}")
-async def api_delete_director(request: Request, director_id: str):
-    uid, err = _auth(request)
-    if err:
-        return err
+async def api_delete_director(director_id: str, uid: str = Depends(require_user)):
     if delete_director(director_id, user_id=uid):
-        return {"deleted": True}
+        return JSONResponse({"deleted": True})
     return JSONResponse({"error": "Not found"}, status_code=404)
 
 
 @directors_router.post("/api/directors/{director_id}/enable")
-async def api_enable_director(request: Request, director_id: str):
-    uid, err = _auth(request)
-    if err:
-        return err
+async def api_enable_director(director_id: str, uid: str = Depends(require_user)):
     director = enable_director(director_id, user_id=uid)
     if director is None:
         return JSONResponse({"error": "Not found"}, status_code=404)
-    return {"director": director}
+    return JSONResponse({"director": director})
 
 
 @directors_router.post("/api/directors/{director_id}/disable")
-async def api_disable_director(request: Request, director_id: str):
-    uid, err = _auth(request)
-    if err:
-        return err
+async def api_disable_director(director_id: str, uid: str = Depends(require_user)):
     director = disable_director(director_id, user_id=uid)
     if director is None:
         return JSONResponse({"error": "Not found"}, status_code=404)
-    return {"director": director}
+    return JSONResponse({"director": director})
 
 
 @directors_router.post("/api/directors/{director_id}/run")
-async def api_run_director(request: Request, director_id: str):
-    uid, err = _auth(request)
-    if err:
-        return err
-    director = get_director(director_id, user_id=uid)
+async def api_run_director(director_id: str, uid: str = Depends(require_user)):
+    # Both DB round-trips (including the commit's fsync) run off the event loop
+    director = await asyncio.to_thread(get_director, director_id, uid)
     if not director:
         return JSONResponse({"error": "Not found"}, status_code=404)
     if not director.get("enabled"):
         return JSONResponse({"error": "Director is disabled"}, status_code=400)
 
     # Set next_run to now for scheduler pickup
-    from directors.storage import _get_db
-    now = time.time()
-    conn = _get_db()
-    try:
-        conn.execute(
-            "UPDATE directors SET next_run = ?, updated_at = ? WHERE id = ? AND user_id = ?",
-            (now, now, director_id, uid),
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    await asyncio.to_thread(queue_director_run, director_id, uid)
 
-    return {"queued": True, "message": "Director will run within 30 seconds"}
+    return JSONResponse({"queued": True, "message": "Director will run within 30 seconds"})
 
 
 @directors_router.post("/api/directors/projects/{project_id}/run")
-async def api_run_project(request: Request, project_id: str):
+async def api_run_project(project_id: str, uid: str = Depends(require_user)):
     """Run all enabled directors in a project sequentially.
 
     Directors are executed one after another so that earlier directors
     can delegate tasks and produce inbox items that later ones consume.
     Execution happens in a background task; the endpoint returns immediately.
     """
-    uid, err = _auth(request)
-    if err:
-        return err
     project = get_project(project_id, user_id=uid)
     if not project:
         return JSONResponse({"error": "Project not found"}, status_code=404)
@@ -733,23 +651,19 @@ async def api_run_project(request: Request, project_id: str):
     task = asyncio.create_task(_run_team())
     _ss_reg.register_team_task(uid, project_id, task)
 
-    return {
+    return JSONResponse({
         "queued": True,
         "directors": [{"id": d["id"], "name": d["name"]} for d in directors],
         "message": f"Running {len(directors)} directors sequentially",
-    }
+    })
 
 
 @directors_router.post("/api/directors/projects/{project_id}/stop")
-async def api_stop_project(request: Request, project_id: str):
+async def api_stop_project(project_id: str, uid: str = Depends(require_user)):
     """Force stop a running team execution."""
-    uid, err = _auth(request)
-    if err:
-        return err
-
     import shared_state as _ss
     if _ss.cancel_team_task(uid, project_id):
-        return {"stopped": True}
+        return JSONResponse({"stopped": True})
     return JSONResponse(
         {"error": "No running team found for this project"},
         status_code=404,
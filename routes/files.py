@@ -1,5 +1,6 @@
 """Filesystem browser routes."""
 
+import os
 from pathlib import Path
 
 from fastapi import APIRouter, Request
@@ -46,22 +47,13 @@ async def browse_filesystem(request: Request, path: str = "~"):
     except (OSError, ValueError):
         return JSONResponse({"error": "Invalid path"}, status_code=400)
 
-    # Security: must be under allowed root
+    # Security: must be under allowed root. resolve(strict=True) has already
+    # followed every symlink, so this also covers links pointing outside.
     try:
         target.relative_to(ALLOWED_ROOT)
     except ValueError:
         return JSONResponse({"error": "Access denied"}, status_code=403)
 
-    # Verify the fully resolved path (following ALL symlinks) is within ALLOWED_ROOT
-    final_resolved = target.resolve(strict=True)
-    try:
-        final_resolved.relative_to(ALLOWED_ROOT)
-    except ValueError:
-        return JSONResponse(
-            {"error": "Access denied: symlink target outside allowed area"},
-            status_code=403,
-        )
-
     if not target.is_dir():
         return JSONResponse({"error": "Not a directory"}, status_code=400)
 
@@ -76,26 +68,29 @@ async def browse_filesystem(request: Request, path: str = "~"):
             "size": 0,
         })
 
+    # scandir caches each entry's type from the directory listing, so the
+    # sort key and the loop below don't stat every child again
     try:
-        children = sorted(target.iterdir(), key=lambda p: (not p.is_dir(), p.name.lower()))
+        with os.scandir(target) as it:
+            children = [e for e in it if not e.name.startswith(".")]
     except PermissionError:
         return JSONResponse({"error": "Permission denied"}, status_code=403)
+    children.sort(key=lambda e: (not e.is_dir(), e.name.lower()))
 
     count = 0
     for child in children:
-        if child.name.startswith("."):
-            continue
         if count >= MAX_ENTRIES:
             break
         try:
+            is_dir = child.is_dir()
             entries.append({
                 "name": child.name,
-                "path": str(child),
-                "is_dir": child.is_dir(),
-                "size": child.stat().st_size if child.is_file() else 0,
+                "path": child.path,
+                "is_dir": is_dir,
+                "size": child.stat().st_size if not is_dir and child.is_file() else 0,
             })
             count += 1
         except (PermissionError, OSError):
             continue
 
-    return {"current": str(target), "entries": entries}
+    return JSONResponse({"current": str(target), "entries": entries})
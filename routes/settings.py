@@ -2,9 +2,8 @@
 
 import asyncio
 import logging
-import os
-import tempfile
-from datetime import date
+import time
+from datetime import date, datetime, timedelta
 
 from fastapi import APIRouter, Request, UploadFile, File
 from fastapi.responses import FileResponse, JSONResponse
@@ -18,6 +17,9 @@ from shared_state import (
     MAX_AUDIO_UPLOAD_BYTES,
     AUDIO_READ_CHUNK_SIZE,
     _get_real_ip,
+    _transcribe_pool,
+    spool_upload,
+    unlink_quiet,
     verify_token,
     get_token,
 )
@@ -54,6 +56,25 @@ def init_settings_deps(transcriber, synthesizer):
     _synthesizer = synthesizer
 
 
+# ---------------------------------------------------------------------------
+# Quota day key
+# ---------------------------------------------------------------------------
+
+# (local midnight ending the cached day as a timestamp, ISO date of that day)
+_today_cache: tuple[float, str] = (0.0, "")
+
+
+def _today_iso() -> str:
+    """Local date as ``YYYY-MM-DD``, recomputed only once the day rolls over."""
+    global _today_cache
+    now = time.time()
+    if now >= _today_cache[0]:
+        today = date.today()
+        midnight = datetime.combine(today + timedelta(days=1), datetime.min.time())
+        _today_cache = (midnight.timestamp(), today.isoformat())
+    return _today_cache[1]
+
+
 # ---------------------------------------------------------------------------
 # REST: Audio upload & transcription
 # ---------------------------------------------------------------------------
@@ -76,69 +97,63 @@ async def upload_audio(request: Request, audio: UploadFile = File(...)):
     elif audio.filename and audio.filename.endswith(".m4a"):
         suffix = ".m4a"
 
-    tmp = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+    path = ""
+    reserved_seconds = 0.0
     try:
-        # Read in chunks so we can reject oversized uploads early
-        content = bytearray()
-        while True:
-            chunk = await audio.read(AUDIO_READ_CHUNK_SIZE)
-            if not chunk:
-                break
-            content.extend(chunk)
-            if len(content) > MAX_AUDIO_UPLOAD_BYTES:
-                tmp.close()
-                os.unlink(tmp.name)
-                database.log_security_event(
-                    "invalid_input", "warning",
-                    client_ip=_get_real_ip(request),
-                    endpoint="/api/upload-audio",
-                    details=f"size>{MAX_AUDIO_UPLOAD_BYTES}, limit={MAX_AUDIO_UPLOAD_BYTES}",
-                )
-                return JSONResponse(
-                    {"error": f"File too large (max {MAX_AUDIO_UPLOAD_BYTES // (1024*1024)}MB)"},
-                    status_code=413,
-                )
-        content = bytes(content)
-
-        # Quota check: audio seconds per day
-        estimated_seconds = len(content) / 4000  # ~32kbps webm estimate
+        # Spool the upload to disk off the event loop, rejecting oversized
+        # uploads as soon as they cross the limit
+        path, size = await asyncio.to_thread(
+            spool_upload, audio.file, MAX_AUDIO_UPLOAD_BYTES, AUDIO_READ_CHUNK_SIZE, suffix,
+        )
+        if size < 0:
+            database.log_security_event(
+                "invalid_input", "warning",
+                client_ip=_get_real_ip(request),
+                endpoint="/api/upload-audio",
+                details=f"size>{MAX_AUDIO_UPLOAD_BYTES}, limit={MAX_AUDIO_UPLOAD_BYTES}",
+            )
+            return JSONResponse(
+                {"error": f"File too large (max {MAX_AUDIO_UPLOAD_BYTES // (1024*1024)}MB)"},
+                status_code=413,
+            )
+
+        # Quota: reserve audio seconds up front, refunded if transcription fails
+        estimated_seconds = size / 4000  # ~32kbps webm estimate
         token_str = get_token(request) or ""
         token_prefix = token_str[:8]
-        date_key = date.today().isoformat()
-        quota = database.get_or_create_quota(token_prefix, date_key)
-        if quota["audio_seconds"] + estimated_seconds > DAILY_AUDIO_SECONDS_LIMIT:
-            tmp.close()
-            os.unlink(tmp.name)
+        date_key = _today_iso()
+        reserved, used = await asyncio.to_thread(
+            database.reserve_audio_seconds,
+            token_prefix, date_key, estimated_seconds, DAILY_AUDIO_SECONDS_LIMIT,
+        )
+        if not reserved:
             database.log_security_event(
                 "quota_exceeded", "warning",
                 client_ip=_get_real_ip(request),
                 token_prefix=token_prefix,
-                details=f"audio_seconds: current={quota['audio_seconds']:.0f}, estimated={estimated_seconds:.0f}, limit={DAILY_AUDIO_SECONDS_LIMIT}",
+                details=f"audio_seconds: current={used:.0f}, estimated={estimated_seconds:.0f}, limit={DAILY_AUDIO_SECONDS_LIMIT}",
                 endpoint="/api/upload-audio",
             )
             return JSONResponse(
                 {"error": f"Daily audio quota exceeded ({DAILY_AUDIO_SECONDS_LIMIT // 60} min/day)"},
                 status_code=429,
             )
+        reserved_seconds = estimated_seconds
 
-        tmp.write(content)
-        tmp.close()
-
-        loop = asyncio.get_event_loop()
-        text = await loop.run_in_executor(None, _transcriber.transcribe, tmp.name)
-
-        # Record usage after success
-        database.increment_audio_seconds(token_prefix, date_key, estimated_seconds)
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(_transcribe_pool, _transcriber.transcribe, path)
 
-        return {"text": text}
+        return JSONResponse({"text": text})
     except Exception:
         _logger.exception("Transcription failed")
+        if reserved_seconds:
+            await asyncio.to_thread(
+                database.increment_audio_seconds, token_prefix, date_key, -reserved_seconds,
+            )
         return JSONResponse({"text": "", "error": "Transcription failed"}, status_code=500)
     finally:
-        try:
-            os.unlink(tmp.name)
-        except OSError:
-            pass
+        if path:
+            await asyncio.to_thread(unlink_quiet, path)
 
 
 # ---------------------------------------------------------------------------
@@ -169,17 +184,19 @@ async def synthesize_text(request: Request):
     voice = synth_req.voice
     rate = synth_req.rate
 
-    # Quota check: TTS chars per day
+    # Quota: reserve TTS chars up front, refunded if nothing is synthesized
     token_str = get_token(request) or ""
     token_prefix = token_str[:8]
-    date_key = date.today().isoformat()
-    quota = database.get_or_create_quota(token_prefix, date_key)
-    if quota["tts_chars"] + len(text) > DAILY_TTS_CHAR_LIMIT:
+    date_key = _today_iso()
+    reserved, used = await asyncio.to_thread(
+        database.reserve_tts_chars, token_prefix, date_key, len(text), DAILY_TTS_CHAR_LIMIT,
+    )
+    if not reserved:
         database.log_security_event(
             "quota_exceeded", "warning",
             client_ip=_get_real_ip(request),
             token_prefix=token_prefix,
-            details=f"tts_chars: current={quota['tts_chars']}, requested={len(text)}, limit={DAILY_TTS_CHAR_LIMIT}",
+            details=f"tts_chars: current={used}, requested={len(text)}, limit={DAILY_TTS_CHAR_LIMIT}",
             endpoint="/api/synthesize",
         )
         return JSONResponse(
@@ -191,25 +208,21 @@ async def synthesize_text(request: Request):
     try:
         audio_path = await _synthesizer.synthesize(text, voice=voice, rate=rate)
         if not audio_path:
+            await asyncio.to_thread(database.increment_tts_chars, token_prefix, date_key, -len(text))
             return JSONResponse(
                 {"error": "Nothing to synthesize (mostly code)"},
                 status_code=204,
             )
 
-        # Record usage after success
-        database.increment_tts_chars(token_prefix, date_key, len(text))
-
         return FileResponse(
             audio_path,
             media_type="audio/mpeg",
             filename="speech.mp3",
-            background=BackgroundTask(lambda p=audio_path: os.unlink(p)),
+            background=BackgroundTask(unlink_quiet, audio_path),
         )
     except Exception:
         if audio_path:
-            try:
-                os.unlink(audio_path)
-            except OSError:
-                pass
+            await asyncio.to_thread(unlink_quiet, audio_path)
         _logger.exception("Text-to-speech synthesis failed")
+        await asyncio.to_thread(database.increment_tts_chars, token_prefix, date_key, -len(text))
         return JSONResponse({"error": "Speech synthesis failed"}, status_code=500)
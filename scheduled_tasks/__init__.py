@@ -2,15 +2,21 @@
 
 from .storage import (
     add_task,
+    add_tasks_bulk,
     list_tasks,
+    iter_tasks,
+    iter_task_summaries,
     get_task,
     update_task,
     delete_task,
     enable_task,
     disable_task,
     get_pending_tasks,
+    next_due_at,
     mark_task_run,
+    mark_tasks_run_bulk,
     migrate_legacy_scheduled_tasks,
+    set_schedule_listener,
 )
 from .meta_tool import (
     MANAGE_SCHEDULED_TASKS_DEFINITION,
@@ -19,15 +25,21 @@ from .meta_tool import (
 
 __all__ = [
     "add_task",
+    "add_tasks_bulk",
     "list_tasks",
+    "iter_tasks",
+    "iter_task_summaries",
     "get_task",
     "update_task",
     "delete_task",
     "enable_task",
     "disable_task",
     "get_pending_tasks",
+    "next_due_at",
     "mark_task_run",
+    "mark_tasks_run_bulk",
     "migrate_legacy_scheduled_tasks",
+    "set_schedule_listener",
     "MANAGE_SCHEDULED_TASKS_DEFINITION",
     "handle_manage_scheduled_tasks",
 ]
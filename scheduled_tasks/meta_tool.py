@@ -1,11 +1,11 @@
 """manage_scheduled_tasks meta-tool — allows Rain to create and manage scheduled/recurring tasks."""
 
+import io
 import time
-from datetime import datetime, timezone
 
 from .storage import (
     add_task,
-    list_tasks,
+    iter_task_summaries,
     get_task,
     update_task,
     delete_task,
@@ -13,6 +13,9 @@ from .storage import (
     disable_task,
 )
 
+# Cap on the task list returned to the model; remaining rows are summarized.
+_LIST_MAX_CHARS = 16_000
+
 # Common cron aliases for the AI to use
 _CRON_HELP = (
     "Cron format: 'minute hour day month weekday'. "
@@ -90,23 +93,11 @@ async def handle_manage_scheduled_tasks(args: dict, cwd: str) -> dict:
     # Extract user_id injected by ToolExecutor (defaults to "default" for backward compat)
     user_id = args.pop("_user_id", "default")
 
+    handler = _ACTIONS.get(action)
+    if handler is None:
+        return {"content": f"Unknown action: {action}", "is_error": True}
     try:
-        if action == "create":
-            return _action_create(args, user_id=user_id)
-        elif action == "list":
-            return _action_list(user_id=user_id)
-        elif action == "show":
-            return _action_show(args, user_id=user_id)
-        elif action == "update":
-            return _action_update(args, user_id=user_id)
-        elif action == "delete":
-            return _action_delete(args, user_id=user_id)
-        elif action == "enable":
-            return _action_enable(args, user_id=user_id)
-        elif action == "disable":
-            return _action_disable(args, user_id=user_id)
-        else:
-            return {"content": f"Unknown action: {action}", "is_error": True}
+        return handler(args, user_id=user_id)
     except Exception as e:
         return {"content": f"Error: {e}", "is_error": True}
 
@@ -115,8 +106,10 @@ def _format_time(ts: float | None) -> str:
     """Format a Unix timestamp as a human-readable string."""
     if not ts:
         return "never"
-    dt = datetime.fromtimestamp(ts, tz=timezone.utc)
-    return dt.strftime("%Y-%m-%d %H:%M UTC")
+    tm = time.gmtime(ts)
+    return "%04d-%02d-%02d %02d:%02d UTC" % (
+        tm.tm_year, tm.tm_mon, tm.tm_mday, tm.tm_hour, tm.tm_min,
+    )
 
 
 def _format_task(task: dict, include_result: bool = True) -> str:
@@ -127,26 +120,28 @@ def _format_task(task: dict, include_result: bool = True) -> str:
         include_result: Whether to include last_result/last_error (verbose mode).
     """
     status = "ENABLED" if task.get("enabled") else "DISABLED"
-    lines = [
-        f"  ID: {task['id']}",
-        f"  Name: {task['name']}",
-        f"  Status: {status}",
-        f"  Schedule: {task['schedule']}",
-        f"  Type: {task['task_type']}",
-    ]
+    out = (
+        f"  ID: {task['id']}\n"
+        f"  Name: {task['name']}\n"
+        f"  Status: {status}\n"
+        f"  Schedule: {task['schedule']}\n"
+        f"  Type: {task['task_type']}"
+    )
     if task.get("description"):
-        lines.append(f"  Description: {task['description']}")
+        out += f"\n  Description: {task['description']}"
 
     data = task.get("task_data", {})
     if data.get("message"):
-        lines.append(f"  Message: {data['message']}")
+        out += f"\n  Message: {data['message']}"
     if data.get("command"):
-        lines.append(f"  Command: {data['command']}")
+        out += f"\n  Command: {data['command']}"
     if data.get("prompt"):
-        lines.append(f"  Prompt: {data['prompt']}")
+        out += f"\n  Prompt: {data['prompt']}"
 
-    lines.append(f"  Next run: {_format_time(task.get('next_run'))}")
-    lines.append(f"  Last run: {_format_time(task.get('last_run'))}")
+    out += (
+        f"\n  Next run: {_format_time(task.get('next_run'))}"
+        f"\n  Last run: {_format_time(task.get('last_run'))}"
+    )
 
     if include_result:
         last_error = task.get("last_error")
@@ -154,13 +149,13 @@ def _format_task(task: dict, include_result: bool = True) -> str:
         if last_error:
             # Truncate long errors for display
             err_display = last_error[:500] + "..." if len(last_error) > 500 else last_error
-            lines.append(f"  Last error: {err_display}")
+            out += f"\n  Last error: {err_display}"
         if last_result:
             # Truncate long results for display
             res_display = last_result[:500] + "..." if len(last_result) > 500 else last_result
-            lines.append(f"  Last result: {res_display}")
+            out += f"\n  Last result: {res_display}"
 
-    return "\n".join(lines)
+    return out
 
 
 def _action_create(args: dict, user_id: str = "default") -> dict:
@@ -217,28 +212,36 @@ def _action_create(args: dict, user_id: str = "default") -> dict:
     }
 
 
-def _action_list(user_id: str = "default") -> dict:
-    tasks = list_tasks(user_id=user_id)
-    if not tasks:
-        return {"content": "No scheduled tasks.", "is_error": False}
-
-    lines = [f"Scheduled tasks ({len(tasks)} total):"]
-    for t in tasks:
+def _action_list(args: dict, user_id: str = "default") -> dict:
+    buf = io.StringIO()
+    total = 0
+    omitted = 0
+    for t in iter_task_summaries(user_id=user_id):
+        total += 1
+        if buf.tell() >= _LIST_MAX_CHARS:
+            omitted += 1
+            continue
         status = "ON" if t.get("enabled") else "OFF"
-        next_str = _format_time(t.get("next_run"))
-        last_str = _format_time(t.get("last_run"))
         # Brief execution status indicator
         exec_status = ""
-        if t.get("last_error"):
+        if t["has_error"]:
             exec_status = " [LAST RUN: ERROR]"
-        elif t.get("last_result"):
+        elif t["has_result"]:
             exec_status = " [LAST RUN: OK]"
-        lines.append(
-            f"  [{status}] {t['name']} (id: {t['id']}) — {t['schedule']} "
-            f"— next: {next_str} — last: {last_str}{exec_status}"
+        buf.write(
+            f"\n  [{status}] {t['name']} (id: {t['id']}) — {t['schedule']} "
+            f"— next: {_format_time(t.get('next_run'))} "
+            f"— last: {_format_time(t.get('last_run'))}{exec_status}"
         )
 
-    return {"content": "\n".join(lines), "is_error": False}
+    if not total:
+        return {"content": "No scheduled tasks.", "is_error": False}
+    if omitted:
+        buf.write(f"\n  ... and {omitted} more (use 'show' with an id for details)")
+    return {
+        "content": f"Scheduled tasks ({total} total):{buf.getvalue()}",
+        "is_error": False,
+    }
 
 
 def _action_show(args: dict, user_id: str = "default") -> dict:
@@ -314,3 +317,14 @@ def _action_disable(args: dict, user_id: str = "default") -> dict:
     if task is None:
         return {"content": f"Task '{task_id}' not found.", "is_error": True}
     return {"content": f"Task '{task_id}' disabled.", "is_error": False}
+
+
+_ACTIONS = {
+    "create": _action_create,
+    "list": _action_list,
+    "show": _action_show,
+    "update": _action_update,
+    "delete": _action_delete,
+    "enable": _action_enable,
+    "disable": _action_disable,
+}
@@ -6,13 +6,24 @@ Tasks are stored in ~/.rain-assistant/scheduler.db using a dedicated SQLite file
 Cron expressions are parsed using croniter to calculate next_run times.
 """
 
+import atexit
+import calendar
+import functools
 import json
 import logging
+import re
+import secrets
 import sqlite3
+import threading
 import time
-import uuid
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterator, Optional
+
+try:
+    from croniter import croniter
+except ImportError:  # optional: pip install rain-assistant[scheduler]
+    croniter = None
 
 logger = logging.getLogger(__name__)
 
@@ -24,41 +35,112 @@ def _ensure_dir() -> None:
     CONFIG_DIR.mkdir(parents=True, exist_ok=True)
 
 
+# One connection per thread, reused across CRUD calls. Writers wrap their
+# statements in ``with conn:`` so a failure never leaves a transaction open.
+_tls = threading.local()
+_open_conns: list[sqlite3.Connection] = []
+_open_conns_lock = threading.Lock()
+
+# DB paths whose schema/migrations have already run in this process.
+_schema_ready: set[str] = set()
+_schema_lock = threading.Lock()
+
+
+@atexit.register
+def _close_all_connections() -> None:
+    with _open_conns_lock:
+        for conn in _open_conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _open_conns.clear()
+
+
 def _get_db() -> sqlite3.Connection:
-    """Open (and initialize) the scheduler database."""
+    """Return this thread's scheduler connection, opening it on first use.
+
+    The cached connection is keyed on the DB path so redirecting
+    SCHEDULER_DB (e.g. in tests) opens a fresh one.
+    """
+    path = str(SCHEDULER_DB)
+    conn = getattr(_tls, "conn", None)
+    if conn is not None:
+        if _tls.path == path:
+            return conn
+        with _open_conns_lock:
+            _open_conns.remove(conn)
+        conn.close()
+
     _ensure_dir()
-    conn = sqlite3.connect(str(SCHEDULER_DB))
+    # timeout is sqlite3's busy_timeout: wait up to 30 s on a locked DB.
+    conn = sqlite3.connect(path, timeout=30.0)
     conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS scheduled_tasks (
-            id          TEXT PRIMARY KEY,
-            name        TEXT NOT NULL,
-            description TEXT DEFAULT '',
-            schedule    TEXT NOT NULL,
-            enabled     INTEGER NOT NULL DEFAULT 1,
-            task_type   TEXT NOT NULL DEFAULT 'reminder',
-            task_data   TEXT NOT NULL DEFAULT '{}',
-            last_run    REAL,
-            next_run    REAL NOT NULL,
-            created_at  REAL NOT NULL,
-            updated_at  REAL NOT NULL,
-            last_result TEXT,
-            last_error  TEXT
-        )
-    """)
-    conn.execute("""
-        CREATE INDEX IF NOT EXISTS idx_tasks_next_run
-        ON scheduled_tasks(next_run, enabled)
-    """)
-    # Migration: add last_result and last_error columns if missing
-    _migrate_add_result_columns(conn)
-    # Migration: add user_id column for per-user isolation
-    _migrate_add_user_id_column(conn)
-    conn.commit()
+    conn.executescript(_CONNECTION_PRAGMAS)
+    _init_schema(conn, path)
+
+    _tls.conn, _tls.path = conn, path
+    with _open_conns_lock:
+        _open_conns.append(conn)
     return conn
 
 
+# Per-connection settings. With WAL, synchronous=NORMAL only fsyncs at
+# checkpoints, so a power loss can drop the last few commits (e.g. a
+# last_run update) but never corrupts the DB — fine for a scheduler.
+_CONNECTION_PRAGMAS = """
+    PRAGMA synchronous=NORMAL;
+    PRAGMA wal_autocheckpoint=1000;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size=268435456;
+    PRAGMA cache_size=-8000;  -- 8 MiB page cache
+"""
+
+_SCHEMA_SQL = """
+    -- journal_mode is persistent in the DB file, so it is set once here.
+    PRAGMA journal_mode=WAL;
+    CREATE TABLE IF NOT EXISTS scheduled_tasks (
+        id          TEXT PRIMARY KEY,
+        name        TEXT NOT NULL,
+        description TEXT DEFAULT '',
+        schedule    TEXT NOT NULL,
+        enabled     INTEGER NOT NULL DEFAULT 1,
+        task_type   TEXT NOT NULL DEFAULT 'reminder',
+        task_data   TEXT NOT NULL DEFAULT '{}',
+        last_run    REAL,
+        next_run    REAL NOT NULL,
+        created_at  REAL NOT NULL,
+        updated_at  REAL NOT NULL,
+        last_result TEXT,
+        last_error  TEXT
+    );
+    -- Partial index over enabled tasks only, for the scheduler's pending
+    -- and next-due queries; replaces the old (next_run, enabled) index.
+    DROP INDEX IF EXISTS idx_tasks_next_run;
+    CREATE INDEX IF NOT EXISTS idx_tasks_enabled_next_run
+        ON scheduled_tasks(next_run) WHERE enabled = 1;
+"""
+
+
+def _init_schema(conn: sqlite3.Connection, path: str) -> None:
+    """Create tables and run migrations once per DB file per process."""
+    with _schema_lock:
+        if path in _schema_ready:
+            return
+        conn.executescript(_SCHEMA_SQL)
+        # Migration: add last_result and last_error columns if missing
+        _migrate_add_result_columns(conn)
+        # Migration: add user_id column for per-user isolation
+        _migrate_add_user_id_column(conn)
+        # Matches list_tasks' ORDER BY so the dashboard list needs no sort step
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tasks_user_enabled_next
+            ON scheduled_tasks(user_id, enabled DESC, next_run ASC)
+        """)
+        conn.commit()
+        _schema_ready.add(path)
+
+
 def _migrate_add_result_columns(conn: sqlite3.Connection) -> None:
     """Add last_result and last_error columns to existing databases."""
     try:
@@ -91,44 +173,478 @@ def _migrate_add_user_id_column(conn: sqlite3.Connection) -> None:
         logger.warning("user_id migration check failed (may already be up to date): %s", e)
 
 
+# Aliases are folded into their 5-field form so "@daily" and "0 0 * * *"
+# share one cached parse.
+_CRON_ALIASES = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+
+# Cached croniter instances are stateful; serialize set_current/get_next.
+_cron_lock = threading.Lock()
+
+
+# "M H * * *" (daily at a fixed time) and "M * * * *" (hourly at a fixed minute).
+_FIXED_TIME_RE = re.compile(r"^(\d{1,2}) (\d{1,2}|\*) \* \* \*$")
+# "*/N * * * *" and "0 */N * * *": when N divides the hour/day evenly the
+# ticks are a fixed period apart in epoch time.
+_MINUTE_STEP_RE = re.compile(r"^\*(?:/(\d{1,2}))? \* \* \* \*$")
+_HOUR_STEP_RE = re.compile(r"^0 \*/(\d{1,2}) \* \* \*$")
+
+
+def _next_period_tick(base_dt: datetime, period: int) -> datetime:
+    """Next multiple of *period* seconds since the epoch strictly after *base_dt*."""
+    ts = int(base_dt.timestamp()) // period * period + period
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+def _fast_next_run(expr: str, base_dt: datetime) -> datetime | None:
+    """Compute the next run for the common alias/fixed-time/step schedules.
+
+    All arithmetic is in UTC, so there is no DST ambiguity. Returns None
+    for anything that needs the full croniter parser.
+    """
+    m = _MINUTE_STEP_RE.match(expr)
+    if m:
+        period = int(m.group(1) or 1) * 60
+        if period and 3600 % period == 0:
+            return _next_period_tick(base_dt, period)
+    m = _HOUR_STEP_RE.match(expr)
+    if m:
+        period = int(m.group(1)) * 3600
+        if period and 86400 % period == 0:
+            return _next_period_tick(base_dt, period)
+
+    start = base_dt.replace(second=0, microsecond=0)
+    if expr == "0 0 * * 0":  # @weekly: next Sunday midnight
+        day = start.replace(hour=0, minute=0)
+        return day + timedelta(days=(6 - day.weekday()) % 7 or 7)
+    if expr == "0 0 1 * *":  # @monthly
+        if start.month == 12:
+            return start.replace(year=start.year + 1, month=1, day=1, hour=0, minute=0)
+        return start.replace(month=start.month + 1, day=1, hour=0, minute=0)
+    if expr == "0 0 1 1 *":  # @yearly
+        return start.replace(year=start.year + 1, month=1, day=1, hour=0, minute=0)
+
+    m = _FIXED_TIME_RE.match(expr)
+    if not m:
+        return None
+    minute = int(m.group(1))
+    if minute > 59:
+        return None
+    if m.group(2) == "*":
+        candidate, step = start.replace(minute=minute), timedelta(hours=1)
+    else:
+        hour = int(m.group(2))
+        if hour > 23:
+            return None
+        candidate, step = start.replace(hour=hour, minute=minute), timedelta(days=1)
+    return candidate if candidate > base_dt else candidate + step
+
+
+_MONTH_NAMES = {
+    name: i for i, name in enumerate(
+        ("jan", "feb", "mar", "apr", "may", "jun",
+         "jul", "aug", "sep", "oct", "nov", "dec"), start=1)
+}
+_DOW_NAMES = {
+    name: i for i, name in enumerate(("sun", "mon", "tue", "wed", "thu", "fri", "sat"))
+}
+
+# A Feb 29 schedule can be up to 8 years away (e.g. 2096 -> 2104).
+_MAX_SEARCH_YEARS = 9
+
+
+def _parse_field(text: str, lo: int, hi: int, names: dict[str, int] | None = None) -> set[int]:
+    """Expand one cron field ("*", "a-b", "*/n", "a-b/n", lists) into a value set.
+
+    Raises ValueError for anything outside plain numeric/named syntax.
+    """
+    def value(token: str) -> int:
+        if names and token.lower() in names:
+            return names[token.lower()]
+        if not token.isdigit():
+            raise ValueError(f"unsupported cron token {token!r}")
+        return int(token)
+
+    values: set[int] = set()
+    for part in text.split(","):
+        base, _, step_text = part.partition("/")
+        step = int(step_text) if step_text.isdigit() else (1 if not step_text else 0)
+        if step < 1:
+            raise ValueError(f"bad step in {part!r}")
+        if base == "*":
+            start, end = lo, hi
+        elif "-" in base:
+            first, _, last = base.partition("-")
+            start, end = value(first), value(last)
+        else:
+            start = value(base)
+            end = hi if step_text else start
+        if not lo <= start <= end <= hi:
+            raise ValueError(f"cron field {part!r} out of range {lo}-{hi}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def _bitmask(values: set[int]) -> int:
+    mask = 0
+    for v in values:
+        mask |= 1 << v
+    return mask
+
+
+def _next_bit(mask: int, start: int) -> int:
+    """Smallest set bit position >= *start* in *mask*, or -1 if none."""
+    rest = mask >> start
+    if not rest:
+        return -1
+    return start + (rest & -rest).bit_length() - 1
+
+
+@functools.lru_cache(maxsize=512)
+def _parse_cron(expr: str) -> tuple:
+    """Parse a 5-field cron expression for _next_run_hierarchical().
+
+    Returns minute/hour/day-of-month/weekday bitmasks (bit n set = value n
+    allowed, weekday 0 = Sunday), the sorted month list, and whether
+    day-of-month / day-of-week are unrestricted. Raises
+    ValueError for invalid or unsupported syntax (L, W, #, seconds/years).
+    """
+    parts = expr.split()
+    if len(parts) != 5:
+        raise ValueError(f"expected 5 cron fields, got {len(parts)}")
+    minute, hour, dom, month, dow = parts
+    return (
+        _bitmask(_parse_field(minute, 0, 59)),
+        _bitmask(_parse_field(hour, 0, 23)),
+        _bitmask(_parse_field(dom, 1, 31)),
+        sorted(_parse_field(month, 1, 12, _MONTH_NAMES)),
+        _bitmask({d % 7 for d in _parse_field(dow, 0, 7, _DOW_NAMES)}),
+        # Only a literal "*" counts as unrestricted for the day-of-month OR
+        # day-of-week rule ("*/1" or "0-6" still OR). croniter differs when
+        # one field spans its whole range and the other contains "*": it
+        # treats the full field as "*", so "0 0 */2 * 0-7" runs on odd days
+        # there but daily here.
+        dom == "*",
+        dow == "*",
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def _month_day_mask(
+    first_weekday: int, days_in_month: int,
+    dom_mask: int, dow_mask: int, dom_any: bool, dow_any: bool,
+) -> int:
+    """Bitmask of the days (bit d = day d) in a month that satisfy the day fields.
+
+    *first_weekday* comes from calendar.monthrange() (Monday = 0 for day 1),
+    so (first_weekday + day) % 7 is the cron weekday (Sunday = 0) of *day*.
+    """
+    month_days = (1 << (days_in_month + 1)) - 2
+    weekday_days = 0
+    for day in range(1, days_in_month + 1):
+        if dow_mask >> ((first_weekday + day) % 7) & 1:
+            weekday_days |= 1 << day
+    if dom_any:
+        mask = month_days if dow_any else weekday_days
+    elif dow_any:
+        mask = dom_mask
+    else:
+        mask = dom_mask | weekday_days
+    return mask & month_days
+
+
+def _canonical_field(text: str, lo: int, hi: int, names: dict[str, int] | None = None) -> str:
+    """Dedupe one cron field and re-emit it as "*" or sorted values/ranges.
+
+    Keeps the original text if the canonical form would be longer
+    (e.g. "*/15" rather than "0,15,30,45").
+    """
+    values = _parse_field(text, lo, hi, names)
+    if names is _DOW_NAMES:  # 7 is an alias for Sunday
+        values = {v % 7 for v in values}
+        hi = 6
+    if len(values) == hi - lo + 1:
+        return "*"
+    runs: list[list[int]] = []
+    for v in sorted(values):
+        if runs and v == runs[-1][1] + 1:
+            runs[-1][1] = v
+        else:
+            runs.append([v, v])
+    canonical = ",".join(
+        str(a) if a == b else f"{a},{b}" if b == a + 1 else f"{a}-{b}" for a, b in runs
+    )
+    return canonical if len(canonical) <= len(text) else text
+
+
+def _canonicalize_cron(expr: str) -> str:
+    """Normalize a cron expression before it is stored.
+
+    Collapses whitespace and, for plain 5-field expressions, dedupes and
+    simplifies each field (e.g. "59 23 * 1 wed,fri,mon-thu,tue" ->
+    "59 23 * 1 1-5"). Day-of-month and day-of-week are left untouched when
+    both are restricted, since croniter ORs them and rewriting either side
+    could change which days match. Aliases and expressions using syntax
+    _parse_field() does not handle are returned whitespace-normalized only.
+    """
+    norm = " ".join(expr.split())
+    parts = norm.split(" ")
+    if len(parts) != 5:
+        return norm
+    minute, hour, dom, month, dow = parts
+    try:
+        minute = _canonical_field(minute, 0, 59)
+        hour = _canonical_field(hour, 0, 23)
+        month = _canonical_field(month, 1, 12, _MONTH_NAMES)
+        if dom == "*" or dow == "*":
+            dom = _canonical_field(dom, 1, 31)
+            dow = _canonical_field(dow, 0, 7, _DOW_NAMES)
+    except ValueError:
+        return norm
+    return " ".join((minute, hour, dom, month, dow))
+
+
+def _next_run_hierarchical(fields: tuple, base_dt: datetime) -> datetime | None:
+    """Find the first matching minute after *base_dt* (UTC).
+
+    Descends year -> month, then finds the next allowed day, hour and
+    minute with a single bit scan of each field's mask instead of stepping
+    through candidates one by one.
+    Returns None if nothing matches within _MAX_SEARCH_YEARS (e.g. Feb 30).
+    """
+    minute_mask, hour_mask, dom_mask, months, dow_mask, dom_any, dow_any = fields
+    first_minute = _next_bit(minute_mask, 0)
+    first_hour = _next_bit(hour_mask, 0)
+    start = base_dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+
+    for year in range(start.year, start.year + _MAX_SEARCH_YEARS):
+        same_year = year == start.year
+        for month in months:
+            if same_year and month < start.month:
+                continue
+            same_month = same_year and month == start.month
+            day_mask = _month_day_mask(
+                *calendar.monthrange(year, month), dom_mask, dow_mask, dom_any, dow_any,
+            )
+            day = _next_bit(day_mask, start.day if same_month else 1)
+            if day < 0:
+                continue
+            hour, minute = first_hour, first_minute
+            if same_month and day == start.day:
+                # Next allowed hour/minute later today, else the next matching day.
+                hour = _next_bit(hour_mask, start.hour)
+                if hour == start.hour:
+                    minute = _next_bit(minute_mask, start.minute)
+                    if minute < 0:
+                        hour, minute = _next_bit(hour_mask, start.hour + 1), first_minute
+                if hour < 0:
+                    day = _next_bit(day_mask, day + 1)
+                    if day < 0:
+                        continue
+                    hour, minute = first_hour, first_minute
+            return datetime(year, month, day, hour, minute, tzinfo=timezone.utc)
+    return None
+
+
+@functools.lru_cache(maxsize=512)
+def _cron_template(cron_expr: str):
+    """Parse *cron_expr* once and return a reusable croniter instance.
+
+    Invalid expressions raise (and are therefore not cached).
+    """
+    return croniter(cron_expr, datetime.now(timezone.utc))
+
+
+@functools.lru_cache(maxsize=256)
+def _validate_cron(expr: str) -> bool:
+    """Return whether *expr* is a schedule this module can evaluate.
+
+    Negative results are cached too, so an AI retrying the same bad
+    expression does not re-run the parser each time.
+    """
+    expr = _CRON_ALIASES.get(expr.lower(), expr)
+    try:
+        if croniter is not None:
+            _cron_template(expr)
+        else:
+            _parse_cron(expr)
+    except (ValueError, KeyError) as e:
+        logger.error("Invalid cron expression '%s': %s", expr, e)
+        return False
+    return True
+
+
 def _calculate_next_run(cron_expr: str, base_time: float | None = None) -> float | None:
     """Calculate the next run time from a cron expression.
 
     Supports standard 5-field cron (minute hour day month weekday)
     and human-friendly aliases like @hourly, @daily, @weekly, @monthly.
 
-    Returns Unix timestamp or None if croniter is not available.
-    """
-    try:
-        from croniter import croniter
-    except ImportError:
-        logger.warning(
-            "croniter not installed. Install with: pip install rain-assistant[scheduler]"
-        )
-        return None
-
-    from datetime import datetime, timezone
+    Aliases and fixed-time schedules are computed directly; everything
+    else goes through croniter, or through the built-in
+    _next_run_hierarchical() search when croniter is not installed.
 
+    Returns Unix timestamp, or None if the expression is invalid or
+    uses syntax only croniter understands and it is not available.
+    """
     if base_time is None:
         base_time = time.time()
+    # Cron has minute resolution: every base time within the same minute
+    # has the same next run, so results are memoized per minute.
+    return _next_run_for_minute(cron_expr, int(base_time // 60))
+
+
+@functools.lru_cache(maxsize=512)
+def _next_run_for_minute(cron_expr: str, minute: int) -> float | None:
+    """Uncached body of _calculate_next_run() for a base time of *minute* * 60."""
+    base_dt = datetime.fromtimestamp(minute * 60, tz=timezone.utc)
+    expr = " ".join(cron_expr.split())
+    expr = _CRON_ALIASES.get(expr.lower(), expr)
+    fast = _fast_next_run(expr, base_dt)
+    if fast is not None:
+        return fast.timestamp()
+
+    if croniter is None:
+        try:
+            next_dt = _next_run_hierarchical(_parse_cron(expr), base_dt)
+        except ValueError as e:
+            logger.warning(
+                "croniter not installed and cron expression '%s' needs it (%s). "
+                "Install with: pip install rain-assistant[scheduler]", cron_expr, e,
+            )
+            return None
+        if next_dt is None:
+            logger.error("Cron expression '%s' never fires", cron_expr)
+            return None
+        return next_dt.timestamp()
 
-    base_dt = datetime.fromtimestamp(base_time, tz=timezone.utc)
     try:
-        cron = croniter(cron_expr, base_dt)
-        next_dt = cron.get_next(datetime)
-        return next_dt.timestamp()
+        cron = _cron_template(expr)
+        # The template is anchored in UTC, so croniter's float interface
+        # gives the same answer without a datetime round-trip.
+        with _cron_lock:
+            cron.set_current(minute * 60, force=True)
+            return cron.get_next(float)
     except (ValueError, KeyError) as e:
         logger.error("Invalid cron expression '%s': %s", cron_expr, e)
         return None
 
 
+# ---------------------------------------------------------------------------
+# SQL statements
+# ---------------------------------------------------------------------------
+# Kept as module constants so every call hands sqlite3 the identical string
+# and hits the connection's statement cache instead of re-parsing.
+
+_SQL_INSERT = """INSERT INTO scheduled_tasks
+   (id, name, description, schedule, task_type, task_data, next_run, created_at, updated_at, user_id)
+   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+_SQL_SELECT_BY_ID = "SELECT * FROM scheduled_tasks WHERE id = ?"
+_SQL_SELECT_BY_ID_USER = "SELECT * FROM scheduled_tasks WHERE id = ? AND user_id = ?"
+_SQL_SELECT_SCHEDULE = "SELECT schedule FROM scheduled_tasks WHERE id = ? AND user_id = ?"
+_SQL_LIST_ALL = (
+    "SELECT * FROM scheduled_tasks WHERE user_id = ? ORDER BY enabled DESC, next_run ASC"
+)
+_SQL_LIST_ENABLED = (
+    "SELECT * FROM scheduled_tasks WHERE user_id = ? AND enabled = 1 ORDER BY next_run ASC"
+)
+# Listing only needs a one-line summary per task; skip the task_data and
+# result/error blobs, which can be large.
+_SQL_LIST_SUMMARY = (
+    "SELECT id, name, enabled, schedule, next_run, last_run, "
+    "COALESCE(last_error, '') <> '' AS has_error, "
+    "COALESCE(last_result, '') <> '' AS has_result "
+    "FROM scheduled_tasks WHERE user_id = ? ORDER BY enabled DESC, next_run ASC"
+)
+# What the scheduler needs to run a task; leaves out the previous
+# last_result/last_error, which can be several KB each.
+_CORE_COLS = "id, name, schedule, enabled, task_type, task_data, last_run, next_run, user_id"
+_SQL_PENDING = (
+    f"SELECT {_CORE_COLS} FROM scheduled_tasks WHERE enabled = 1 AND next_run <= ? "
+    "ORDER BY next_run ASC"
+)
+_SQL_PENDING_USER = (
+    f"SELECT {_CORE_COLS} FROM scheduled_tasks WHERE enabled = 1 AND next_run <= ? "
+    "AND user_id = ? ORDER BY next_run ASC"
+)
+_SQL_NEXT_DUE = "SELECT MIN(next_run) FROM scheduled_tasks WHERE enabled = 1 AND next_run > ?"
+_SQL_DELETE = "DELETE FROM scheduled_tasks WHERE id = ? AND user_id = ?"
+_SQL_ENABLE = (
+    "UPDATE scheduled_tasks SET enabled = 1, next_run = ?, updated_at = ? "
+    "WHERE id = ? AND user_id = ?"
+)
+_SQL_MARK_RUN = """UPDATE scheduled_tasks
+   SET last_run = ?, next_run = ?, updated_at = ?,
+       last_result = ?, last_error = ?
+   WHERE id = ?"""
+
+
+@functools.lru_cache(maxsize=64)
+def _update_sql(columns: tuple[str, ...]) -> str:
+    """UPDATE statement for one combination of (whitelisted) column names."""
+    assignments = ", ".join(f"{col} = ?" for col in columns)
+    return f"UPDATE scheduled_tasks SET {assignments} WHERE id = ? AND user_id = ?"
+
+
+_ID_ATTEMPTS = 3
+
+# UPDATE/INSERT ... RETURNING needs SQLite 3.35+.
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+@functools.lru_cache(maxsize=64)
+def _returning_sql(sql: str) -> str:
+    """*sql* with a RETURNING clause, built once per statement."""
+    return sql + " RETURNING *"
+
+
+def _execute_returning(
+    conn: sqlite3.Connection, sql: str, params, task_id: str
+) -> sqlite3.Row | None:
+    """Run a single-task INSERT/UPDATE in the current transaction and return its row."""
+    if _HAS_RETURNING:
+        rows = conn.execute(_returning_sql(sql), params).fetchall()
+        return rows[0] if rows else None
+    conn.execute(sql, params)
+    return conn.execute(_SQL_SELECT_BY_ID, (task_id,)).fetchone()
+
+
+def _write_returning(
+    conn: sqlite3.Connection, sql: str, params, task_id: str
+) -> sqlite3.Row | None:
+    """Run a single-task INSERT/UPDATE in its own transaction and return its row."""
+    with conn:
+        return _execute_returning(conn, sql, params, task_id)
+
+
+# json.dumps() builds a new JSONEncoder whenever non-default options are
+# passed, so keep one around for task_data.
+_json_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def _encode_task_data(data: dict | None) -> str:
+    """Serialize task_data for storage; empty payloads skip the encoder."""
+    return _json_encode(data) if data else "{}"
+
+
 def _row_to_dict(row: sqlite3.Row) -> dict:
     """Convert a sqlite3.Row to a plain dict with parsed task_data."""
-    d = dict(row)
-    try:
-        d["task_data"] = json.loads(d.get("task_data", "{}"))
-    except (json.JSONDecodeError, TypeError):
+    d = dict(zip(row.keys(), row))  # ~2x faster than dict(row)
+    raw = d.get("task_data")
+    if not raw or raw == "{}":
         d["task_data"] = {}
+    else:
+        try:
+            d["task_data"] = json.loads(raw)
+        except (json.JSONDecodeError, TypeError):
+            d["task_data"] = {}
     d["enabled"] = bool(d.get("enabled", 0))
     return d
 
@@ -137,6 +653,26 @@ def _row_to_dict(row: sqlite3.Row) -> dict:
 # CRUD operations
 # ---------------------------------------------------------------------------
 
+# Called (from any thread) whenever a task's schedule may have moved earlier,
+# so the scheduler loop can wake up instead of sleeping until its next poll.
+_schedule_listener: Callable[[], None] | None = None
+
+
+def set_schedule_listener(listener: Callable[[], None] | None) -> None:
+    """Register the callback fired after tasks are added, updated or enabled."""
+    global _schedule_listener
+    _schedule_listener = listener
+
+
+def _notify_schedule_change() -> None:
+    listener = _schedule_listener
+    if listener is not None:
+        try:
+            listener()
+        except Exception as e:
+            logger.warning("Schedule listener failed: %s", e)
+
+
 def add_task(
     name: str,
     schedule: str,
@@ -159,162 +695,216 @@ def add_task(
     Returns:
         Created task dict, or None if cron expression is invalid.
     """
+    schedule = _canonicalize_cron(schedule)
+    if not _validate_cron(schedule):
+        return None
     next_run = _calculate_next_run(schedule)
     if next_run is None:
         return None
 
     now = time.time()
-    task_id = str(uuid.uuid4())[:8]
-    data_json = json.dumps(task_data or {}, ensure_ascii=False)
+    data_json = _encode_task_data(task_data)
+
+    conn = _get_db()
+    # 32-bit ids: collisions are very unlikely but possible, so retry a few times.
+    for attempt in range(_ID_ATTEMPTS):
+        task_id = secrets.token_hex(4)
+        try:
+            row = _write_returning(
+                conn,
+                _SQL_INSERT,
+                (task_id, name, description, schedule, task_type, data_json, next_run, now, now, user_id),
+                task_id,
+            )
+            break
+        except sqlite3.IntegrityError:
+            if attempt == _ID_ATTEMPTS - 1:
+                raise
+    _notify_schedule_change()
+    return _row_to_dict(row) if row else None
+
+
+def add_tasks_bulk(tasks: list[dict], user_id: str = "default") -> list[str]:
+    """Create several scheduled tasks in a single transaction.
+
+    Bulk variant of add_task() for imports and seeding. Each item takes
+    add_task()'s arguments as keys (name, schedule and optionally
+    task_type, description, task_data); items whose schedule is invalid
+    are skipped, as add_task() would reject them.
+
+    Returns:
+        Ids of the created tasks, in input order.
+    """
+    now = time.time()
+    rows = []
+    for task in tasks:
+        schedule = _canonicalize_cron(task["schedule"])
+        if not _validate_cron(schedule):
+            continue
+        next_run = _calculate_next_run(schedule, base_time=now)
+        if next_run is None:
+            continue
+        rows.append([
+            None, task["name"], task.get("description", ""), schedule,
+            task.get("task_type", "reminder"), _encode_task_data(task.get("task_data")),
+            next_run, now, now, user_id,
+        ])
+    if not rows:
+        return []
+
+    ids: set[str] = set()
+    while len(ids) < len(rows):
+        ids.add(secrets.token_hex(4))
+    for row, task_id in zip(rows, ids):
+        row[0] = task_id
 
     conn = _get_db()
     try:
-        conn.execute(
-            """INSERT INTO scheduled_tasks
-               (id, name, description, schedule, task_type, task_data, next_run, created_at, updated_at, user_id)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (task_id, name, description, schedule, task_type, data_json, next_run, now, now, user_id),
-        )
-        conn.commit()
+        with conn:
+            conn.executemany(_SQL_INSERT, rows)
+    except sqlite3.IntegrityError:
+        # An id collided with an existing task: redo the batch row by row,
+        # drawing new ids only for the rows that collide.
+        with conn:
+            for row in rows:
+                for attempt in range(_ID_ATTEMPTS):
+                    try:
+                        conn.execute(_SQL_INSERT, row)
+                        break
+                    except sqlite3.IntegrityError:
+                        if attempt == _ID_ATTEMPTS - 1:
+                            raise
+                        row[0] = secrets.token_hex(4)
+    _notify_schedule_change()
+    return [row[0] for row in rows]
+
+
+def iter_tasks(user_id: str = "default", enabled_only: bool = False) -> Iterator[dict]:
+    """Yield a user's scheduled tasks one at a time, in list_tasks() order.
+
+    Rows are decoded as the cursor is consumed, so callers that format or
+    truncate output never hold the whole result set in memory.
+    """
+    sql = _SQL_LIST_ENABLED if enabled_only else _SQL_LIST_ALL
+    for row in _get_db().execute(sql, (user_id,)):
+        yield _row_to_dict(row)
 
-        row = conn.execute(
-            "SELECT * FROM scheduled_tasks WHERE id = ? AND user_id = ?",
-            (task_id, user_id),
-        ).fetchone()
-        return _row_to_dict(row) if row else None
-    finally:
-        conn.close()
+
+def iter_task_summaries(user_id: str = "default") -> Iterator[dict]:
+    """Yield lightweight task summaries in list_tasks() order.
+
+    Each dict has id, name, enabled, schedule, next_run, last_run and the
+    booleans has_error/has_result; task_data and the result/error text are
+    never read from the database.
+    """
+    for row in _get_db().execute(_SQL_LIST_SUMMARY, (user_id,)):
+        d = dict(zip(row.keys(), row))
+        d["enabled"] = bool(d["enabled"])
+        d["has_error"] = bool(d["has_error"])
+        d["has_result"] = bool(d["has_result"])
+        yield d
 
 
 def list_tasks(user_id: str = "default", enabled_only: bool = False) -> list[dict]:
     """List scheduled tasks for a specific user, optionally filtering to enabled only."""
-    conn = _get_db()
-    try:
-        if enabled_only:
-            rows = conn.execute(
-                "SELECT * FROM scheduled_tasks WHERE user_id = ? AND enabled = 1 ORDER BY next_run ASC",
-                (user_id,),
-            ).fetchall()
-        else:
-            rows = conn.execute(
-                "SELECT * FROM scheduled_tasks WHERE user_id = ? ORDER BY enabled DESC, next_run ASC",
-                (user_id,),
-            ).fetchall()
-        return [_row_to_dict(r) for r in rows]
-    finally:
-        conn.close()
+    return list(iter_tasks(user_id=user_id, enabled_only=enabled_only))
 
 
 def get_task(task_id: str, user_id: str = "default") -> dict | None:
     """Get a specific task by ID, scoped to a user."""
     conn = _get_db()
-    try:
-        row = conn.execute(
-            "SELECT * FROM scheduled_tasks WHERE id = ? AND user_id = ?",
-            (task_id, user_id),
-        ).fetchone()
-        return _row_to_dict(row) if row else None
-    finally:
-        conn.close()
+    row = conn.execute(_SQL_SELECT_BY_ID_USER, (task_id, user_id)).fetchone()
+    return _row_to_dict(row) if row else None
 
 
 def update_task(task_id: str, user_id: str = "default", **kwargs) -> dict | None:
     """Update task fields. Recalculates next_run if schedule changes.
 
     Supported kwargs: name, description, schedule, task_type, task_data, enabled.
+    Fields equal to the stored values are ignored; if nothing changes, the
+    task is returned as-is without a write.
     """
     task = get_task(task_id, user_id=user_id)
     if not task:
         return None
 
-    updates = []
+    updates: list[str] = []  # column names, in SET order
     params = []
 
     for field in ("name", "description", "task_type"):
-        if field in kwargs:
-            updates.append(f"{field} = ?")
+        if field in kwargs and kwargs[field] != task[field]:
+            updates.append(field)
             params.append(kwargs[field])
 
-    if "schedule" in kwargs:
-        new_schedule = kwargs["schedule"]
+    new_schedule = _canonicalize_cron(kwargs["schedule"]) if "schedule" in kwargs else None
+    if new_schedule is not None and new_schedule != task["schedule"]:
+        if not _validate_cron(new_schedule):
+            return None
         next_run = _calculate_next_run(new_schedule)
         if next_run is None:
             return None
-        updates.append("schedule = ?")
+        updates.append("schedule")
         params.append(new_schedule)
-        updates.append("next_run = ?")
+        updates.append("next_run")
         params.append(next_run)
 
-    if "task_data" in kwargs:
-        updates.append("task_data = ?")
-        params.append(json.dumps(kwargs["task_data"], ensure_ascii=False))
+    if "task_data" in kwargs and (kwargs["task_data"] or {}) != task["task_data"]:
+        updates.append("task_data")
+        params.append(_encode_task_data(kwargs["task_data"]))
 
-    if "enabled" in kwargs:
-        updates.append("enabled = ?")
+    if "enabled" in kwargs and bool(kwargs["enabled"]) != task["enabled"]:
+        updates.append("enabled")
         params.append(1 if kwargs["enabled"] else 0)
 
     if not updates:
         return task
 
-    updates.append("updated_at = ?")
+    updates.append("updated_at")
     params.append(time.time())
     params.append(task_id)
     params.append(user_id)
 
     conn = _get_db()
-    try:
-        conn.execute(
-            f"UPDATE scheduled_tasks SET {', '.join(updates)} WHERE id = ? AND user_id = ?",
-            params,
-        )
-        conn.commit()
-        row = conn.execute(
-            "SELECT * FROM scheduled_tasks WHERE id = ? AND user_id = ?",
-            (task_id, user_id),
-        ).fetchone()
-        return _row_to_dict(row) if row else None
-    finally:
-        conn.close()
+    row = _write_returning(
+        conn,
+        _update_sql(tuple(updates)),
+        params,
+        task_id,
+    )
+    if "next_run" in updates or "enabled" in updates:
+        _notify_schedule_change()
+    return _row_to_dict(row) if row else None
 
 
 def delete_task(task_id: str, user_id: str = "default") -> bool:
     """Delete a task. Returns True if found and deleted. Scoped to user."""
     conn = _get_db()
-    try:
-        cur = conn.execute(
-            "DELETE FROM scheduled_tasks WHERE id = ? AND user_id = ?",
-            (task_id, user_id),
-        )
-        conn.commit()
-        return cur.rowcount > 0
-    finally:
-        conn.close()
+    with conn:
+        cur = conn.execute(_SQL_DELETE, (task_id, user_id))
+    return cur.rowcount > 0
 
 
 def enable_task(task_id: str, user_id: str = "default") -> dict | None:
     """Enable a task and recalculate its next_run from now. Scoped to user."""
-    task = get_task(task_id, user_id=user_id)
-    if not task:
-        return None
-
-    next_run = _calculate_next_run(task["schedule"])
-    if next_run is None:
-        return None
-
     conn = _get_db()
-    try:
-        conn.execute(
-            "UPDATE scheduled_tasks SET enabled = 1, next_run = ?, updated_at = ? WHERE id = ? AND user_id = ?",
+    # Read the schedule and write next_run in one write transaction so a
+    # concurrent update_task cannot change the schedule in between.
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        current = conn.execute(_SQL_SELECT_SCHEDULE, (task_id, user_id)).fetchone()
+        if current is None:
+            return None
+        next_run = _calculate_next_run(current[0])
+        if next_run is None:
+            return None
+        row = _execute_returning(
+            conn,
+            _SQL_ENABLE,
             (next_run, time.time(), task_id, user_id),
+            task_id,
         )
-        conn.commit()
-        row = conn.execute(
-            "SELECT * FROM scheduled_tasks WHERE id = ? AND user_id = ?",
-            (task_id, user_id),
-        ).fetchone()
-        return _row_to_dict(row) if row else None
-    finally:
-        conn.close()
+    _notify_schedule_change()
+    return _row_to_dict(row) if row else None
 
 
 def disable_task(task_id: str, user_id: str = "default") -> dict | None:
@@ -325,6 +915,10 @@ def disable_task(task_id: str, user_id: str = "default") -> dict | None:
 def get_pending_tasks(now: float | None = None, user_id: str | None = None) -> list[dict]:
     """Get all enabled tasks whose next_run is <= now.
 
+    Rows carry only the columns needed to run a task (see _CORE_COLS), not
+    description, timestamps or the previous result/error; use get_task()
+    for the full record.
+
     Args:
         now: Current timestamp (defaults to time.time()).
         user_id: If provided, only return tasks for this user.
@@ -334,31 +928,31 @@ def get_pending_tasks(now: float | None = None, user_id: str | None = None) -> l
         now = time.time()
 
     conn = _get_db()
-    try:
-        if user_id is not None:
-            rows = conn.execute(
-                "SELECT * FROM scheduled_tasks WHERE enabled = 1 AND next_run <= ? AND user_id = ? ORDER BY next_run ASC",
-                (now, user_id),
-            ).fetchall()
-        else:
-            # Scheduler loop: fetch pending tasks for ALL users
-            rows = conn.execute(
-                "SELECT * FROM scheduled_tasks WHERE enabled = 1 AND next_run <= ? ORDER BY next_run ASC",
-                (now,),
-            ).fetchall()
-        return [_row_to_dict(r) for r in rows]
-    finally:
-        conn.close()
+    if user_id is not None:
+        rows = conn.execute(_SQL_PENDING_USER, (now, user_id)).fetchall()
+    else:
+        # Scheduler loop: fetch pending tasks for ALL users
+        rows = conn.execute(_SQL_PENDING, (now,)).fetchall()
+    return [_row_to_dict(r) for r in rows]
+
+
+def next_due_at(after: float | None = None) -> float | None:
+    """Return the earliest next_run of any enabled task later than *after*.
+
+    Lets the scheduler sleep until the next task is due. Tasks already
+    overdue (e.g. one whose schedule no longer parses) are excluded so they
+    cannot turn the loop into a busy poll.
+    """
+    if after is None:
+        after = time.time()
+    return _get_db().execute(_SQL_NEXT_DUE, (after,)).fetchone()[0]
 
 
 def _get_task_internal(task_id: str) -> dict | None:
     """Get a task by ID without user_id filtering (for internal scheduler use)."""
     conn = _get_db()
-    try:
-        row = conn.execute("SELECT * FROM scheduled_tasks WHERE id = ?", (task_id,)).fetchone()
-        return _row_to_dict(row) if row else None
-    finally:
-        conn.close()
+    row = conn.execute(_SQL_SELECT_BY_ID, (task_id,)).fetchone()
+    return _row_to_dict(row) if row else None
 
 
 def mark_task_run(
@@ -386,33 +980,64 @@ def mark_task_run(
         return None
 
     conn = _get_db()
-    try:
-        conn.execute(
-            """UPDATE scheduled_tasks
-               SET last_run = ?, next_run = ?, updated_at = ?,
-                   last_result = ?, last_error = ?
-               WHERE id = ?""",
-            (now, next_run, now, result, error, task_id),
-        )
-        conn.commit()
-        row = conn.execute("SELECT * FROM scheduled_tasks WHERE id = ?", (task_id,)).fetchone()
-        return _row_to_dict(row) if row else None
-    finally:
-        conn.close()
+    row = _write_returning(
+        conn,
+        _SQL_MARK_RUN,
+        (now, next_run, now, result, error, task_id),
+        task_id,
+    )
+    return _row_to_dict(row) if row else None
+
+
+def mark_tasks_run_bulk(items: list[tuple[str, str | None, str | None]]) -> int:
+    """Mark several tasks as run in a single transaction.
+
+    Bulk variant of mark_task_run() for the scheduler tick. Each item is
+    ``(task_id, result, error)``. Schedules are fetched in one query and
+    tasks whose cron expression no longer parses are left untouched, as
+    mark_task_run() does.
+
+    Returns:
+        Number of tasks updated.
+    """
+    if not items:
+        return 0
+
+    conn = _get_db()
+    ids = list({task_id for task_id, _, _ in items})
+    placeholders = ", ".join("?" * len(ids))
+    schedules = dict(conn.execute(
+        f"SELECT id, schedule FROM scheduled_tasks WHERE id IN ({placeholders})",
+        ids,
+    ).fetchall())
+
+    now = time.time()
+    next_runs = {
+        task_id: _calculate_next_run(schedule, base_time=now)
+        for task_id, schedule in schedules.items()
+    }
+    rows = [
+        (now, next_runs[task_id], now, result, error, task_id)
+        for task_id, result, error in items
+        if next_runs.get(task_id) is not None
+    ]
+    with conn:
+        conn.executemany(_SQL_MARK_RUN, rows)
+    return len(rows)
 
 
 def migrate_legacy_scheduled_tasks() -> dict:
     """Ensure user_id column exists in the scheduled_tasks table.
 
     This is idempotent — safe to call on every server startup.
-    The actual migration runs inside _get_db() via _migrate_add_user_id_column().
+    The actual migration runs once per process in _init_schema() via
+    _migrate_add_user_id_column().
 
     Returns:
         Status dict with migration result.
     """
     try:
-        conn = _get_db()  # triggers migration in _get_db
-        conn.close()
+        _get_db()  # triggers migration in _get_db
         return {"status": "ok", "message": "scheduled_tasks user_id migration complete"}
     except Exception as e:
         logger.error("Failed to migrate scheduled_tasks: %s", e)
@@ -65,20 +65,26 @@ except ImportError:
 # Shared state module (used by route modules to avoid circular imports)
 import shared_state
 from shared_state import (
-    active_tokens,
+    UnauthorizedError,
+    unauthorized_handler,
+    active_tokens,  # noqa: F401 -- re-exported; tests use server.active_tokens
     _active_ws_by_device,
     _token_device_map,
     _auth_attempts,
     _hash_token,
+    _add_active_token,
+    _pop_expired_tokens,
     # config is set up as an alias to shared_state.config after load_or_create_config()
     verify_token,
     get_token,
     _get_user_id_from_request,
+    verify_pin,
     _get_real_ip,
     _secure_chmod,
     _find_claude_cli,
     _json_loads_safe,
     TOKEN_TTL_SECONDS,
+    BCRYPT_ROUNDS,
     ALLOWED_ROOT,
     CONFIG_DIR,
     CONFIG_FILE,
@@ -104,6 +110,9 @@ from shared_state import (
     MAX_PIN_ATTEMPTS,
     LOCKOUT_SECONDS,
     IMAGE_PENDING_TTL_SECONDS,
+    MAX_IMAGE_UPLOAD_BYTES,
+    MAX_AUDIO_UPLOAD_BYTES,
+    MULTIPART_OVERHEAD_BYTES,
 )
 
 # Route modules
@@ -337,9 +346,12 @@ _rate_limit_cache: dict = {"data": None, "last_fetch": 0.0}
 _RATE_LIMIT_FETCH_INTERVAL = 30  # seconds between fetches
 
 
-async def fetch_rate_limits(api_key: str) -> dict | None:
+async def fetch_rate_limits(api_key: str, client: httpx.AsyncClient) -> dict | None:
     """Fetch rate-limit info from Anthropic via a zero-cost GET /v1/models call.
 
+    *client* is the app's shared client (``app.state.http``), so the
+    connection to the API is kept alive between polls.
+
     Returns a dict with cleaned header keys (e.g. "requests-limit") or None.
     Results are cached and the call is throttled to once per 30 s.
     """
@@ -348,15 +360,13 @@ async def fetch_rate_limits(api_key: str) -> dict | None:
         return _rate_limit_cache["data"]
 
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(
-                "https://api.anthropic.com/v1/models",
-                headers={
-                    "x-api-key": api_key,
-                    "anthropic-version": "2023-06-01",
-                },
-                timeout=5.0,
-            )
+        resp = await client.get(
+            "https://api.anthropic.com/v1/models",
+            headers={
+                "x-api-key": api_key,
+                "anthropic-version": "2023-06-01",
+            },
+        )
 
         headers = resp.headers
         rate_limits: dict = {}
@@ -422,7 +432,7 @@ def load_or_create_config() -> dict:
             if "pin" in cfg:
                 plain_pin = str(cfg["pin"])
                 hashed = bcrypt.hashpw(
-                    plain_pin.encode("utf-8"), bcrypt.gensalt()
+                    plain_pin.encode("utf-8"), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
                 ).decode("utf-8")
                 cfg["pin_hash"] = hashed
                 del cfg["pin"]
@@ -440,7 +450,9 @@ def load_or_create_config() -> dict:
 
     # Generate new PIN
     pin = f"{secrets.randbelow(90000000) + 10000000}"
-    hashed = bcrypt.hashpw(pin.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    hashed = bcrypt.hashpw(
+        pin.encode("utf-8"), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+    ).decode("utf-8")
     cfg = {"pin_hash": hashed}
     CONFIG_FILE.write_text(json.dumps(cfg, indent=2), encoding="utf-8")
     _secure_chmod(CONFIG_FILE, 0o600)
@@ -462,15 +474,21 @@ shared_state.MAX_DEVICES = int(config.get("max_devices", 2))
 
 
 async def _cleanup_expired_tokens():
-    """Periodically remove expired tokens from memory + DB."""
+    """Periodically remove expired tokens from memory + DB.
+
+    The in-memory sweep only pops expired entries off the expiry heap, so it
+    runs every minute; the DB cleanup stays hourly.
+    """
+    last_db_cleanup = time.time()
     while True:
-        await asyncio.sleep(3600)  # Run every hour
+        await asyncio.sleep(60)
         now = time.time()
-        expired = [t for t, exp in active_tokens.items() if now > exp]
-        for t in expired:
-            active_tokens.pop(t, None)
+        expired = _pop_expired_tokens(now)
         if expired:
-            print(f"  [AUTH] Cleaned up {len(expired)} expired token(s)", flush=True)
+            print(f"  [AUTH] Cleaned up {expired} expired token(s)", flush=True)
+        if now - last_db_cleanup < 3600:
+            continue
+        last_db_cleanup = now
         # Also clean expired sessions from DB
         db_cleaned = database.cleanup_expired_sessions(TOKEN_TTL_SECONDS)
         if db_cleaned:
@@ -487,7 +505,7 @@ async def _cleanup_expired_images():
             if now - img["uploaded_at"] > IMAGE_PENDING_TTL_SECONDS
         ]
         for img_id in expired:
-            shared_state.pending_images.pop(img_id, None)
+            shared_state.discard_pending_image(img_id)
         if expired:
             _logger.info("Cleaned up %d expired pending image(s)", len(expired))
 
@@ -630,11 +648,16 @@ def _is_safe_scheduled_command(cmd: str) -> bool:
     return True
 
 
+_SCHEDULER_POLL_SECONDS = 30.0
+
+
 async def _scheduler_loop():
     """Background loop for executing scheduled tasks (cron).
 
-    Checks every 30 seconds for tasks whose next_run has passed,
-    executes them, and reschedules. Supports three task types:
+    Sleeps until the next scheduled task is due (at most 30 seconds, which
+    is also the directors' polling interval), or until a task is added or
+    re-scheduled, then executes due tasks and reschedules them. Supports
+    three task types:
 
     - reminder: logs the message and stores it as last_result
     - bash: runs a shell command with timeout, stores stdout/stderr
@@ -643,99 +666,130 @@ async def _scheduler_loop():
     import logging
     _sched_logger = logging.getLogger("rain.scheduler")
 
+    from scheduled_tasks.storage import set_schedule_listener
+    loop = asyncio.get_running_loop()
+    wakeup = asyncio.Event()
+
+    def _wake() -> None:
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(wakeup.set)
+
+    set_schedule_listener(_wake)
+    next_due: float | None = None
+
     while True:
-        await asyncio.sleep(30)
+        delay = _SCHEDULER_POLL_SECONDS
+        if next_due is not None:
+            delay = min(delay, max(0.0, next_due - time.time()))
         try:
-            from scheduled_tasks.storage import get_pending_tasks, mark_task_run
+            await asyncio.wait_for(wakeup.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+        wakeup.clear()
+        next_due = None  # fall back to the poll interval if this tick fails
+        try:
+            from scheduled_tasks.storage import (
+                get_pending_tasks, mark_tasks_run_bulk, next_due_at,
+            )
             pending = get_pending_tasks()
-            for task in pending:
-                task_type = task.get("task_type", "reminder")
-                task_data = task.get("task_data", {})
-                task_name = task.get("name", "")
-                task_id = task["id"]
-                result_text: str | None = None
-                error_text: str | None = None
-
-                if task_type == "reminder":
-                    msg = task_data.get("message", task_name)
-                    result_text = msg
-                    _sched_logger.info("[SCHEDULER] Reminder: %s", msg)
-
-                elif task_type == "bash":
-                    cmd = task_data.get("command", "")
-                    if cmd and not _is_safe_scheduled_command(cmd):
-                        _sched_logger.warning(
-                            "[SCHEDULER] Blocked dangerous command: %s",
-                            cmd[:100],
-                        )
-                        error_text = "Command blocked: contains dangerous pattern"
-                    elif cmd:
-                        try:
-                            proc = await asyncio.create_subprocess_shell(
-                                cmd,
-                                stdout=asyncio.subprocess.PIPE,
-                                stderr=asyncio.subprocess.PIPE,
-                            )
-                            stdout, stderr = await asyncio.wait_for(
-                                proc.communicate(), timeout=60
+            # Results are recorded in one transaction at the end of the
+            # tick (or on failure, for whatever already ran).
+            completed: list[tuple[str, str | None, str | None]] = []
+            try:
+                for task in pending:
+                    task_type = task.get("task_type", "reminder")
+                    task_data = task.get("task_data", {})
+                    task_name = task.get("name", "")
+                    task_id = task["id"]
+                    result_text: str | None = None
+                    error_text: str | None = None
+
+                    if task_type == "reminder":
+                        msg = task_data.get("message", task_name)
+                        result_text = msg
+                        _sched_logger.info("[SCHEDULER] Reminder: %s", msg)
+
+                    elif task_type == "bash":
+                        cmd = task_data.get("command", "")
+                        if cmd and not _is_safe_scheduled_command(cmd):
+                            _sched_logger.warning(
+                                "[SCHEDULER] Blocked dangerous command: %s",
+                                cmd[:100],
                             )
-                            stdout_str = stdout.decode("utf-8", errors="replace") if stdout else ""
-                            stderr_str = stderr.decode("utf-8", errors="replace") if stderr else ""
-
-                            if proc.returncode == 0:
-                                result_text = stdout_str or "(no output)"
-                                _sched_logger.info(
-                                    "[SCHEDULER] Bash '%s': exit=0, %d bytes output",
-                                    task_name, len(stdout_str),
+                            error_text = "Command blocked: contains dangerous pattern"
+                        elif cmd:
+                            try:
+                                proc = await asyncio.create_subprocess_shell(
+                                    cmd,
+                                    stdout=asyncio.subprocess.PIPE,
+                                    stderr=asyncio.subprocess.PIPE,
                                 )
-                            else:
-                                error_text = (
-                                    f"exit code {proc.returncode}\n"
-                                    f"stdout: {stdout_str[:2000]}\n"
-                                    f"stderr: {stderr_str[:2000]}"
+                                stdout, stderr = await asyncio.wait_for(
+                                    proc.communicate(), timeout=60
                                 )
+                                stdout_str = stdout.decode("utf-8", errors="replace") if stdout else ""
+                                stderr_str = stderr.decode("utf-8", errors="replace") if stderr else ""
+
+                                if proc.returncode == 0:
+                                    result_text = stdout_str or "(no output)"
+                                    _sched_logger.info(
+                                        "[SCHEDULER] Bash '%s': exit=0, %d bytes output",
+                                        task_name, len(stdout_str),
+                                    )
+                                else:
+                                    error_text = (
+                                        f"exit code {proc.returncode}\n"
+                                        f"stdout: {stdout_str[:2000]}\n"
+                                        f"stderr: {stderr_str[:2000]}"
+                                    )
+                                    _sched_logger.error(
+                                        "[SCHEDULER] Bash '%s': exit=%d",
+                                        task_name, proc.returncode,
+                                    )
+                            except asyncio.TimeoutError:
+                                error_text = "Command timed out after 60 seconds"
                                 _sched_logger.error(
-                                    "[SCHEDULER] Bash '%s': exit=%d",
-                                    task_name, proc.returncode,
+                                    "[SCHEDULER] Bash '%s' timed out", task_name
                                 )
-                        except asyncio.TimeoutError:
-                            error_text = "Command timed out after 60 seconds"
-                            _sched_logger.error(
-                                "[SCHEDULER] Bash '%s' timed out", task_name
+                                try:
+                                    proc.kill()
+                                except Exception:
+                                    pass
+                            except Exception as e:
+                                error_text = str(e)
+                                _sched_logger.error(
+                                    "[SCHEDULER] Bash '%s' failed: %s", task_name, e
+                                )
+                        else:
+                            error_text = "No command specified"
+
+                    elif task_type == "ai_prompt":
+                        prompt = task_data.get("prompt", "")
+                        if prompt:
+                            _sched_logger.info(
+                                "[SCHEDULER] AI prompt '%s': executing...", task_name
                             )
                             try:
-                                proc.kill()
-                            except Exception:
-                                pass
-                        except Exception as e:
-                            error_text = str(e)
-                            _sched_logger.error(
-                                "[SCHEDULER] Bash '%s' failed: %s", task_name, e
-                            )
-                    else:
-                        error_text = "No command specified"
-
-                elif task_type == "ai_prompt":
-                    prompt = task_data.get("prompt", "")
-                    if prompt:
-                        _sched_logger.info(
-                            "[SCHEDULER] AI prompt '%s': executing...", task_name
-                        )
-                        try:
-                            result_text, error_text = await asyncio.wait_for(
-                                _scheduler_execute_ai_prompt(task_name, prompt),
-                                timeout=120,
-                            )
-                        except asyncio.TimeoutError:
-                            error_text = "AI prompt execution timed out after 120 seconds"
-                            _sched_logger.error(
-                                "[SCHEDULER] AI prompt '%s' timed out", task_name
-                            )
-                    else:
-                        error_text = "No prompt specified"
-
-                # Mark the task as run and store result/error
-                mark_task_run(task_id, result=result_text, error=error_text)
+                                result_text, error_text = await asyncio.wait_for(
+                                    _scheduler_execute_ai_prompt(task_name, prompt),
+                                    timeout=120,
+                                )
+                            except asyncio.TimeoutError:
+                                error_text = "AI prompt execution timed out after 120 seconds"
+                                _sched_logger.error(
+                                    "[SCHEDULER] AI prompt '%s' timed out", task_name
+                                )
+                        else:
+                            error_text = "No prompt specified"
+
+                    completed.append((task_id, result_text, error_text))
+            finally:
+                # Commit (and fsync) on a worker thread so it does not stall
+                # the event loop; awaiting it keeps the write ordered before
+                # the next_due_at()/get_pending_tasks() reads that follow.
+                if completed:
+                    await loop.run_in_executor(None, mark_tasks_run_bulk, completed)
+            next_due = next_due_at()
 
         except ImportError:
             pass  # croniter not installed
@@ -848,7 +902,7 @@ def _restore_tokens_from_db():
             remaining = TOKEN_TTL_SECONDS - (time.time() - row["last_activity"])
             if remaining <= 0:
                 continue
-            active_tokens[_hash_token(token)] = time.time() + remaining
+            _add_active_token(_hash_token(token), time.time() + remaining)
             # Restore device mapping
             if row.get("device_id"):
                 _token_device_map[row["token_hash"]] = row["device_id"]
@@ -872,8 +926,17 @@ async def lifespan(application: FastAPI):
     _migrate_directors()
     # Restore tokens from DB so sessions survive server restarts
     _restore_tokens_from_db()
+    # Pending images do not survive a restart; drop their orphaned spool files
+    orphaned = await asyncio.to_thread(shared_state.clear_image_spool)
+    if orphaned:
+        print(f"  [IMAGES] Removed {orphaned} orphaned spool file(s)", flush=True)
+    # Shared HTTP client so outbound polls reuse keep-alive connections
+    application.state.http = httpx.AsyncClient(
+        timeout=5.0,
+        limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=60),
+    )
     # Load Whisper model in background so the server starts immediately
-    loop = asyncio.get_event_loop()
+    loop = asyncio.get_running_loop()
     loop.run_in_executor(None, transcriber.load_model)
     cleanup_task = asyncio.create_task(_cleanup_expired_tokens())
     scheduler_task = asyncio.create_task(_scheduler_loop())
@@ -894,9 +957,13 @@ async def lifespan(application: FastAPI):
         await image_cleanup_task
     except asyncio.CancelledError:
         pass
+    for img_id in list(shared_state.pending_images):
+        shared_state.discard_pending_image(img_id)
+    await application.state.http.aclose()
 
 
 app = FastAPI(title="Rain Assistant", lifespan=lifespan)
+app.add_exception_handler(UnauthorizedError, unauthorized_handler)
 
 
 # ---------------------------------------------------------------------------
@@ -999,6 +1066,51 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
 app.add_middleware(SecurityHeadersMiddleware)
 
 
+# ---------------------------------------------------------------------------
+# Upload size middleware
+# ---------------------------------------------------------------------------
+
+class UploadSizeMiddleware(BaseHTTPMiddleware):
+    """Reject uploads whose declared Content-Length is already over the limit.
+
+    FastAPI parses the multipart body before the route handler runs, so this
+    has to happen here to avoid receiving the body at all. The handlers keep
+    their streaming checks for chunked or under-declared uploads.
+    """
+
+    _LIMITS = {
+        "/api/upload-image": (
+            MAX_IMAGE_UPLOAD_BYTES,
+            f"Image too large (max {MAX_IMAGE_UPLOAD_BYTES // (1024 * 1024)} MB)",
+            "image_too_large",
+        ),
+        "/api/upload-audio": (
+            MAX_AUDIO_UPLOAD_BYTES,
+            f"File too large (max {MAX_AUDIO_UPLOAD_BYTES // (1024*1024)}MB)",
+            "invalid_input",
+        ),
+    }
+
+    async def dispatch(self, request: StarletteRequest, call_next):
+        limit = self._LIMITS.get(request.url.path)
+        if limit is not None:
+            declared = request.headers.get("content-length", "")
+            max_bytes, error, event_type = limit
+            if declared.isdigit() and int(declared) > max_bytes + MULTIPART_OVERHEAD_BYTES:
+                await asyncio.to_thread(
+                    database.log_security_event,
+                    event_type, "warning",
+                    client_ip=_get_real_ip(request),
+                    endpoint=request.url.path,
+                    details=f"content_length={declared}, limit={max_bytes}",
+                )
+                return JSONResponse({"error": error}, status_code=413)
+        return await call_next(request)
+
+
+app.add_middleware(UploadSizeMiddleware)
+
+
 # ---------------------------------------------------------------------------
 # Rate limiting middleware
 # ---------------------------------------------------------------------------
@@ -1606,12 +1718,7 @@ async def websocket_endpoint(ws: WebSocket):
         if level == PermissionLevel.RED and approved:
             pin = response.get("pin", "")
             pin_hash = config.get("pin_hash", "")
-            try:
-                pin_valid = bool(pin) and bcrypt.checkpw(
-                    pin.encode("utf-8"), pin_hash.encode("utf-8")
-                )
-            except Exception:
-                pin_valid = False
+            pin_valid = await verify_pin(pin, pin_hash)
 
             if not pin_valid:
                 database.log_permission_decision(
@@ -1796,7 +1903,7 @@ async def websocket_endpoint(ws: WebSocket):
 
                     # Fetch & send rate limits (Anthropic only)
                     if provider.provider_name == "claude" and api_key:
-                        rl = await fetch_rate_limits(api_key)
+                        rl = await fetch_rate_limits(api_key, ws.app.state.http)
                         if rl:
                             await send({"type": "rate_limits", "agent_id": agent_id, "limits": rl})
 
@@ -2026,10 +2133,7 @@ async def websocket_endpoint(ws: WebSocket):
             if level == PermissionLevel.RED and approved:
                 pin_val = resp.get("pin", "")
                 pin_hash = config.get("pin_hash", "")
-                try:
-                    pin_valid = bool(pin_val) and bcrypt.checkpw(pin_val.encode("utf-8"), pin_hash.encode("utf-8"))
-                except Exception:
-                    pin_valid = False
+                pin_valid = await verify_pin(pin_val, pin_hash)
                 if not pin_valid:
                     approved = False
             if not approved:
@@ -2584,10 +2688,7 @@ async def websocket_endpoint(ws: WebSocket):
                     if level == PermissionLevel.RED and approved:
                         pin = response.get("pin", "")
                         pin_hash = config.get("pin_hash", "")
-                        try:
-                            pin_valid = bool(pin) and bcrypt.checkpw(pin.encode(), pin_hash.encode())
-                        except Exception:
-                            pin_valid = False
+                        pin_valid = await verify_pin(pin, pin_hash)
                         if not pin_valid:
                             return False
 
@@ -2704,17 +2805,20 @@ async def websocket_endpoint(ws: WebSocket):
                         if len(img["base64"]) <= 20 * 1024 * 1024 * 4 // 3:  # ~20MB in base64
                             valid_images.append(img)
 
-                # Resolve image_ids from HTTP upload → same {base64, mediaType} format
-                import base64 as _b64
+                # Resolve image_ids from HTTP upload → same {base64, mediaType} format.
+                # Claim on the loop, then read and encode the spool files in a thread.
+                claimed = []
                 for img_id in image_ids[:10]:
                     if not isinstance(img_id, str) or len(img_id) > 50:
                         continue
-                    pending = shared_state.pending_images.pop(img_id, None)
-                    if pending:
-                        valid_images.append({
-                            "base64": _b64.b64encode(pending["data"]).decode("ascii"),
-                            "mediaType": pending["media_type"],
-                        })
+                    entry = shared_state.claim_pending_image(img_id, token[:8] if token else "")
+                    if entry is not None:
+                        claimed.append(entry)
+                if claimed:
+                    for encoded, media_type in await asyncio.to_thread(
+                        shared_state.read_pending_images_b64, claimed,
+                    ):
+                        valid_images.append({"base64": encoded, "mediaType": media_type})
                 valid_images = valid_images[:10]
 
                 agent = agents.get(agent_id)
@@ -3176,10 +3280,10 @@ async def websocket_endpoint(ws: WebSocket):
                             """Transcribe PCM buffer directly (no temp file)."""
                             _vs = voice_sessions.get(aid)
                             try:
-                                loop = asyncio.get_event_loop()
+                                loop = asyncio.get_running_loop()
                                 text = await asyncio.wait_for(
                                     loop.run_in_executor(
-                                        None,
+                                        shared_state._transcribe_pool,
                                         lambda: transcriber.transcribe_pcm_buffer(ab, 16000, fast=True),
                                     ),
                                     timeout=15,  # 15s max for transcription
@@ -5,14 +5,21 @@ instead of from server.py, and server.py populates the mutable state at
 startup.
 """
 
+import asyncio
+import base64
 import hashlib
+import heapq
 import json
+import mmap
 import os
 import re
+import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import bcrypt
+from fastapi.responses import JSONResponse, Response
 
 import database
 
@@ -41,6 +48,13 @@ MAX_IMAGE_UPLOAD_BYTES = 10 * 1024 * 1024       # 10 MB per image
 IMAGE_READ_CHUNK_SIZE = 64 * 1024               # 64 KB chunks
 IMAGE_PENDING_TTL_SECONDS = 300                 # 5 minutes
 MAX_PENDING_IMAGES_PER_TOKEN = 20               # prevent memory abuse
+# Pending uploads live on disk, inside the private (0o700) config dir rather
+# than the shared system temp dir where another user could pre-create it
+IMAGE_SPOOL_DIR = CONFIG_DIR / "image-spool"
+
+# Allowance for multipart boundaries and part headers when comparing an
+# upload's Content-Length against the file-size limits above
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
 _VALID_IMAGE_MEDIA_TYPES = frozenset({"image/png", "image/jpeg", "image/gif", "image/webp"})
 
 # WebSocket field limits
@@ -62,6 +76,24 @@ _VALID_PROVIDERS = {"claude", "openai", "gemini", "ollama"}
 # Rate limiting: track failed PIN attempts per IP
 MAX_PIN_ATTEMPTS = 5
 LOCKOUT_SECONDS = 5 * 60  # 5 minutes
+MAX_TRACKED_AUTH_IPS = 10_000  # cap on _auth_attempts entries
+
+# bcrypt PIN verification pool: bcrypt releases the GIL, so threads hash in
+# parallel. Beyond BCRYPT_MAX_PENDING queued checks, callers get a 503.
+BCRYPT_MAX_WORKERS = 2 * (os.cpu_count() or 1)
+BCRYPT_MAX_PENDING = 500
+
+# Work factor for newly hashed PINs. Existing hashes keep the cost they were
+# created with. 10 is the OWASP minimum; RAIN_BCRYPT_ROUNDS can raise it.
+try:
+    BCRYPT_ROUNDS = max(10, min(31, int(os.environ.get("RAIN_BCRYPT_ROUNDS", "10"))))
+except ValueError:
+    BCRYPT_ROUNDS = 10
+
+# Whisper transcription pool. Each call already fans out over the model's own
+# cpu_threads, so only a couple run at once; keeping them off the default
+# executor stops long transcriptions from starving other to_thread work.
+TRANSCRIBE_MAX_WORKERS = 2
 
 # Conversation history
 HISTORY_DIR = CONFIG_DIR / "history"
@@ -79,6 +111,11 @@ MAX_ENTRIES = 200
 # Tokens are hashed before storage to prevent plaintext exposure in memory dumps.
 active_tokens: dict[str, float] = {}
 
+# Min-heap of (expiry, token_hash) mirroring active_tokens, so expired tokens
+# can be swept without scanning every session. Entries for tokens that were
+# revoked in the meantime are skipped when popped.
+_token_expiry_heap: list[tuple[float, str]] = []
+
 
 def _hash_token(token: str) -> str:
     """Hash a token using SHA-256 for secure in-memory storage."""
@@ -91,9 +128,25 @@ _active_ws_by_device: dict = {}
 _token_device_map: dict[str, str] = {}
 
 # Rate limiting: track failed PIN attempts per IP
-# { ip: { "attempts": int, "locked_until": float } }
+# { ip: { "failures": deque[float], "locked_until": float } }
+# "failures" holds the timestamps of the most recent failed attempts.
+# Kept in least-recently-failed order and capped at MAX_TRACKED_AUTH_IPS.
 _auth_attempts: dict[str, dict] = {}
 
+# Dedicated executor for bcrypt.checkpw and the number of checks in flight
+_bcrypt_pool = ThreadPoolExecutor(
+    max_workers=BCRYPT_MAX_WORKERS, thread_name_prefix="bcrypt",
+)
+_bcrypt_pending: int = 0
+
+# Dedicated executor for Whisper transcription (upload_audio and voice mode)
+_transcribe_pool = ThreadPoolExecutor(
+    max_workers=TRANSCRIBE_MAX_WORKERS, thread_name_prefix="transcribe",
+)
+
+# Last pin_hash passed to verify_pin and its UTF-8 encoding
+_pin_hash_encoded: tuple[str, bytes] = ("", b"")
+
 # Active OAuth login process tracker (only one at a time)
 _oauth_login_process: dict | None = None
 
@@ -114,9 +167,13 @@ mcp_server_status: dict[str, dict] = {}
 # Example: { "mcp__rain-email": "rain-email", "mcp__rain-browser": "rain-browser" }
 mcp_tool_server_map: dict[str, str] = {}
 
-# Pending image uploads: { image_id: { "data": bytes, "media_type": str, "token_prefix": str, "uploaded_at": float } }
+# Pending image uploads, spooled to IMAGE_SPOOL_DIR:
+# { image_id: { "path": str, "size": int, "media_type": str, "token_prefix": str, "uploaded_at": float } }
 pending_images: dict[str, dict] = {}
 
+# Pending image count per token prefix, kept in step with pending_images
+pending_images_by_token: dict[str, int] = {}
+
 # WebSocket push: map user_id -> list of async send callables for real-time notifications
 _active_user_senders: dict[str, list] = {}
 
@@ -124,6 +181,133 @@ _active_user_senders: dict[str, list] = {}
 _running_team_tasks: dict[str, object] = {}
 
 
+def add_pending_image(image_id: str, entry: dict):
+    """Store a pending image and bump its token's pending count."""
+    pending_images[image_id] = entry
+    prefix = entry["token_prefix"]
+    pending_images_by_token[prefix] = pending_images_by_token.get(prefix, 0) + 1
+
+
+def pop_pending_image(image_id: str) -> dict | None:
+    """Remove a pending image, keeping the per-token count in step."""
+    entry = pending_images.pop(image_id, None)
+    if entry is not None:
+        prefix = entry["token_prefix"]
+        remaining = pending_images_by_token.get(prefix, 0) - 1
+        if remaining > 0:
+            pending_images_by_token[prefix] = remaining
+        else:
+            pending_images_by_token.pop(prefix, None)
+    return entry
+
+
+def unlink_quiet(path: str):
+    """Delete *path*, ignoring a file that is already gone."""
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def spool_upload(
+    src, limit: int, chunk_size: int, suffix: str = "",
+    dir: Path | None = None, prefix: str = "tmp",
+) -> tuple[str, int]:
+    """Copy an uploaded file object into a new temp file, in *chunk_size* reads.
+
+    Blocking; run it with ``asyncio.to_thread``. Returns ``(path, size)``
+    where *size* is -1 once the copy grows past *limit*. The caller owns the
+    file at *path* and must delete it. *dir* is created private if missing.
+    """
+    if dir is not None:
+        dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+    src.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=suffix, prefix=prefix, dir=dir, delete=False) as dst:
+        try:
+            read, write = src.read, dst.write
+            while True:
+                chunk = read(chunk_size)
+                if not chunk:
+                    break
+                write(chunk)
+                if dst.tell() > limit:
+                    return dst.name, -1
+            return dst.name, dst.tell()
+        except BaseException:
+            unlink_quiet(dst.name)
+            raise
+
+
+def clear_image_spool() -> int:
+    """Delete spool files left by a previous run; returns how many were removed.
+
+    pending_images starts empty, so at startup every file here is orphaned.
+    """
+    removed = 0
+    try:
+        with os.scandir(IMAGE_SPOOL_DIR) as it:
+            for entry in it:
+                if entry.name.startswith("img-") and entry.is_file(follow_symlinks=False):
+                    unlink_quiet(entry.path)
+                    removed += 1
+    except OSError:
+        pass
+    return removed
+
+
+def discard_pending_image(image_id: str):
+    """Remove a pending image and delete its spool file."""
+    entry = pop_pending_image(image_id)
+    if entry is not None:
+        unlink_quiet(entry["path"])
+
+
+def claim_pending_image(image_id: str, token_prefix: str) -> dict | None:
+    """Remove and return a pending image if *token_prefix* uploaded it.
+
+    Only touches the in-memory registry, so it is safe on the event loop;
+    the spool file is left for read_pending_images_b64().
+    """
+    entry = pending_images.get(image_id)
+    if entry is None or entry["token_prefix"] != token_prefix:
+        return None
+    return pop_pending_image(image_id)
+
+
+def read_pending_images_b64(entries: list[dict]) -> list[tuple[str, str]]:
+    """Encode claimed images as ``(base64_data, media_type)`` and delete them.
+
+    Blocking; run in a worker thread. Each spool file is mapped read-only so
+    the bytes are encoded straight from the page cache. Unreadable files are
+    skipped.
+    """
+    images = []
+    for entry in entries:
+        try:
+            with open(entry["path"], "rb") as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                images.append((base64.b64encode(data).decode("ascii"), entry["media_type"]))
+        except (OSError, ValueError):
+            pass
+        finally:
+            unlink_quiet(entry["path"])
+    return images
+
+
+def take_pending_image_b64(image_id: str, token_prefix: str) -> tuple[str, str] | None:
+    """Consume a pending image, returning ``(base64_data, media_type)``.
+
+    Only the token that uploaded the image may consume it. Blocking; async
+    callers should claim_pending_image() on the loop and run
+    read_pending_images_b64() in a thread instead.
+    """
+    entry = claim_pending_image(image_id, token_prefix)
+    if entry is None:
+        return None
+    images = read_pending_images_b64([entry])
+    return images[0] if images else None
+
+
 def register_team_task(user_id: str, project_id: str, task: object):
     """Register a running team task for cancellation support."""
     _running_team_tasks[f"{user_id}:{project_id}"] = task
@@ -212,24 +396,145 @@ def _secure_chmod(path: Path, mode: int) -> None:
         pass
 
 
-def verify_token(token: str | None) -> bool:
-    """Check if a token exists and has not expired.
+def _is_bcrypt_hash(pin_hash: str) -> bool:
+    """Cheap shape check for a modular-crypt bcrypt hash ($2a$/$2b$/$2y$)."""
+    return len(pin_hash) == 60 and pin_hash.startswith(("$2a$", "$2b$", "$2y$"))
 
-    Tokens are stored hashed in active_tokens to prevent plaintext
-    exposure in memory dumps.
+
+def _encode_pin_hash(pin_hash: str) -> bytes:
+    """Return *pin_hash* as bytes, re-encoding only when the hash changes."""
+    global _pin_hash_encoded
+    if _pin_hash_encoded[0] != pin_hash:
+        _pin_hash_encoded = (pin_hash, pin_hash.encode("utf-8"))
+    return _pin_hash_encoded[1]
+
+
+async def verify_pin(pin: str, pin_hash: str) -> bool | None:
+    """Check *pin* against the configured bcrypt *pin_hash*.
+
+    bcrypt is deliberately slow, so the comparison runs on the dedicated
+    bcrypt pool to keep the event loop serving other requests. A malformed
+    hash counts as a mismatch and is rejected before reaching the pool.
+    Returns ``None`` without hashing when BCRYPT_MAX_PENDING checks are
+    already queued.
     """
-    if token is None:
+    global _bcrypt_pending
+    if not pin or not _is_bcrypt_hash(pin_hash):
         return False
-    token_hash = _hash_token(token)
-    if token_hash not in active_tokens:
+    if _bcrypt_pending >= BCRYPT_MAX_PENDING:
+        return None
+    _bcrypt_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _bcrypt_pool, bcrypt.checkpw,
+            pin.encode("utf-8"), _encode_pin_hash(pin_hash),
+        )
+    except Exception:
+        return False
+    finally:
+        _bcrypt_pending -= 1
+
+
+class UnauthorizedError(Exception):
+    """Raised by route dependencies when the request has no valid session."""
+
+
+async def unauthorized_handler(request, exc: UnauthorizedError):
+    """Exception handler that renders UnauthorizedError like the inline 401s."""
+    return JSONResponse({"error": "Unauthorized"}, status_code=401)
+
+
+def pin_busy_response():
+    """503 returned when the bcrypt pool is saturated (see verify_pin)."""
+    return JSONResponse(
+        {"error": "Server busy. Try again shortly."},
+        status_code=503, headers={"Retry-After": "1"},
+    )
+
+
+def _etag_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def not_modified(request, etag: str):
+    """Return a bodiless 304 if the client already holds *etag*, else None.
+
+    Lets handlers with a cheap version tag skip building the payload at all.
+    """
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=_etag_headers(etag))
+    return None
+
+
+def etag_json_response(request, payload, etag: str | None = None):
+    """Return *payload* as JSON tagged with a weak ETag.
+
+    Answers ``304 Not Modified`` with no body when the client's
+    ``If-None-Match`` already carries the same tag. When *etag* is omitted
+    it is derived from the serialized payload, which is serialized once and
+    sent as-is.
+    """
+    if etag is not None:
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+    body = json.dumps(
+        payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str,
+    ).encode("utf-8")
+    if etag is None:
+        etag = 'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    return etag_raw_json_response(request, body, etag)
+
+
+def etag_raw_json_response(request, body: bytes, etag: str):
+    """Like etag_json_response, for a body that is already serialized."""
+    return not_modified(request, etag) or Response(
+        body, media_type="application/json", headers=_etag_headers(etag),
+    )
+
+
+def _add_active_token(token_hash: str, expiry: float) -> None:
+    """Register a hashed session token as valid until *expiry*."""
+    active_tokens[token_hash] = expiry
+    heapq.heappush(_token_expiry_heap, (expiry, token_hash))
+
+
+def _pop_expired_tokens(now: float | None = None) -> int:
+    """Remove expired tokens from active_tokens. Returns how many were removed."""
+    if now is None:
+        now = time.time()
+    removed = 0
+    while _token_expiry_heap and _token_expiry_heap[0][0] < now:
+        expiry, token_hash = heapq.heappop(_token_expiry_heap)
+        if active_tokens.get(token_hash) == expiry:
+            del active_tokens[token_hash]
+            removed += 1
+    return removed
+
+
+def _verify_token_hash(token_hash: str) -> bool:
+    """Check if an already-hashed token exists and has not expired."""
+    expiry = active_tokens.get(token_hash)
+    if expiry is None:
         return False
-    expiry = active_tokens[token_hash]
     if time.time() > expiry:
         active_tokens.pop(token_hash, None)
         return False
     return True
 
 
+def verify_token(token: str | None) -> bool:
+    """Check if a token exists and has not expired.
+
+    Tokens are stored hashed in active_tokens to prevent plaintext
+    exposure in memory dumps.
+    """
+    if token is None:
+        return False
+    return _verify_token_hash(_hash_token(token))
+
+
 def get_token(request) -> str | None:
     """Extract token from Authorization header."""
     auth = request.headers.get("authorization", "")
@@ -238,16 +543,81 @@ def get_token(request) -> str | None:
     return None
 
 
-def _get_user_id_from_request(request) -> str:
-    """Extract user_id from the request's Bearer token via session lookup."""
+def _get_token_hash(request) -> str | None:
+    """Return the SHA-256 hash of the request's Bearer token, or None.
+
+    The hash is memoized on ``request.state`` so handlers that verify the
+    token and then look up its session only hash it once.
+    """
+    state = getattr(request, "state", None)
+    cached = getattr(state, "token_hash", None)
+    if isinstance(cached, str):
+        return cached
     token = get_token(request)
     if not token:
+        return None
+    token_hash = _hash_token(token)
+    if state is not None:
+        state.token_hash = token_hash
+    return token_hash
+
+
+# Session owner lookups: { token_hash: (cached_at, user_id) }. A session's
+# user_id never changes, and verify_token still checks active_tokens on
+# every request, so a short TTL only delays reclaiming memory, never
+# revocation.
+_USER_ID_CACHE_TTL = 10.0
+_USER_ID_CACHE_MAX = 10_000
+_user_id_cache: dict[str, tuple[float, str]] = {}
+
+
+def _get_user_id_from_request(request) -> str:
+    """Extract user_id from the request's Bearer token via session lookup.
+
+    The result is memoized on ``request.state`` so repeated lookups within
+    the same request skip the hash and the sessions query, and cached per
+    token hash for _USER_ID_CACHE_TTL seconds across requests.
+    """
+    state = getattr(request, "state", None)
+    cached = getattr(state, "user_id", None)
+    if isinstance(cached, str):
+        return cached
+    token_hash = _get_token_hash(request)
+    if not token_hash:
         return "default"
-    token_hash = hashlib.sha256(token.encode()).hexdigest()
-    return database.get_user_id_from_token(token_hash)
+    now = time.monotonic()
+    hit = _user_id_cache.get(token_hash)
+    if hit and now - hit[0] < _USER_ID_CACHE_TTL:
+        user_id = hit[1]
+    else:
+        user_id = database.get_user_id_from_token(token_hash)
+        if len(_user_id_cache) >= _USER_ID_CACHE_MAX:
+            _user_id_cache.clear()
+        _user_id_cache[token_hash] = (now, user_id)
+    if state is not None:
+        state.user_id = user_id
+    return user_id
+
+
+# Last _find_claude_cli lookup: (checked_at, path). Re-checked after the TTL
+# so a CLI installed while the server runs is eventually picked up.
+_CLAUDE_CLI_CACHE_TTL = 300.0
+_claude_cli_cache: tuple[float, str | None] | None = None
 
 
 def _find_claude_cli() -> str | None:
+    """Find the Claude Code CLI binary, reusing a recent lookup."""
+    global _claude_cli_cache
+    now = time.monotonic()
+    cached = _claude_cli_cache
+    if cached and now - cached[0] < _CLAUDE_CLI_CACHE_TTL:
+        return cached[1]
+    cli = _locate_claude_cli()
+    _claude_cli_cache = (now, cli)
+    return cli
+
+
+def _locate_claude_cli() -> str | None:
     """Find the Claude Code CLI binary (bundled in claude-agent-sdk or system)."""
     import shutil as _shutil
 
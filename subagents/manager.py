@@ -159,16 +159,13 @@ class SubAgentManager:
             approved = response.get("approved", False)
 
             if level == PermissionLevel.RED and approved:
-                import bcrypt
+                from shared_state import verify_pin
 
                 pin = response.get("pin", "")
                 pin_hash = config_ref.get("pin_hash", "")
-                try:
-                    pin_valid = bool(pin) and bcrypt.checkpw(
-                        pin.encode(), pin_hash.encode()
-                    )
-                except Exception:
-                    pin_valid = False
+                pin_valid = await verify_pin(pin, pin_hash)
+                if pin_valid is None:
+                    logger.warning("PIN check for sub-agent %s skipped: bcrypt pool busy", agent_id)
                 if not pin_valid:
                     return False
 
@@ -217,6 +217,12 @@ def test_app(tmp_path):
     from rate_limiter import rate_limiter as rl
     rl._windows.clear()
 
+    # Drop per-user read caches left over from other tests
+    import routes.agents as agents_routes
+    agents_routes._memories_cache.clear()
+    agents_routes._egos_cache.clear()
+    shared_state._user_id_cache.clear()
+
     from httpx import AsyncClient, ASGITransport
     import asyncio
 
@@ -240,6 +240,19 @@ class TestSessionManagement:
         count = database.revoke_all_sessions()
         assert count == 0
 
+    def test_get_active_devices_skips_stale_sessions(self, test_db):
+        database.create_session("fresh", "1.1.1.1", device_id="dev-fresh")
+        database.create_session("stale", "2.2.2.2", device_id="dev-stale")
+        with database._connect() as conn:
+            conn.execute(
+                "UPDATE active_sessions SET last_activity = ? WHERE token_hash = ?",
+                (time.time() - 7200, "stale"),
+            )
+            conn.commit()
+        assert len(database.get_active_devices()) == 2
+        devices = database.get_active_devices(3600)
+        assert [d["device_id"] for d in devices] == ["dev-fresh"]
+
 
 class TestUsageQuotas:
     """Test TTS / audio quota tracking."""
@@ -274,6 +287,15 @@ class TestUsageQuotas:
         assert qB_18["tts_chars"] == 200
         assert qA_19["tts_chars"] == 300
 
+    def test_reserve_tts_chars_respects_limit(self, test_db):
+        assert database.reserve_tts_chars("tok12345", "2026-02-18", 600, 1000) == (True, 600)
+        assert database.reserve_tts_chars("tok12345", "2026-02-18", 500, 1000) == (False, 600)
+        assert database.reserve_tts_chars("tok12345", "2026-02-18", 400, 1000) == (True, 1000)
+
+    def test_reserve_audio_seconds_rejects_oversized_first_request(self, test_db):
+        assert database.reserve_audio_seconds("tok12345", "2026-02-18", 90.0, 60) == (False, 0)
+        assert database.reserve_audio_seconds("tok12345", "2026-02-18", 30.0, 60) == (True, 30.0)
+
 
 class TestAccessLog:
     """Test HTTP access logging."""
@@ -123,6 +123,35 @@ class TestDirectorStorage:
         assert d["plugins_allowed"] == ["*"]
         assert isinstance(d["context_window"], dict)
 
+    def test_queue_director_run_sets_next_run(self):
+        from directors.storage import add_director, get_director, queue_director_run
+        add_director(id="q", name="Q", role_prompt=RP, user_id="u1")
+        before = time.time()
+        assert queue_director_run("q", user_id="u1") is True
+        assert get_director("q", user_id="u1")["next_run"] >= before
+        assert queue_director_run("q", user_id="u2") is False
+
+    def test_activity_timeline_merges_sources_newest_first(self):
+        from directors.storage import add_director, mark_director_run, get_activity_timeline
+        from directors.inbox import add_inbox_item
+        from directors.task_queue import create_task
+        add_director(id="runner", name="Runner", role_prompt=RP, user_id="u1")
+        add_director(id="idle", name="Idle", role_prompt=RP, user_id="u1")
+        mark_director_run("runner", result="x" * 300)
+        add_inbox_item("runner", "Runner", "Report", "body", user_id="u1")
+        create_task(title="Follow up", creator_id="runner", user_id="u1")
+        add_inbox_item("other", "Other", "Hidden", "body", user_id="u2")
+
+        activity = get_activity_timeline(user_id="u1", limit=10)
+        assert [a["type"] for a in activity] == ["task", "inbox_item", "director_run"]
+        run = activity[-1]
+        assert run["director_id"] == "runner"
+        assert run["success"] is True
+        assert run["preview"] == "x" * 200
+        assert activity[0]["creator_id"] == "runner"
+
+        assert len(get_activity_timeline(user_id="u1", limit=2)) == 2
+
 
 # ===========================================================================
 # Task Queue tests
@@ -240,6 +269,14 @@ class TestTaskQueue:
         assert stats["pending"] == 1
         assert stats["completed"] == 1
 
+    def test_list_tasks_with_stats(self):
+        from directors.task_queue import create_task, list_tasks_with_stats
+        create_task(title="A", creator_id="x", user_id="u1")
+        create_task(title="B", creator_id="z", user_id="u1")
+        tasks, stats = list_tasks_with_stats(user_id="u1", creator_id="x")
+        assert [t["title"] for t in tasks] == ["A"]
+        assert stats == {"pending": 2, "total": 2}
+
 
 # ===========================================================================
 # Inbox tests
@@ -283,6 +320,17 @@ class TestInbox:
         items = list_inbox(user_id="u1")
         assert len(items) == 2
 
+    def test_list_inbox_with_unread_counts_beyond_filter(self):
+        from directors.inbox import add_inbox_item, list_inbox_with_unread, update_inbox_status
+        i1 = add_inbox_item(director_id="a", director_name="A", title="T1",
+                            content="c", user_id="u1")
+        add_inbox_item(director_id="b", director_name="B", title="T2",
+                       content="c", user_id="u1")
+        update_inbox_status(i1["id"], "read", user_id="u1")
+        items, unread = list_inbox_with_unread(user_id="u1", status="read")
+        assert [i["title"] for i in items] == ["T1"]
+        assert unread == 1
+
     def test_list_inbox_filter_by_status(self):
         from directors.inbox import add_inbox_item, list_inbox, update_inbox_status
         i1 = add_inbox_item(director_id="a", director_name="A", title="T1",
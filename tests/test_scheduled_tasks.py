@@ -0,0 +1,525 @@
+"""Tests for the scheduled tasks storage layer.
+
+Covers: cron next-run calculation (fast paths, the pure-Python fallback and
+croniter), cron canonicalization, storage CRUD and the manage_scheduled_tasks
+meta-tool.
+"""
+
+import random
+from datetime import datetime, timezone
+
+import pytest
+
+
+# ===========================================================================
+# Cron calculation tests
+# ===========================================================================
+
+
+class TestCalculateNextRun:
+    """The datetime fast paths must agree with croniter exactly."""
+
+    FAST_PATH_EXPRS = [
+        "@hourly",
+        "@daily",
+        "@midnight",
+        "@weekly",
+        "@monthly",
+        "@yearly",
+        "@annually",
+        "15 * * * *",
+        "0 9 * * *",
+        "59 23 * * *",
+        "5  7 * * *",
+        "* * * * *",
+        "*/1 * * * *",
+        "*/5 * * * *",
+        "*/15 * * * *",
+        "*/30 * * * *",
+        "0 */1 * * *",
+        "0 */2 * * *",
+        "0 */6 * * *",
+        "0 */12 * * *",
+    ]
+
+    # Boundary instants: exact schedule hits, month/year rollover, leap day.
+    EDGE_TIMES = [
+        datetime(2024, 1, 1, 0, 0, tzinfo=timezone.utc),
+        datetime(2024, 2, 29, 23, 59, 59, tzinfo=timezone.utc),
+        datetime(2024, 3, 3, 0, 0, tzinfo=timezone.utc),  # a Sunday
+        datetime(2024, 12, 31, 23, 59, 30, tzinfo=timezone.utc),
+        datetime(2025, 6, 15, 9, 0, tzinfo=timezone.utc),
+        datetime(2025, 6, 15, 9, 15, 0, 500000, tzinfo=timezone.utc),
+    ]
+
+    @pytest.fixture(autouse=True)
+    def _fresh_cache(self):
+        from scheduled_tasks.storage import _next_run_for_minute
+        _next_run_for_minute.cache_clear()
+
+    @pytest.mark.parametrize("expr", FAST_PATH_EXPRS)
+    def test_fast_path_matches_croniter(self, expr):
+        croniter = pytest.importorskip("croniter").croniter
+        from scheduled_tasks.storage import _CRON_ALIASES, _calculate_next_run, _fast_next_run
+
+        rng = random.Random(expr)
+        bases = [dt.timestamp() for dt in self.EDGE_TIMES]
+        bases += [rng.uniform(1.6e9, 1.9e9) for _ in range(200)]
+        for base in bases:
+            base_dt = datetime.fromtimestamp(base, tz=timezone.utc)
+            expected = croniter(expr, base_dt).get_next(datetime).timestamp()
+            assert _calculate_next_run(expr, base_time=base) == expected, (expr, base_dt)
+
+        # Make sure the expression really took the fast path.
+        norm = " ".join(expr.split())
+        assert _fast_next_run(_CRON_ALIASES.get(norm, norm), base_dt) is not None
+
+    @pytest.mark.parametrize("expr", ["*/7 * * * *", "0 */5 * * *", "30 */2 * * *"])
+    def test_uneven_steps_skip_fast_path(self, expr):
+        from scheduled_tasks.storage import _fast_next_run
+        assert _fast_next_run(expr, self.EDGE_TIMES[0]) is None
+
+    def test_fast_path_works_without_croniter(self, monkeypatch):
+        monkeypatch.setattr("scheduled_tasks.storage.croniter", None)
+        from scheduled_tasks.storage import _calculate_next_run
+
+        base = datetime(2025, 6, 15, 9, 30, tzinfo=timezone.utc).timestamp()
+        expected = datetime(2025, 6, 16, 9, 0, tzinfo=timezone.utc).timestamp()
+        assert _calculate_next_run("0 9 * * *", base_time=base) == expected
+
+    def test_general_expression_uses_croniter(self):
+        croniter = pytest.importorskip("croniter").croniter
+        from scheduled_tasks.storage import _calculate_next_run
+
+        base_dt = datetime(2025, 6, 13, 17, 45, tzinfo=timezone.utc)
+        expected = croniter("*/20 9-17 * * 1-5", base_dt).get_next(datetime).timestamp()
+        assert _calculate_next_run("*/20 9-17 * * 1-5", base_time=base_dt.timestamp()) == expected
+
+    def test_memoized_per_minute(self):
+        from scheduled_tasks.storage import _calculate_next_run, _next_run_for_minute
+        base = datetime(2025, 6, 13, 17, 45, tzinfo=timezone.utc).timestamp()
+        first = _calculate_next_run("*/7 * * * *", base_time=base + 1.5)
+        assert _calculate_next_run("*/7 * * * *", base_time=base + 59.9) == first
+        assert _next_run_for_minute.cache_info().hits == 1
+        assert first == datetime(2025, 6, 13, 17, 49, tzinfo=timezone.utc).timestamp()
+
+    @pytest.mark.parametrize("expr", ["60 * * * *", "0 24 * * *", "not a cron"])
+    def test_invalid_expression_returns_none(self, expr):
+        pytest.importorskip("croniter")
+        from scheduled_tasks.storage import _calculate_next_run
+        assert _calculate_next_run(expr) is None
+
+
+class TestHierarchicalNextRun:
+    """Pure-Python fallback used when croniter is not installed."""
+
+    @staticmethod
+    def _next(expr, base_dt):
+        from scheduled_tasks.storage import _next_run_hierarchical, _parse_cron
+        return _next_run_hierarchical(_parse_cron(expr), base_dt)
+
+    def test_yearly(self):
+        base = datetime(2025, 1, 1, 0, 0, tzinfo=timezone.utc)
+        assert self._next("0 0 1 1 *", base) == datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    def test_full_range_dow_still_ors_with_dom(self):
+        # Only a literal "*" disables the OR rule; croniter runs this on odd days
+        base = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+        assert self._next("0 0 */2 * 0-7", base) == datetime(2024, 1, 2, tzinfo=timezone.utc)
+
+    def test_leap_day_skips_to_next_leap_year(self):
+        base = datetime(2024, 3, 1, tzinfo=timezone.utc)
+        assert self._next("0 0 29 2 *", base) == datetime(2028, 2, 29, tzinfo=timezone.utc)
+        base = datetime(2097, 1, 1, tzinfo=timezone.utc)  # 2100 is not a leap year
+        assert self._next("0 0 29 2 *", base) == datetime(2104, 2, 29, tzinfo=timezone.utc)
+
+    def test_every_five_minutes(self):
+        base = datetime(2025, 6, 15, 23, 58, 30, tzinfo=timezone.utc)
+        assert self._next("*/5 * * * *", base) == datetime(2025, 6, 16, 0, 0, tzinfo=timezone.utc)
+
+    def test_impossible_date_never_fires(self):
+        assert self._next("0 0 30 2 *", datetime(2025, 1, 1, tzinfo=timezone.utc)) is None
+
+    @pytest.mark.parametrize("expr", ["0 0 L * *", "0 0 * * 1#2", "0 0 * * * 2025", "61 * * * *"])
+    def test_unsupported_or_invalid_raises(self, expr):
+        from scheduled_tasks.storage import _parse_cron
+        with pytest.raises(ValueError):
+            _parse_cron(expr)
+
+    @pytest.mark.parametrize("expr", [
+        "*/5 * * * *",
+        "30 9 * * 1-5",
+        "0 */6 * * *",
+        "15 14 1 * *",
+        "0 22 * * sun,wed",
+        "0 8 1-7 * 1",  # DOM/DOW OR rule
+        "0 0 29 2 *",
+        "45 23 31 jan-dec/2 *",
+        "0 12 * * 7",
+    ])
+    def test_matches_croniter(self, expr):
+        croniter = pytest.importorskip("croniter").croniter
+        rng = random.Random(expr)
+        for _ in range(100):
+            base_dt = datetime.fromtimestamp(rng.uniform(1.6e9, 1.9e9), tz=timezone.utc)
+            assert self._next(expr, base_dt) == croniter(expr, base_dt).get_next(datetime), base_dt
+
+    def test_used_when_croniter_missing(self, monkeypatch):
+        monkeypatch.setattr("scheduled_tasks.storage.croniter", None)
+        from scheduled_tasks.storage import _calculate_next_run, _next_run_for_minute
+        _next_run_for_minute.cache_clear()
+
+        base = datetime(2025, 6, 13, 17, 45, tzinfo=timezone.utc).timestamp()  # a Friday
+        expected = datetime(2025, 6, 16, 9, 0, tzinfo=timezone.utc).timestamp()
+        assert _calculate_next_run("*/20 9-17 * * 1-5", base_time=base) == expected
+        assert _calculate_next_run("0 0 L * *", base_time=base) is None
+
+
+class TestCanonicalizeCron:
+    """Schedules are deduped/simplified before storage without changing meaning."""
+
+    @pytest.mark.parametrize("expr,expected", [
+        ("59 23 * 1 wed,fri,mon-thu,tue,tue", "59 23 * 1 1-5"),
+        ("0-59 0-23 1-31 1-12 *", "* * * * *"),
+        ("  0   9 * * *", "0 9 * * *"),
+        ("*/15 9 * * *", "*/15 9 * * *"),
+        ("5,5,6,7 9 * jan,feb * ", "5-7 9 * 1,2 *"),
+        ("0 9 1,1,2 * mon,mon", "0 9 1,1,2 * mon,mon"),  # DOM/DOW OR rule
+        ("@daily", "@daily"),
+        ("0 0 L * *", "0 0 L * *"),
+    ])
+    def test_canonical_form(self, expr, expected):
+        from scheduled_tasks.storage import _canonicalize_cron
+        assert _canonicalize_cron(expr) == expected
+
+    @pytest.mark.parametrize("expr", [
+        "59 23 * 1 wed,fri,mon-thu,tue,tue",
+        "0,30,0 8-10,9 * * sun,7",
+        "10 1 * feb-apr,mar *",
+        "0 12 1-31 * *",
+    ])
+    def test_same_schedule_as_croniter(self, expr):
+        croniter = pytest.importorskip("croniter").croniter
+        from scheduled_tasks.storage import _canonicalize_cron
+        canonical = _canonicalize_cron(expr)
+        rng = random.Random(expr)
+        for _ in range(50):
+            base_dt = datetime.fromtimestamp(rng.uniform(1.6e9, 1.9e9), tz=timezone.utc)
+            assert (croniter(expr, base_dt).get_next(datetime)
+                    == croniter(canonical, base_dt).get_next(datetime))
+
+
+# ===========================================================================
+# Storage tests
+# ===========================================================================
+
+
+class TestScheduledTaskStorage:
+    """Tests for scheduled_tasks.storage CRUD operations."""
+
+    @pytest.fixture(autouse=True)
+    def _patch_db(self, tmp_path, monkeypatch):
+        """Redirect the DB to a temp directory so tests are isolated."""
+        monkeypatch.setattr("scheduled_tasks.storage.SCHEDULER_DB", tmp_path / "scheduler.db")
+
+    def test_crud_roundtrip_reuses_connection(self):
+        from scheduled_tasks.storage import (
+            _get_db, add_task, delete_task, get_task, list_tasks, update_task,
+        )
+        task = add_task("Standup", "0 9 * * *", task_data={"message": "hi"}, user_id="u1")
+        assert task is not None
+        assert task["task_data"] == {"message": "hi"}
+
+        assert update_task(task["id"], user_id="u1", name="Renamed")["name"] == "Renamed"
+        assert [t["id"] for t in list_tasks(user_id="u1")] == [task["id"]]
+        assert get_task(task["id"], user_id="u2") is None
+        assert delete_task(task["id"], user_id="u1") is True
+        assert get_task(task["id"], user_id="u1") is None
+        assert _get_db() is _get_db()
+
+    def test_redirected_db_gets_fresh_connection(self, tmp_path, monkeypatch):
+        from scheduled_tasks.storage import _get_db, add_task, list_tasks
+        add_task("A", "@hourly", user_id="u1")
+        first = _get_db()
+
+        monkeypatch.setattr("scheduled_tasks.storage.SCHEDULER_DB", tmp_path / "other.db")
+        assert _get_db() is not first
+        assert list_tasks(user_id="u1") == []
+
+    def test_mark_task_run_records_result(self):
+        from scheduled_tasks.storage import add_task, get_pending_tasks, mark_task_run
+        task = add_task("A", "*/5 * * * *", user_id="u1")
+        assert get_pending_tasks(now=task["next_run"], user_id="u1")[0]["id"] == task["id"]
+
+        updated = mark_task_run(task["id"], result="done")
+        assert updated["last_result"] == "done"
+        assert updated["last_run"] is not None
+        assert updated["next_run"] > updated["last_run"]
+
+    def test_add_tasks_bulk(self):
+        from scheduled_tasks.storage import add_tasks_bulk, get_task
+        ids = add_tasks_bulk([
+            {"name": "A", "schedule": "@daily"},
+            {"name": "Bad", "schedule": "not a cron"},
+            {"name": "B", "schedule": "0 9 * * mon-fri", "task_type": "bash",
+             "task_data": {"command": "true"}},
+        ], user_id="u1")
+        assert len(ids) == 2
+        a, b = (get_task(task_id, user_id="u1") for task_id in ids)
+        assert (a["name"], a["task_type"], a["task_data"]) == ("A", "reminder", {})
+        assert (b["name"], b["schedule"], b["task_data"]) == ("B", "0 9 * * 1-5", {"command": "true"})
+        assert add_tasks_bulk([], user_id="u1") == []
+
+    def test_add_tasks_bulk_retries_colliding_ids(self, monkeypatch):
+        from scheduled_tasks import storage
+        existing = storage.add_task("Old", "@daily", user_id="u1")
+        fresh = iter(["bbbbbbbb", existing["id"], "cccccccc"])
+        monkeypatch.setattr(storage.secrets, "token_hex", lambda n: next(fresh))
+
+        ids = storage.add_tasks_bulk(
+            [{"name": "X", "schedule": "@hourly"}, {"name": "Y", "schedule": "@hourly"}],
+            user_id="u1",
+        )
+        assert sorted(ids) == ["bbbbbbbb", "cccccccc"]
+        assert len(storage.list_tasks(user_id="u1")) == 3
+
+    def test_update_task_noop_skips_write(self, monkeypatch):
+        from scheduled_tasks import storage
+        task = storage.add_task("A", "0 9 * * 1-5", task_data={"message": "hi"}, user_id="u1")
+        writes = []
+        real_write = storage._write_returning
+        monkeypatch.setattr(
+            storage, "_write_returning", lambda *a: writes.append(a) or real_write(*a),
+        )
+        same = storage.update_task(
+            task["id"], user_id="u1", name="A", schedule="0 9 * * mon-fri",
+            task_data={"message": "hi"}, enabled=True,
+        )
+        assert same == task
+        assert writes == []
+
+        renamed = storage.update_task(task["id"], user_id="u1", name="B", schedule="0 9 * * 1-5")
+        assert renamed["name"] == "B"
+        assert renamed["next_run"] == task["next_run"]
+        assert len(writes) == 1
+
+    def test_task_data_roundtrip(self):
+        from scheduled_tasks.storage import _get_db, add_task, get_task, update_task
+        task = add_task("A", "@daily", task_data={"message": "café ☕"}, user_id="u1")
+        assert get_task(task["id"], user_id="u1")["task_data"] == {"message": "café ☕"}
+        raw = _get_db().execute("SELECT task_data FROM scheduled_tasks").fetchone()[0]
+        assert raw == '{"message": "café ☕"}'
+
+        update_task(task["id"], user_id="u1", task_data={})
+        assert get_task(task["id"], user_id="u1")["task_data"] == {}
+
+    def test_pending_tasks_skip_previous_result(self):
+        from scheduled_tasks.storage import add_task, get_pending_tasks, mark_task_run
+        task = add_task("A", "@hourly", task_type="bash", task_data={"command": "true"}, user_id="u1")
+        task = mark_task_run(task["id"], result="x" * 5000)
+
+        (pending,) = get_pending_tasks(now=task["next_run"], user_id="u1")
+        assert (pending["task_type"], pending["task_data"]) == ("bash", {"command": "true"})
+        assert pending["enabled"] is True
+        assert "last_result" not in pending and "last_error" not in pending
+
+    def test_schema_initialized_once_per_db(self, monkeypatch):
+        import threading
+        from scheduled_tasks import storage
+
+        calls = []
+        real = storage._migrate_add_user_id_column
+        monkeypatch.setattr(
+            storage, "_migrate_add_user_id_column",
+            lambda conn: (calls.append(1), real(conn)),
+        )
+        storage.list_tasks(user_id="u1")
+        worker = threading.Thread(target=storage.list_tasks, kwargs={"user_id": "u1"})
+        worker.start()
+        worker.join()
+        assert len(calls) == 1
+
+    @pytest.mark.parametrize("has_returning", [True, False])
+    def test_writes_return_updated_row(self, monkeypatch, has_returning):
+        monkeypatch.setattr("scheduled_tasks.storage._HAS_RETURNING", has_returning)
+        from scheduled_tasks.storage import add_task, disable_task, enable_task, update_task
+        task = add_task("A", "@daily", user_id="u1")
+        assert task["name"] == "A"
+        assert disable_task(task["id"], user_id="u1")["enabled"] is False
+        assert enable_task(task["id"], user_id="u1")["enabled"] is True
+        assert update_task(task["id"], user_id="u1", description="d")["description"] == "d"
+
+    def test_mark_tasks_run_bulk(self):
+        from scheduled_tasks.storage import _get_task_internal, add_task, mark_tasks_run_bulk
+        a = add_task("A", "@hourly", user_id="u1")
+        b = add_task("B", "*/10 * * * *", user_id="u2")
+
+        assert mark_tasks_run_bulk([]) == 0
+        assert mark_tasks_run_bulk([
+            (a["id"], "ok", None),
+            (b["id"], None, "boom"),
+            ("missing", "x", None),
+        ]) == 2
+
+        a2, b2 = _get_task_internal(a["id"]), _get_task_internal(b["id"])
+        assert (a2["last_result"], a2["last_error"]) == ("ok", None)
+        assert (b2["last_result"], b2["last_error"]) == (None, "boom")
+        assert a2["last_run"] == b2["last_run"]
+        assert a2["next_run"] > a2["last_run"]
+
+    def test_task_summaries_skip_payload(self):
+        from scheduled_tasks.storage import (
+            add_task, iter_task_summaries, list_tasks, mark_tasks_run_bulk,
+        )
+        a = add_task("A", "@daily", task_type="ai_prompt", task_data={"prompt": "x" * 1000}, user_id="u1")
+        b = add_task("B", "@hourly", user_id="u1")
+        add_task("C", "@weekly", user_id="u1")
+        mark_tasks_run_bulk([(a["id"], "ok", None), (b["id"], None, "boom")])
+
+        summaries = list(iter_task_summaries(user_id="u1"))
+        assert [t["id"] for t in summaries] == [t["id"] for t in list_tasks(user_id="u1")]
+        by_name = {t["name"]: t for t in summaries}
+        assert (by_name["A"]["has_result"], by_name["A"]["has_error"]) == (True, False)
+        assert (by_name["B"]["has_result"], by_name["B"]["has_error"]) == (False, True)
+        assert (by_name["C"]["has_result"], by_name["C"]["has_error"]) == (False, False)
+        assert "task_data" not in by_name["A"] and by_name["A"]["enabled"] is True
+
+    def test_list_tasks_order_uses_index(self):
+        from scheduled_tasks.storage import _get_db
+        plan = " ".join(
+            row[3] for row in _get_db().execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM scheduled_tasks "
+                "WHERE user_id = ? ORDER BY enabled DESC, next_run ASC",
+                ("u1",),
+            )
+        )
+        assert "idx_tasks_user_enabled_next" in plan
+        assert "TEMP B-TREE" not in plan
+
+    @pytest.mark.parametrize("sql, params", [
+        ("_SQL_PENDING", (0.0,)),
+        ("_SQL_NEXT_DUE", (0.0,)),
+    ])
+    def test_scheduler_queries_use_partial_index(self, sql, params):
+        from scheduled_tasks import storage
+        plan = " ".join(
+            row[3] for row in storage._get_db().execute(
+                "EXPLAIN QUERY PLAN " + getattr(storage, sql), params,
+            )
+        )
+        assert "idx_tasks_enabled_next_run" in plan
+        assert "TEMP B-TREE" not in plan
+
+    def test_schedule_stored_canonical(self):
+        from scheduled_tasks.storage import add_task, update_task
+        task = add_task("A", "0 9 * * mon,tue,wed,thu,fri", user_id="u1")
+        assert task["schedule"] == "0 9 * * 1-5"
+        task = update_task(task["id"], user_id="u1", schedule="0  18 * * sat,sun")
+        assert task["schedule"] == "0 18 * * 0,6"
+
+    def test_next_due_at_skips_disabled_and_overdue(self):
+        from scheduled_tasks.storage import add_task, disable_task, next_due_at
+        assert next_due_at() is None
+        soon = add_task("Soon", "*/5 * * * *", user_id="u1")
+        later = add_task("Later", "@daily", user_id="u1")
+        assert next_due_at() == min(soon["next_run"], later["next_run"])
+
+        disable_task(soon["id"], user_id="u1")
+        assert next_due_at() == later["next_run"]
+        assert next_due_at(after=later["next_run"]) is None
+
+    def test_schedule_listener_fires_on_changes(self, monkeypatch):
+        from scheduled_tasks import storage
+        calls = []
+        monkeypatch.setattr(storage, "_schedule_listener", None)
+        storage.set_schedule_listener(lambda: calls.append(1))
+
+        task = storage.add_task("A", "@hourly", user_id="u1")
+        storage.update_task(task["id"], user_id="u1", name="renamed")
+        assert len(calls) == 1
+        storage.update_task(task["id"], user_id="u1", schedule="@daily")
+        storage.disable_task(task["id"], user_id="u1")
+        storage.enable_task(task["id"], user_id="u1")
+        assert len(calls) == 4
+
+    def test_add_task_retries_id_collision(self, monkeypatch):
+        from scheduled_tasks import storage
+        first = storage.add_task("A", "@hourly", user_id="u1")
+        ids = iter([first["id"], "0badc0de"])
+        monkeypatch.setattr(storage.secrets, "token_hex", lambda n: next(ids))
+
+        second = storage.add_task("B", "@hourly", user_id="u1")
+        assert second["id"] == "0badc0de"
+        assert storage.get_task(first["id"], user_id="u1")["name"] == "A"
+
+
+# ===========================================================================
+# Meta-tool tests
+# ===========================================================================
+
+
+class TestManageScheduledTasksTool:
+    """Tests for the manage_scheduled_tasks meta-tool dispatcher."""
+
+    @pytest.fixture(autouse=True)
+    def _patch_db(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("scheduled_tasks.storage.SCHEDULER_DB", tmp_path / "scheduler.db")
+
+    @pytest.mark.asyncio
+    async def test_create_then_list(self):
+        from scheduled_tasks.meta_tool import handle_manage_scheduled_tasks
+        result = await handle_manage_scheduled_tasks(
+            {"action": "create", "name": "Standup", "schedule": "0 9 * * 1-5", "_user_id": "u1"}, ".",
+        )
+        assert result["is_error"] is False
+
+        result = await handle_manage_scheduled_tasks({"action": "list", "_user_id": "u1"}, ".")
+        assert "Standup" in result["content"]
+
+    @pytest.mark.asyncio
+    async def test_unknown_action(self):
+        from scheduled_tasks.meta_tool import handle_manage_scheduled_tasks
+        result = await handle_manage_scheduled_tasks({"action": "explode"}, ".")
+        assert result == {"content": "Unknown action: explode", "is_error": True}
+
+    def test_format_time(self):
+        from scheduled_tasks.meta_tool import _format_time
+        assert _format_time(None) == "never"
+        ts = datetime(2025, 3, 4, 5, 6, 59, tzinfo=timezone.utc).timestamp()
+        assert _format_time(ts) == "2025-03-04 05:06 UTC"
+
+    @pytest.mark.asyncio
+    async def test_list_truncates_large_output(self, monkeypatch):
+        monkeypatch.setattr("scheduled_tasks.meta_tool._LIST_MAX_CHARS", 300)
+        from scheduled_tasks.meta_tool import handle_manage_scheduled_tasks
+        from scheduled_tasks.storage import add_task
+        for i in range(10):
+            add_task(f"Task {i}", "@daily", user_id="u1")
+
+        content = (await handle_manage_scheduled_tasks({"action": "list", "_user_id": "u1"}, "."))["content"]
+        assert content.startswith("Scheduled tasks (10 total):")
+        shown = content.count("[ON]")
+        assert 0 < shown < 10
+        assert f"... and {10 - shown} more" in content
+
+    def test_invalid_schedule_rejected_and_cached(self):
+        from scheduled_tasks import storage
+        storage._validate_cron.cache_clear()
+        assert storage.add_task("A", "not a cron", user_id="u1") is None
+        assert storage.add_task("A", "not a cron", user_id="u1") is None
+        info = storage._validate_cron.cache_info()
+        assert (info.hits, info.misses) == (1, 1)
+
+        task = storage.add_task("B", "@daily", user_id="u1")
+        assert storage.update_task(task["id"], user_id="u1", schedule="99 * * * *") is None
+        assert storage.get_task(task["id"], user_id="u1")["schedule"] == "@daily"
+
+    def test_enable_task_missing_or_other_user(self):
+        from scheduled_tasks.storage import add_task, disable_task, enable_task
+        assert enable_task("nope", user_id="u1") is None
+        task = add_task("A", "@hourly", user_id="u1")
+        disable_task(task["id"], user_id="u1")
+        assert enable_task(task["id"], user_id="u2") is None
+        enabled = enable_task(task["id"], user_id="u1")
+        assert enabled["enabled"] is True
+        assert enabled["next_run"] > enabled["created_at"]
@@ -36,6 +36,131 @@ class TestBrowseEndpoint:
         assert resp.status_code == 400
 
 
+# =====================================================================
+# Image upload
+# =====================================================================
+
+class TestImageUpload:
+    """Test /api/upload-image and the per-token pending count."""
+
+    async def test_pending_limit_tracks_consumed_images(self, test_app, authenticated_client, monkeypatch):
+        import shared_state
+        import routes.images as images_routes
+        monkeypatch.setattr(shared_state, "pending_images", {})
+        monkeypatch.setattr(shared_state, "pending_images_by_token", {})
+        monkeypatch.setattr(images_routes, "MAX_PENDING_IMAGES_PER_TOKEN", 2)
+        monkeypatch.setattr(images_routes, "IMAGE_SPOOL_DIR", test_app["tmp_path"] / "spool")
+
+        def upload():
+            return authenticated_client.post(
+                "/api/upload-image",
+                files={"image": ("a.png", b"\x89PNG data", "image/png")},
+            )
+
+        first = await upload()
+        assert first.status_code == 200
+        assert first.json()["size"] == 9
+        assert (await upload()).status_code == 200
+        assert (await upload()).status_code == 429
+
+        image_id = first.json()["image_id"]
+        assert shared_state.take_pending_image_b64(image_id, "someone") is None
+        prefix = authenticated_client.headers["authorization"][7:15]
+        encoded, media_type = shared_state.take_pending_image_b64(image_id, prefix)
+        assert encoded == "iVBORyBkYXRh"
+        assert media_type == "image/png"
+        assert (await upload()).status_code == 200
+        assert sum(shared_state.pending_images_by_token.values()) == 2
+
+        paths = [img["path"] for img in shared_state.pending_images.values()]
+        for img_id in list(shared_state.pending_images):
+            shared_state.discard_pending_image(img_id)
+        assert not any(Path(p).exists() for p in paths)
+
+    async def test_oversized_upload_leaves_no_spool_file(self, test_app, authenticated_client, monkeypatch, tmp_path):
+        import routes.images as images_routes
+        monkeypatch.setattr(images_routes, "MAX_IMAGE_UPLOAD_BYTES", 4)
+        monkeypatch.setattr(images_routes, "IMAGE_SPOOL_DIR", tmp_path / "spool")
+        resp = await authenticated_client.post(
+            "/api/upload-image",
+            files={"image": ("a.png", b"\x89PNG data", "image/png")},
+        )
+        assert resp.status_code == 413
+        assert list((tmp_path / "spool").iterdir()) == []
+
+    def test_clear_image_spool_removes_orphans(self, monkeypatch, tmp_path):
+        import shared_state
+        spool = tmp_path / "spool"
+        spool.mkdir()
+        (spool / "img-abc").write_bytes(b"x")
+        (spool / "keep.txt").write_bytes(b"x")
+        monkeypatch.setattr(shared_state, "IMAGE_SPOOL_DIR", spool)
+        assert shared_state.clear_image_spool() == 1
+        assert [p.name for p in spool.iterdir()] == ["keep.txt"]
+
+    def test_image_spool_is_under_config_dir(self):
+        import shared_state
+        assert shared_state.IMAGE_SPOOL_DIR.parent == shared_state.CONFIG_DIR
+
+    async def test_declared_oversize_rejected_before_body(self, test_app, authenticated_client, monkeypatch):
+        import database
+        from shared_state import MAX_IMAGE_UPLOAD_BYTES, MULTIPART_OVERHEAD_BYTES
+        events = []
+        monkeypatch.setattr(database, "log_security_event", lambda *a, **kw: events.append(a[0]))
+        resp = await authenticated_client.post(
+            "/api/upload-image",
+            content=b"",
+            headers={
+                "Content-Type": "multipart/form-data; boundary=x",
+                "Content-Length": str(MAX_IMAGE_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES + 1),
+            },
+        )
+        assert resp.status_code == 413
+        assert events == ["image_too_large"]
+
+
+# =====================================================================
+# Directors auth dependency
+# =====================================================================
+
+class TestDirectorsAuth:
+    """Test the require_user dependency on /api/directors routes."""
+
+    async def test_unauthorized_keeps_error_body(self, test_app, unauthenticated_client):
+        resp = await unauthenticated_client.get("/api/directors/activity")
+        assert resp.status_code == 401
+        assert resp.json() == {"error": "Unauthorized"}
+
+    async def test_authorized_reaches_handler(self, test_app, authenticated_client, tmp_path, monkeypatch):
+        monkeypatch.setattr("directors.storage.DIRECTORS_DB", str(tmp_path / "directors.db"))
+        resp = await authenticated_client.get("/api/directors/activity")
+        assert resp.status_code == 200
+        assert resp.json() == {"activity": []}
+
+    async def test_list_directors_etag_tracks_writes(self, test_app, authenticated_client, tmp_path, monkeypatch):
+        monkeypatch.setattr("directors.storage.DIRECTORS_DB", str(tmp_path / "directors.db"))
+        from directors.storage import add_director
+
+        first = await authenticated_client.get("/api/directors")
+        etag = first.headers["etag"]
+        resp = await authenticated_client.get("/api/directors", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+
+        add_director(id="d1", name="D1", role_prompt="x" * 30, user_id="default")
+        resp = await authenticated_client.get("/api/directors", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert [d["id"] for d in resp.json()["directors"]] == ["d1"]
+
+    async def test_templates_etag(self, test_app, authenticated_client):
+        first = await authenticated_client.get("/api/directors/templates")
+        assert first.status_code == 200
+        assert "templates" in first.json()
+        resp = await authenticated_client.get(
+            "/api/directors/templates", headers={"If-None-Match": first.headers["etag"]},
+        )
+        assert resp.status_code == 304
+
+
 # =====================================================================
 # Messages
 # =====================================================================
@@ -103,6 +228,36 @@ class TestMetricsEndpoint:
         assert "this_month" in data["totals"]
 
 
+# =====================================================================
+# Rate limit polling
+# =====================================================================
+
+class TestFetchRateLimits:
+    """fetch_rate_limits() polls through the shared client it is given."""
+
+    async def test_uses_given_client(self, test_app, monkeypatch):
+        import httpx
+        import server
+        monkeypatch.setattr(server, "_rate_limit_cache", {"data": None, "last_fetch": 0.0})
+        seen = []
+
+        def handler(request):
+            seen.append(request)
+            return httpx.Response(200, headers={
+                "anthropic-ratelimit-requests-limit": "50",
+                "anthropic-ratelimit-requests-reset": "2025-01-01T00:00:00Z",
+            })
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            limits = await server.fetch_rate_limits("sk-test", client)
+            # Throttled: the cached result is returned without a second request
+            assert await server.fetch_rate_limits("sk-test", client) == limits
+
+        assert limits == {"requests-limit": 50, "requests-reset": "2025-01-01T00:00:00Z"}
+        assert len(seen) == 1
+        assert seen[0].headers["x-api-key"] == "sk-test"
+
+
 # =====================================================================
 # Conversation History
 # =====================================================================
@@ -151,6 +306,40 @@ class TestHistoryEndpoint:
         assert resp.status_code == 200
         assert resp.json()["id"] == "conv_load"
 
+    async def test_saved_filename_embeds_id(self, test_app, authenticated_client):
+        await authenticated_client.post("/api/history", json={"id": "conv/named"})
+        names = [f.name for f in test_app["history_dir"].glob("*.json")]
+        assert len(names) == 1
+        assert names[0].endswith("__conv_named.json")
+
+    async def test_concurrent_saves_of_new_id_write_one_file(self, test_app, authenticated_client):
+        import asyncio
+        conv = {"id": "conv_race", "createdAt": 1, "updatedAt": 1}
+        results = await asyncio.gather(
+            *(authenticated_client.post("/api/history", json=conv) for _ in range(3))
+        )
+        assert all(r.status_code == 200 for r in results)
+        assert len(list(test_app["history_dir"].glob("*__conv_race.json"))) == 1
+
+    async def test_load_legacy_filename(self, test_app, authenticated_client):
+        """Files from the older {ts}_{agent}.json scheme are still found."""
+        legacy = test_app["history_dir"] / "1700000000000_default.json"
+        legacy.write_text(json.dumps({"id": "conv_legacy"}), encoding="utf-8")
+
+        resp = await authenticated_client.get("/api/history/conv_legacy")
+        assert resp.status_code == 200
+        assert resp.json()["id"] == "conv_legacy"
+
+    async def test_legacy_filename_with_double_underscore_agent(self, test_app, authenticated_client):
+        legacy = test_app["history_dir"] / "1700000000000_my__agent.json"
+        legacy.write_text(json.dumps({"id": "conv_dunder"}), encoding="utf-8")
+
+        resp = await authenticated_client.get("/api/history/conv_dunder")
+        assert resp.status_code == 200
+        resp = await authenticated_client.delete("/api/history/conv_dunder")
+        assert resp.json() == {"deleted": True}
+        assert not legacy.exists()
+
     async def test_load_nonexistent_conversation(self, test_app, authenticated_client):
         resp = await authenticated_client.get("/api/history/nonexistent")
         assert resp.status_code == 404
@@ -192,6 +381,22 @@ class TestHistoryEndpoint:
         resp = await authenticated_client.get("/api/history/conv_update")
         assert resp.json()["label"] == "Updated"
 
+    async def test_history_etag_not_modified(self, test_app, authenticated_client):
+        resp = await authenticated_client.get("/api/history")
+        etag = resp.headers["etag"]
+
+        resp = await authenticated_client.get("/api/history", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+
+        await authenticated_client.post("/api/history", json={"id": "conv_etag"})
+        resp = await authenticated_client.get("/api/history", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.headers["etag"] != etag
+
+    async def test_save_rejects_non_object_body(self, test_app, authenticated_client):
+        resp = await authenticated_client.post("/api/history", json=["not", "an", "object"])
+        assert resp.status_code == 400
+
     async def test_history_unauthorized(self, test_app, unauthenticated_client):
         resp = await unauthenticated_client.get("/api/history")
         assert resp.status_code == 401
@@ -216,6 +421,20 @@ class TestHistoryEndpoint:
         convs = resp.json()["conversations"]
         assert len(convs) <= max_convs
 
+    async def test_save_reports_pruned_ids(self, test_app, authenticated_client):
+        """The oldest conversation id is returned once it falls past the limit."""
+        import asyncio
+        import server
+        max_convs = server.MAX_CONVERSATIONS
+
+        for i in range(max_convs):
+            await authenticated_client.post("/api/history", json={"id": f"conv_old_{i}"})
+            await asyncio.sleep(0.05)
+
+        resp = await authenticated_client.post("/api/history", json={"id": "conv_newest"})
+        assert resp.json()["deleted"] == ["conv_old_0"]
+        assert len(list(test_app["history_dir"].glob("*.json"))) == max_convs
+
 
 # =====================================================================
 # Memories API
@@ -248,6 +467,13 @@ class TestMemoriesAPI:
         resp = await authenticated_client.get("/api/memories")
         assert len(resp.json()["memories"]) == 1
 
+    async def test_memories_cache_invalidated_on_add(self, test_app, authenticated_client):
+        resp = await authenticated_client.get("/api/memories")
+        assert resp.json()["memories"] == []
+        await authenticated_client.post("/api/memories", json={"content": "fresh"})
+        resp = await authenticated_client.get("/api/memories")
+        assert [m["content"] for m in resp.json()["memories"]] == ["fresh"]
+
     async def test_delete_memory(self, test_app, authenticated_client):
         resp = await authenticated_client.post("/api/memories", json={"content": "to delete"})
         mem_id = resp.json()["memory"]["id"]
@@ -260,6 +486,12 @@ class TestMemoriesAPI:
         resp = await authenticated_client.delete("/api/memories/fake_id")
         assert resp.status_code == 404
 
+    async def test_delete_memory_invalid_id(self, test_app, authenticated_client):
+        resp = await authenticated_client.delete("/api/memories/bad.id")
+        assert resp.status_code == 400
+        resp = await authenticated_client.delete(f"/api/memories/{'a' * 129}")
+        assert resp.status_code == 400
+
     async def test_clear_memories(self, test_app, authenticated_client):
         await authenticated_client.post("/api/memories", json={"content": "m1"})
         await authenticated_client.post("/api/memories", json={"content": "m2"})
@@ -1,6 +1,7 @@
 """Tests for server.py authentication -- PIN auth, token generation, lockout, rate limiting."""
 
 import time
+from collections import deque
 
 import pytest
 
@@ -58,6 +59,17 @@ class TestPINAuthentication:
         assert server.verify_token(token1)
         assert server.verify_token(token2)
 
+    async def test_verify_pin_rejects_malformed_hash_without_hashing(self, test_app, monkeypatch):
+        import shared_state
+
+        def _fail(*args):
+            raise AssertionError("bcrypt should not run for a malformed hash")
+
+        monkeypatch.setattr(shared_state.bcrypt, "checkpw", _fail)
+        assert await shared_state.verify_pin("1234", "") is False
+        assert await shared_state.verify_pin("1234", "plaintext-pin") is False
+        assert await shared_state.verify_pin("1234", "$2b$12$short") is False
+
 
 class TestLockout:
     """Test IP lockout mechanism.
@@ -128,12 +140,69 @@ class TestLockout:
         resp = await unauthenticated_client.post("/api/auth", json={"pin": test_app["pin"]})
         assert resp.status_code == 200
 
+    async def test_repeated_failures_lock_out(self, test_app, unauthenticated_client):
+        """MAX_PIN_ATTEMPTS consecutive wrong PINs lock the IP out."""
+        import server
+        server._auth_attempts.clear()
+
+        for _ in range(server.MAX_PIN_ATTEMPTS - 1):
+            resp = await unauthenticated_client.post("/api/auth", json={"pin": "wrong"})
+            assert resp.status_code == 401
+        resp = await unauthenticated_client.post("/api/auth/devices", json={"pin": "wrong"})
+        assert resp.status_code == 429
+        assert resp.json().get("locked") is True
+
+        resp = await unauthenticated_client.post("/api/auth", json={"pin": test_app["pin"]})
+        assert resp.status_code == 429
+
+    async def test_attempt_tracking_is_bounded(self, test_app, unauthenticated_client, monkeypatch):
+        """The per-IP attempts map evicts the oldest entry when full."""
+        import routes.auth
+        import server
+        server._auth_attempts.clear()
+        monkeypatch.setattr(routes.auth, "MAX_TRACKED_AUTH_IPS", 2)
+
+        now = time.time()
+        server._auth_attempts["10.0.0.1"] = {"failures": deque([now]), "locked_until": 0}
+        server._auth_attempts["10.0.0.2"] = {"failures": deque([now]), "locked_until": 0}
+
+        resp = await unauthenticated_client.post("/api/auth", json={"pin": "wrong"})
+        assert resp.status_code == 401
+        assert list(server._auth_attempts) == ["10.0.0.2", "127.0.0.1"]
+
+    async def test_old_failures_do_not_count(self, test_app, unauthenticated_client):
+        """Failures older than LOCKOUT_SECONDS fall out of the window."""
+        import server
+        server._auth_attempts.clear()
+
+        old = time.time() - server.LOCKOUT_SECONDS - 1
+        server._auth_attempts["127.0.0.1"] = {
+            "failures": deque([old] * (server.MAX_PIN_ATTEMPTS - 1)),
+            "locked_until": 0,
+        }
+
+        resp = await unauthenticated_client.post("/api/auth", json={"pin": "wrong"})
+        assert resp.status_code == 401
+        assert resp.json()["remaining_attempts"] == server.MAX_PIN_ATTEMPTS - 1
+
     async def test_lockout_constants(self, test_app):
         """Verify lockout constants are reasonable."""
         import server
         assert server.MAX_PIN_ATTEMPTS >= 3
         assert server.LOCKOUT_SECONDS >= 60
 
+    async def test_saturated_bcrypt_pool_returns_503(self, test_app, unauthenticated_client, monkeypatch):
+        """When too many PIN checks are queued, the request is shed with 503."""
+        import shared_state
+        shared_state._auth_attempts.clear()
+        monkeypatch.setattr(shared_state, "_bcrypt_pending", shared_state.BCRYPT_MAX_PENDING)
+
+        resp = await unauthenticated_client.post("/api/auth", json={"pin": test_app["pin"]})
+        assert resp.status_code == 503
+        assert resp.headers.get("retry-after") == "1"
+        # Shed requests must not count as failed attempts
+        assert "127.0.0.1" not in shared_state._auth_attempts
+
 
 class TestTokenVerification:
     """Test token validation on protected endpoints."""
@@ -198,6 +267,21 @@ class TestTokenVerification:
         # Should be cleaned up
         assert token not in server.active_tokens
 
+    async def test_pop_expired_tokens(self, test_app, monkeypatch):
+        """The periodic sweep drops only expired tokens, via the expiry heap."""
+        import shared_state
+        monkeypatch.setattr(shared_state, "_token_expiry_heap", [])
+        now = time.time()
+        shared_state._add_active_token("old", now - 10)
+        shared_state._add_active_token("fresh", now + 3600)
+        shared_state._add_active_token("revoked", now - 5)
+        shared_state.active_tokens.pop("revoked")
+
+        assert shared_state._pop_expired_tokens(now) == 1
+        assert "old" not in shared_state.active_tokens
+        assert "fresh" in shared_state.active_tokens
+        assert shared_state._token_expiry_heap == [(now + 3600, "fresh")]
+
 
 class TestLogout:
     """Test token revocation endpoints."""
@@ -246,6 +330,66 @@ class TestLogout:
         )
         assert resp.status_code == 400
 
+    async def test_revoke_all_closes_every_websocket(self, test_app, unauthenticated_client):
+        """A failing ws.close() must not stop the other sockets from closing."""
+        from unittest.mock import AsyncMock
+        import server
+        server._auth_attempts.clear()
+
+        ok_ws = AsyncMock()
+        bad_ws = AsyncMock()
+        bad_ws.close.side_effect = RuntimeError("already closed")
+        server._active_ws_by_device.update({"dev-a": bad_ws, "dev-b": ok_ws})
+
+        resp = await unauthenticated_client.post("/api/auth/revoke-all", json={"pin": test_app["pin"]})
+        assert resp.status_code == 200
+        assert resp.json()["revoked_all"] is True
+        ok_ws.close.assert_awaited_once()
+        bad_ws.close.assert_awaited_once()
+        assert server._active_ws_by_device == {}
+
+
+class TestUserIdLookup:
+    """Test the cached token -> user_id session lookup."""
+
+    def test_user_id_cached_across_requests(self, test_app, monkeypatch):
+        from types import SimpleNamespace
+        import database
+        import shared_state
+
+        calls = []
+
+        def _lookup(token_hash):
+            calls.append(token_hash)
+            return "alice"
+
+        monkeypatch.setattr(database, "get_user_id_from_token", _lookup)
+
+        def _request():
+            return SimpleNamespace(
+                headers={"authorization": "Bearer tok-123"},
+                state=SimpleNamespace(),
+            )
+
+        assert shared_state._get_user_id_from_request(_request()) == "alice"
+        assert shared_state._get_user_id_from_request(_request()) == "alice"
+        assert calls == [shared_state._hash_token("tok-123")]
+
+
+class TestDeviceIdValidation:
+    """Test device_id validation on the device management endpoints."""
+
+    @pytest.mark.parametrize("device_id", ["bad.id", "x" * 65, "dev%20ice", "d\u00e9v"])
+    async def test_invalid_device_id_rejected(self, test_app, authenticated_client, device_id):
+        resp = await authenticated_client.delete(f"/api/devices/{device_id}")
+        assert resp.status_code == 400
+        resp = await authenticated_client.patch(f"/api/devices/{device_id}", json={"name": "x"})
+        assert resp.status_code == 400
+
+    async def test_valid_unknown_device_id_is_404(self, test_app, authenticated_client):
+        resp = await authenticated_client.delete("/api/devices/unknown-dev_1")
+        assert resp.status_code == 404
+
 
 class TestSecurityHeaders:
     """Test that security headers are present in responses."""
@@ -266,3 +410,32 @@ class TestSecurityHeaders:
     async def test_permissions_policy_header(self, test_app, unauthenticated_client):
         resp = await unauthenticated_client.post("/api/auth", json={"pin": "test"})
         assert "permissions-policy" in resp.headers
+
+
+class TestClaudeCredentials:
+    """Test the cached reader for ~/.claude/.credentials.json."""
+
+    def test_missing_file_returns_none(self, tmp_path, monkeypatch):
+        import routes.auth
+        monkeypatch.setattr(routes.auth.Path, "home", lambda: tmp_path)
+        monkeypatch.setattr(routes.auth, "_creds_cache", None)
+        assert routes.auth._load_claude_credentials() is None
+
+    def test_reparses_only_when_file_changes(self, tmp_path, monkeypatch):
+        import json
+        import os
+        import routes.auth
+        monkeypatch.setattr(routes.auth.Path, "home", lambda: tmp_path)
+        monkeypatch.setattr(routes.auth, "_creds_cache", None)
+        creds_path = tmp_path / ".claude" / ".credentials.json"
+        creds_path.parent.mkdir()
+        creds_path.write_text(json.dumps({"claudeAiOauth": {"accessToken": "a"}}))
+
+        first = routes.auth._load_claude_credentials()
+        assert first["claudeAiOauth"]["accessToken"] == "a"
+        assert routes.auth._load_claude_credentials() is first
+
+        creds_path.write_text(json.dumps({"claudeAiOauth": {"accessToken": "bb"}}))
+        st = creds_path.stat()
+        os.utime(creds_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+        assert routes.auth._load_claude_credentials()["claudeAiOauth"]["accessToken"] == "bb"
@@ -295,6 +295,46 @@ class TestAgentCRUD:
             assert msg["type"] == "error"
             assert "no project directory" in msg["text"].lower()
 
+    def test_image_ids_read_off_the_event_loop(self, ws_client, monkeypatch):
+        """image_ids are claimed on the loop but read and encoded in a worker thread."""
+        import routes.images as images_routes
+        import shared_state
+        spool_dir = ws_client["test_app"]["tmp_path"] / "spool"
+        monkeypatch.setattr(images_routes, "IMAGE_SPOOL_DIR", spool_dir)
+
+        calls = []
+        real_read = shared_state.read_pending_images_b64
+
+        def _read(entries):
+            try:
+                asyncio.get_running_loop()
+                calls.append("loop")
+            except RuntimeError:
+                calls.append("thread")
+            return real_read(entries)
+
+        monkeypatch.setattr(shared_state, "read_pending_images_b64", _read)
+
+        resp = ws_client["client"].post(
+            "/api/upload-image",
+            files={"image": ("a.png", b"\x89PNG data", "image/png")},
+            headers={"Authorization": f"Bearer {ws_client['token']}"},
+        )
+        assert resp.status_code == 200
+        image_id = resp.json()["image_id"]
+        path = shared_state.pending_images[image_id]["path"]
+
+        with ws_connect(ws_client) as ws:
+            ws.receive_json()
+            # Images are resolved before the agent lookup, so no set_cwd is needed
+            ws.send_json({"type": "send_message", "agent_id": "default", "text": "hello",
+                          "image_ids": [image_id]})
+            assert ws.receive_json()["type"] == "error"
+
+        assert calls == ["thread"]
+        assert image_id not in shared_state.pending_images
+        assert not Path(path).exists()
+
     def test_set_cwd_with_model_override(self, ws_client):
         """set_cwd accepts model and provider overrides."""
         with ws_connect(ws_client) as ws: